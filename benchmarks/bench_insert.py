@@ -0,0 +1,86 @@
+"""Benchmark ping record inserts.
+
+Compares one INSERT and commit per record (insert_ping_records_db) against
+one executemany transaction per batch (insert_ping_batch_db), on a database
+file so commits pay for their fsync. Run from the repository root:
+
+    python benchmarks/bench_insert.py [--records 10 1000 100000] [--dir /tmp]
+"""
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+
+from netdiag.analysis.ping import analyse_ping_result
+from netdiag.data.ping import PingParseResult
+from netdiag.database import (
+    create_db,
+    insert_ping_batch_db,
+    insert_ping_records_db,
+    insert_sessions_db,
+)
+
+# Per-record commits are slow enough that very large runs are skipped
+PER_RECORD_LIMIT = 10_000
+
+
+def make_records(n: int) -> list:
+    template = PingParseResult(
+        address="8.8.8.8", times_ms=[10.0, 12.0, 11.0], sent=3, received=3, loss_pct=0.0,
+        rtt_min_ms=10.0, rtt_avg_ms=11.0, rtt_max_ms=12.0, rtt_stddev_ms=0.8,
+        jitter=1.5, jitter_ratio=0.14,
+    )
+    return [analyse_ping_result(template, "bench") for _ in range(n)]
+
+
+def fresh_db(directory: Path, name: str) -> sqlite3.Connection:
+    path = directory / name
+    path.unlink(missing_ok=True)
+    conn = sqlite3.connect(path)
+    create_db(conn)
+    insert_sessions_db(session_id="bench", command="bench", conn=conn)
+    return conn
+
+
+def per_record(conn: sqlite3.Connection, records: list) -> None:
+    for record in records:
+        insert_ping_records_db(session_id="bench", ping_record=record, conn=conn)
+
+
+def batched(conn: sqlite3.Connection, records: list) -> None:
+    insert_ping_batch_db(session_id="bench", ping_records=records, conn=conn, status="completed")
+
+
+def timed(directory: Path, name: str, func, records: list) -> float:
+    conn = fresh_db(directory, name)
+    try:
+        start = time.perf_counter()
+        func(conn, records)
+        return time.perf_counter() - start
+    finally:
+        conn.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, nargs="+", default=[10, 1000, 100_000])
+    parser.add_argument("--dir", type=Path, help="where to create the database files")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        directory = Path(tmp)
+        print(f"{'records':>8}  {'per-record rec/s':>17}  {'batched rec/s':>14}")
+        for n in args.records:
+            records = make_records(n)
+            batch_s = timed(directory, "batched.db", batched, records)
+            if n <= PER_RECORD_LIMIT:
+                single = f"{n / timed(directory, 'single.db', per_record, records):>17,.0f}"
+            else:
+                single = f"{'skipped':>17}"
+            print(f"{n:>8}  {single}  {n / batch_s:>14,.0f}")
+
+
+if __name__ == "__main__":
+    main()
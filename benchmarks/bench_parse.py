@@ -0,0 +1,110 @@
+"""Benchmark ping output parsing.
+
+Compares the single-pass, dialect-driven parser against the previous parser,
+which scanned every line once per regex. Inputs are the captured outputs in
+tests/fixtures/ping_samples.py with their replies repeated. Run from the
+repository root:
+
+    python benchmarks/bench_parse.py [--replies 1000] [--repeat 200]
+"""
+
+import argparse
+import re
+import sys
+import timeit
+from pathlib import Path
+
+from netdiag.os.linux import LinuxAdapter
+from netdiag.os.windows import WindowsOSAdapter
+
+# The fixtures live in the tests package at the repository root
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+from tests.fixtures.ping_samples import LINUX_IPUTILS_SUCCESS, WINDOWS_SUCCESS  # noqa: E402
+
+_TIME_RE = re.compile(r"\btime[=<]\s*(?P<ms>[\d().]+)\s*ms\b", re.IGNORECASE)
+_ADDR_RE = re.compile(r"^---\s+(?P<addr>.+?)\s+ping statistics\s+---$", re.IGNORECASE)
+_PACKET_RE = re.compile(
+    r"(?P<tx>\d+)\s+packets transmitted,\s+"
+    r"(?P<rx>\d+)\s+(?:packets\s+)?received,\s+"
+    r"(?P<loss>\d+(?:\.\d+)?)%\s+packet loss",
+    re.IGNORECASE,
+)
+_RTT_RE = re.compile(
+    r"(?:round-trip|rtt)\s+min/avg/max/(?:stddev|mdev)\s*=\s*"
+    r"(?P<min>\d+(?:\.\d+)?)/(?P<avg>\d+(?:\.\d+)?)/(?P<max>\d+(?:\.\d+)?)/(?P<std>\d+(?:\.\d+)?)",
+    re.IGNORECASE,
+)
+
+
+def legacy_parse(raw: str) -> tuple:
+    """The previous Unix parser: one full scan of the output per regex."""
+    lines = [ln.strip() for ln in raw.splitlines() if ln.strip()]
+    times_ms = []
+    for ln in lines:
+        m = _TIME_RE.search(ln)
+        if m:
+            times_ms.append(float(m.group("ms").replace("(", "").replace(")", "")))
+    header = next((m for ln in lines if (m := _ADDR_RE.search(ln))), None)
+    packets = next((m for ln in lines if (m := _PACKET_RE.search(ln))), None)
+    rtt = next((m for ln in lines if (m := _RTT_RE.search(ln))), None)
+    return header, packets, rtt, legacy_jitter(times_ms)
+
+
+def legacy_jitter(times_ms: list[float]) -> tuple[float, float]:
+    """The previous OSAdapter.compute_jitter, before RttStats."""
+    ok = [t for t in times_ms if t is not None]
+    if len(ok) < 2:
+        return 0.0, 0.0
+    diffs = [abs(ok[i] - ok[i - 1]) for i in range(1, len(ok))]
+    jitter = sum(diffs) / len(diffs)
+    return jitter, jitter / max(sum(ok) / len(ok), 1.0)
+
+
+def repeat_replies(sample: str, replies: int) -> str:
+    """sample with its reply lines cycled to replies and the counts to match.
+
+    Sequence numbers keep counting up, so the output reads like one long run.
+    """
+    lines = sample.splitlines()
+    reply_at = [i for i, ln in enumerate(lines) if _TIME_RE.search(ln)]
+    body = lines[reply_at[0]:reply_at[-1] + 1]
+    sent = len(body)
+    out = lines[:reply_at[0]]
+    for i in range(replies):
+        out.append(re.sub(r"(?<=seq=)\d+", str(i + 1), body[i % sent]))
+    for ln in lines[reply_at[-1] + 1:]:
+        if "packets transmitted" in ln or "Packets:" in ln:
+            ln = re.sub(rf"\b{sent}\b", str(replies), ln)
+        out.append(ln)
+    return "\n".join(out) + "\n"
+
+
+def report(label: str, func, repeat: int) -> float:
+    per_call = min(timeit.repeat(func, number=repeat, repeat=5)) / repeat
+    print(f"  {label:<28} {per_call * 1e6:10.1f} us/parse")
+    return per_call
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--replies", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    unix_raw = repeat_replies(LINUX_IPUTILS_SUCCESS, args.replies)
+    windows_raw = repeat_replies(WINDOWS_SUCCESS, args.replies)
+    linux = LinuxAdapter()
+    windows = WindowsOSAdapter()
+
+    print(f"iputils output, {args.replies} replies")
+    legacy = report("legacy multi-scan", lambda: legacy_parse(unix_raw), args.repeat)
+    current = report(f"single pass ({linux.dialect.name})",
+                     lambda: linux.parse_ping(unix_raw), args.repeat)
+    print(f"  speedup: {legacy / current:.2f}x")
+
+    print(f"windows output, {args.replies} replies")
+    report("single pass (windows)", lambda: windows.parse_ping(windows_raw), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
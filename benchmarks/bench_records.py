@@ -0,0 +1,150 @@
+"""Benchmark the memory an analysis job pays per PingRecord held in memory.
+
+Builds --records records and measures what they occupy with tracemalloc,
+once with the slotted, bit-packed data model and once with plain
+dataclasses shaped like the previous model (a __dict__ per object and one
+bool per signal). Both hold the same values. Run from the repository root:
+
+    python benchmarks/bench_records.py [--records 1000000]
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+
+from netdiag.analysis.ping import build_ping_diagnosis, build_ping_signals
+from netdiag.data.ping import (
+    CAUSE_SUMMARY,
+    DiagnosisCause,
+    PingMetrics,
+    PingRecord,
+)
+from netdiag.samples import encode_samples
+
+
+@dataclass
+class LegacyMetrics:
+    sent: int
+    received: int
+    loss_pct: float
+    rtt_min_ms: float
+    rtt_avg_ms: float
+    rtt_max_ms: float
+    rtt_stddev_ms: float
+    jitter: float
+    jitter_ratio: float
+
+
+@dataclass
+class LegacySignals:
+    no_reply: bool
+    any_loss: bool
+    high_loss: bool
+    high_latency: bool
+    unstable_jitter: bool
+    unstable: bool
+
+
+@dataclass
+class LegacyDiagnosis:
+    cause: DiagnosisCause
+    summary: str
+    confidence: float
+    evidence: dict[str, float]
+
+
+@dataclass
+class LegacyRecord:
+    session_id: str
+    timestamp: datetime
+    target: str
+    metrics: LegacyMetrics
+    signals: LegacySignals
+    diagnosis: LegacyDiagnosis
+
+
+def make_metrics(rng: random.Random) -> PingMetrics:
+    received = rng.choice((5, 5, 5, 4))
+    avg = rng.uniform(5.0, 80.0)
+    return PingMetrics(
+        sent=5, received=received, loss_pct=(5 - received) * 20.0,
+        rtt_min_ms=avg * 0.8, rtt_avg_ms=avg, rtt_max_ms=avg * 1.3,
+        rtt_stddev_ms=avg * 0.1, jitter=avg * 0.05, jitter_ratio=0.05,
+    )
+
+
+def compact_record(session_id, timestamp, target, metrics, samples):
+    signals = build_ping_signals(metrics)
+    return PingRecord(
+        session_id=session_id,
+        timestamp=timestamp,
+        target=target,
+        metrics=metrics,
+        signals=signals,
+        diagnosis=build_ping_diagnosis(metrics, signals),
+        rtt_samples=samples,
+    )
+
+
+def legacy_record(session_id, timestamp, target, metrics, samples):
+    signals = build_ping_signals(metrics)
+    diagnosis = build_ping_diagnosis(metrics, signals)
+    return LegacyRecord(
+        session_id=session_id,
+        timestamp=timestamp,
+        target=target,
+        metrics=LegacyMetrics(
+            metrics.sent, metrics.received, metrics.loss_pct, metrics.rtt_min_ms,
+            metrics.rtt_avg_ms, metrics.rtt_max_ms, metrics.rtt_stddev_ms,
+            metrics.jitter, metrics.jitter_ratio,
+        ),
+        signals=LegacySignals(*(getattr(signals, f) for f in (
+            "no_reply", "any_loss", "high_loss", "high_latency", "unstable_jitter", "unstable",
+        ))),
+        diagnosis=LegacyDiagnosis(
+            diagnosis.cause, CAUSE_SUMMARY[diagnosis.cause], diagnosis.confidence,
+            diagnosis.evidence,
+        ),
+    )
+
+
+def held_bytes(build, records: int, with_samples: bool) -> int:
+    """Bytes still allocated once records have been built."""
+    rng = random.Random(0)
+    targets = ["8.8.8.8", "1.1.1.1", "gateway"]
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+    gc.collect()
+    tracemalloc.start()
+    held = []
+    for i in range(records):
+        metrics = make_metrics(rng)
+        samples = encode_samples([metrics.rtt_avg_ms] * 5) if with_samples else None
+        held.append(build("bench", start + timedelta(seconds=i), targets[i % 3], metrics,
+                          samples))
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del held
+    return current
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--records", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    n = args.records
+    print(f"{'model':>22}  {'held MB':>8}  {'B/record':>9}")
+    for name, build, with_samples in (
+        ("legacy dataclasses", legacy_record, False),
+        ("compact", compact_record, False),
+        ("compact + rtt_samples", compact_record, True),
+    ):
+        held = held_bytes(build, n, with_samples)
+        print(f"{name:>22}  {held / 1e6:>8.1f}  {held / n:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Benchmark diagnosing one probe cycle with compiled rules.
+
+Compares the hand-written build_ping_signals / build_ping_diagnosis chain
+against a RuleBook compiled from [diagnosis] rules, where every tenth
+target has its own override, for cycles of --targets targets. Run from the
+repository root:
+
+    python benchmarks/bench_rules.py [--targets 100 1000 10000]
+"""
+
+import argparse
+import random
+import timeit
+from dataclasses import replace
+
+from netdiag.analysis.ping import build_ping_diagnosis, build_ping_signals
+from netdiag.analysis.rules import RuleBook
+from netdiag.config.config import DiagnosisConfig
+from netdiag.data.ping import PingMetrics
+
+
+def make_metrics(rng: random.Random) -> PingMetrics:
+    # A mix of healthy, lossy, slow and jittery targets
+    sent = rng.choice((5, 20))
+    received = rng.choice((sent, sent, sent - 1, 0))
+    avg = rng.choice((rng.uniform(5.0, 80.0), rng.uniform(150.0, 800.0)))
+    return PingMetrics(
+        sent=sent, received=received, loss_pct=(sent - received) * 100.0 / sent,
+        rtt_min_ms=avg * 0.8, rtt_avg_ms=avg, rtt_max_ms=avg * 1.3,
+        rtt_stddev_ms=avg * 0.1, jitter=avg * rng.uniform(0.0, 0.6),
+        jitter_ratio=rng.uniform(0.0, 0.6),
+    )
+
+
+def hand_chain(cycle):
+    for _, metrics in cycle:
+        signals = build_ping_signals(metrics)
+        build_ping_diagnosis(metrics, signals)
+
+
+def compiled(rules, cycle):
+    for target, metrics in cycle:
+        rules.diagnose(target, metrics)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--targets", type=int, nargs="+", default=[100, 1000, 10_000])
+    args = parser.parse_args()
+
+    print(f"{'targets':>8}  {'chain us/rec':>13}  {'rules us/rec':>13}  {'compile ms':>11}")
+    for n in args.targets:
+        targets = [f"10.0.{i // 250}.{i % 250}" for i in range(n)]
+        rng = random.Random(0)
+        cycle = [(target, make_metrics(rng)) for target in targets]
+        base = DiagnosisConfig()
+        config = replace(base, targets={
+            target: replace(base, high_latency_ms=700) for target in targets[::10]
+        })
+
+        build = min(timeit.repeat(lambda: RuleBook(config), number=1, repeat=3))
+        rules = RuleBook(config)
+        number = max(1, 100_000 // n)
+        old = min(timeit.repeat(lambda: hand_chain(cycle), number=number, repeat=5))
+        new = min(timeit.repeat(lambda: compiled(rules, cycle), number=number, repeat=5))
+        per_record = number * n
+        print(f"{n:>8}  {old / per_record * 1e6:>13.2f}  {new / per_record * 1e6:>13.2f}  "
+              f"{build * 1e3:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
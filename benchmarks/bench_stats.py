@@ -0,0 +1,72 @@
+"""Benchmark running RTT statistics.
+
+Compares RttStats, which sees each reply once, against the previous
+compute_jitter/compute_std helpers, which copied the samples into filtered
+and diff lists and made a second pass for the variance. Run from the
+repository root:
+
+    python benchmarks/bench_stats.py [--samples 10 1000 100000]
+"""
+
+import argparse
+import math
+import random
+import timeit
+import tracemalloc
+
+from netdiag.analysis.stats import RttStats
+
+
+def legacy_jitter(times_ms: list[float]) -> tuple[float, float]:
+    ok = [t for t in times_ms if t is not None]
+    if len(ok) < 2:
+        return 0.0, 0.0
+    diffs = [abs(ok[i] - ok[i - 1]) for i in range(1, len(ok))]
+    jitter = sum(diffs) / len(diffs)
+    return jitter, jitter / max(sum(ok) / len(ok), 1.0)
+
+
+def legacy_std(times_ms: list[float]) -> float:
+    ok = [t for t in times_ms if t is not None]
+    if not ok:
+        return 0.0
+    mean = sum(ok) / len(ok)
+    return math.sqrt(sum((t - mean) ** 2 for t in ok) / len(ok))
+
+
+def legacy(times_ms: list[float]) -> tuple:
+    return legacy_jitter(times_ms), legacy_std(times_ms)
+
+
+def streaming(times_ms: list[float]) -> tuple:
+    stats = RttStats.from_samples(times_ms)
+    return (stats.jitter, stats.jitter_ratio), stats.stddev
+
+
+def peak_bytes(func, times_ms: list[float]) -> int:
+    tracemalloc.start()
+    func(times_ms)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--samples", type=int, nargs="+", default=[10, 1000, 100_000])
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    print(f"{'samples':>8}  {'legacy us':>10}  {'stream us':>10}  {'legacy peak':>12}  "
+          f"{'stream peak':>12}")
+    for n in args.samples:
+        times_ms = [rng.uniform(5.0, 80.0) for _ in range(n)]
+        number = max(1, 100_000 // n)
+        old = min(timeit.repeat(lambda: legacy(times_ms), number=number, repeat=5)) / number
+        new = min(timeit.repeat(lambda: streaming(times_ms), number=number, repeat=5)) / number
+        print(f"{n:>8}  {old * 1e6:>10.1f}  {new * 1e6:>10.1f}  "
+              f"{peak_bytes(legacy, times_ms):>11}B  {peak_bytes(streaming, times_ms):>11}B")
+
+
+if __name__ == "__main__":
+    main()
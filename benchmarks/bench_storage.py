@@ -0,0 +1,71 @@
+"""Benchmark probe-cycle write latency under different storage settings.
+
+Each write is one probe cycle (--targets records in one transaction), as the
+daemon does. SQLite's defaults (rollback journal, synchronous=FULL) are
+compared with the default StorageConfig (WAL, synchronous=NORMAL). Run from
+the repository root:
+
+    python benchmarks/bench_storage.py [--cycles 500] [--targets 3] [--dir /tmp]
+"""
+
+import argparse
+import statistics
+import tempfile
+import time
+from pathlib import Path
+
+from netdiag.analysis.ping import analyse_ping_result
+from netdiag.config.config import StorageConfig
+from netdiag.data.ping import PingParseResult
+from netdiag.database import create_db, get_db_connection, insert_ping_batch_db, insert_sessions_db
+
+SETTINGS = {
+    "sqlite defaults": StorageConfig(
+        journal_mode="delete", synchronous="full", cache_size=-2000, mmap_size=0,
+        busy_timeout_ms=0,
+    ),
+    "StorageConfig()": StorageConfig(),
+}
+
+
+def make_cycle(targets: int) -> list:
+    template = PingParseResult(
+        address="8.8.8.8", times_ms=[10.0, 12.0, 11.0], sent=3, received=3, loss_pct=0.0,
+        rtt_min_ms=10.0, rtt_avg_ms=11.0, rtt_max_ms=12.0, rtt_stddev_ms=0.8,
+        jitter=1.5, jitter_ratio=0.14,
+    )
+    return [analyse_ping_result(template, "bench") for _ in range(targets)]
+
+
+def cycle_latencies(path: Path, storage: StorageConfig, cycles: int, records: list) -> list:
+    latencies = []
+    with get_db_connection(path, storage) as conn:
+        create_db(conn)
+        insert_sessions_db(session_id="bench", command="bench", conn=conn)
+        for _ in range(cycles):
+            start = time.perf_counter()
+            insert_ping_batch_db(session_id="bench", ping_records=records, conn=conn)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=500)
+    parser.add_argument("--targets", type=int, default=3)
+    parser.add_argument("--dir", type=Path, help="where to create the database files")
+    args = parser.parse_args()
+
+    records = make_cycle(args.targets)
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        print(f"{'settings':<16}  {'p50 ms':>8}  {'p99 ms':>8}  {'max ms':>8}")
+        for i, (label, storage) in enumerate(SETTINGS.items()):
+            latencies = cycle_latencies(Path(tmp) / f"{i}.db", storage, args.cycles, records)
+            p50 = statistics.median(latencies)
+            p99 = statistics.quantiles(latencies, n=100)[98]
+            worst = max(latencies)
+            print(f"{label:<16}  {p50 * 1e3:>8.3f}  {p99 * 1e3:>8.3f}  {worst * 1e3:>8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 from datetime import datetime, timezone
 
 import netdiag.data.ping as ping
+from netdiag.analysis.rules import Evaluate, apply_rules
+from netdiag.histogram import build_histogram
 from netdiag.os.base import OSAdapter
+from netdiag.samples import request_samples
 
 
 def diagnose_from_signals(signal: ping.PingSignals) -> ping.DiagnosisCause:
@@ -132,14 +135,36 @@ def build_record(
         metrics=ping_metrics,
         signals=ping_signals,
         diagnosis=ping_diagnosis,
+        rtt_samples=record_samples(ping_info),
+        rtt_hist=record_histogram(ping_info),
+        truncated=ping_info.truncated,
     )
 
 
-def ping_analysis(os_adapter: OSAdapter, raw_input: str, session_id: str) -> ping.PingRecord:
-    ping_info = os_adapter.parse_ping(raw_input)
+def record_samples(ping_info: ping.PingParseResult) -> bytes | None:
+    # A parser that did not keep the reply times leaves times_ms short
+    if len(ping_info.times_ms) < ping_info.received:
+        return None
+    return request_samples(ping_info.times_ms, ping_info.sent, ping_info.reply_seqs)
+
+
+def record_histogram(ping_info: ping.PingParseResult) -> bytes | None:
+    # A partial histogram would skew percentiles once merged
+    if len(ping_info.times_ms) < ping_info.received:
+        return None
+    return build_histogram(ping_info.times_ms)
+
+
+def analyse_ping_result(ping_info: ping.PingParseResult,
+                        session_id: str,
+                        rules: Evaluate | None = None) -> ping.PingRecord:
+    # rules: compiled [diagnosis] rules (analysis.rules); None uses the constants
     ping_metrics = build_ping_metrics(ping_info)
-    ping_signals = build_ping_signals(ping_metrics)
-    ping_diagnosis = build_ping_diagnosis(ping_metrics, ping_signals)
+    if rules is None:
+        ping_signals = build_ping_signals(ping_metrics)
+        ping_diagnosis = build_ping_diagnosis(ping_metrics, ping_signals)
+    else:
+        ping_signals, ping_diagnosis = apply_rules(rules, ping_metrics)
 
     now = datetime.now(timezone.utc)
 
@@ -151,3 +176,11 @@ def ping_analysis(os_adapter: OSAdapter, raw_input: str, session_id: str) -> pin
         ping_signals=ping_signals,
         ping_diagnosis=ping_diagnosis,
     )
+
+
+def ping_analysis(os_adapter: OSAdapter,
+                  raw_input: str,
+                  session_id: str,
+                  rules: Evaluate | None = None) -> ping.PingRecord:
+    ping_info = os_adapter.parse_ping(raw_input)
+    return analyse_ping_result(ping_info, session_id, rules)
@@ -0,0 +1,153 @@
+"""Diagnosis rules compiled from a DiagnosisConfig.
+
+compile_rules() turns one set of thresholds into a flat evaluate()
+function: the thresholds are bound as closure constants, the six signals
+are packed straight into the PingSignals bitfield, and the cause is a
+lookup in a 64-entry table, built once from the configured precedence, of
+every possible signal combination. Evaluating a record therefore costs no
+more than the hand-written build_ping_signals / diagnose_from_signals /
+compute_confidence chain, whatever the rules say.
+
+RuleBook compiles the [diagnosis] rules and each per-target override once,
+at startup, and hands out the rules for a target by name.
+"""
+
+from collections.abc import Callable
+from functools import lru_cache
+
+import netdiag.data.ping as ping
+from netdiag.config.config import DiagnosisConfig
+
+# evaluate(metrics) -> (signal bits, cause, confidence)
+Evaluate = Callable[[ping.PingMetrics], tuple[int, ping.DiagnosisCause, float]]
+
+# Signal bit each cause in the precedence list is triggered by
+_CAUSE_SIGNALS = {
+    ping.DiagnosisCause.NO_CONNECTIVITY: "no_reply",
+    ping.DiagnosisCause.HIGH_LOSS: "high_loss",
+    ping.DiagnosisCause.UNSTABLE_JITTER: "unstable_jitter",
+    ping.DiagnosisCause.HIGH_LATENCY: "high_latency",
+}
+
+# Causes the small-sample penalty applies to, as in compute_confidence
+_PENALISED = frozenset(
+    (ping.DiagnosisCause.HIGH_LOSS, ping.DiagnosisCause.UNSTABLE_JITTER,
+     ping.DiagnosisCause.HIGH_LATENCY)
+)
+
+
+def constant_rules() -> DiagnosisConfig:
+    """The rules the data.ping module constants currently describe."""
+    return DiagnosisConfig(
+        high_loss_pct=ping.HIGH_PACKET_LOSS_THRESHOLD_PCT,
+        high_latency_ms=ping.HIGH_LATENCY_THRESHOLD_MS,
+        unstable_jitter_ratio=ping.UNSTABLE_JITTER,
+        unstable_jitter_ms=ping.UNSTABLE_JITTER_ABS_MS,
+        unstable_deviation=ping.UNSTABLE_DEVIATION,
+        unstable_rtt_spread_ms=ping.UNSTABLE_RTT_SPREAD_MS,
+        loss_tiers_pct=(ping.LOSS_T1, ping.LOSS_T2),
+        latency_tiers_ms=(ping.LAT_T1, ping.LAT_T2),
+        jitter_ratio_tiers=(ping.JIT_R1, ping.JIT_R2),
+        jitter_tiers_ms=(ping.JIT_A1, ping.JIT_A2),
+    )
+
+
+@lru_cache
+def cause_table(precedence: tuple[str, ...]) -> tuple[ping.DiagnosisCause, ...]:
+    """The cause for every signals bitfield, indexed by the bits."""
+    masks = [
+        (1 << ping.SIGNAL_FIELDS.index(_CAUSE_SIGNALS[ping.DiagnosisCause(name)]),
+         ping.DiagnosisCause(name))
+        for name in precedence
+    ]
+    table = []
+    for bits in range(1 << len(ping.SIGNAL_FIELDS)):
+        table.append(next((cause for mask, cause in masks if bits & mask),
+                          ping.DiagnosisCause.OK))
+    return tuple(table)
+
+
+def compile_rules(config: DiagnosisConfig) -> Evaluate:
+    high_loss = config.high_loss_pct
+    high_latency = config.high_latency_ms
+    jitter_ratio_min = config.unstable_jitter_ratio
+    jitter_min = config.unstable_jitter_ms
+    deviation = config.unstable_deviation
+    spread = config.unstable_rtt_spread_ms
+    loss_t1, loss_t2 = config.loss_tiers_pct
+    lat_t1, lat_t2 = config.latency_tiers_ms
+    jit_r1, jit_r2 = config.jitter_ratio_tiers
+    jit_a1, jit_a2 = config.jitter_tiers_ms
+    table = cause_table(config.precedence)
+    high_loss_cause = ping.DiagnosisCause.HIGH_LOSS
+    jitter_cause = ping.DiagnosisCause.UNSTABLE_JITTER
+    latency_cause = ping.DiagnosisCause.HIGH_LATENCY
+    penalised = _PENALISED
+
+    def evaluate(m: ping.PingMetrics) -> tuple[int, ping.DiagnosisCause, float]:
+        loss = m.loss_pct
+        avg = m.rtt_avg_ms
+        jitter = m.jitter
+        ratio = m.jitter_ratio
+        bits = (
+            (m.received == 0)
+            | (loss > 0.0) << 1
+            | (loss >= high_loss) << 2
+            | (avg >= high_latency) << 3
+            | (ratio >= jitter_ratio_min and jitter >= jitter_min) << 4
+            | (m.rtt_stddev_ms >= deviation * avg
+               or (m.rtt_max_ms - m.rtt_min_ms) >= spread) << 5
+        )
+        cause = table[bits]
+        if cause is high_loss_cause:
+            confidence = 0.95 if loss >= loss_t1 else 0.85 if loss >= loss_t2 else 0.70
+        elif cause is jitter_cause:
+            if ratio >= jit_r1 and jitter >= jit_a1:
+                confidence = 0.95
+            elif ratio >= jit_r2 and jitter >= jit_a2:
+                confidence = 0.85
+            else:
+                confidence = 0.70
+        elif cause is latency_cause:
+            confidence = 0.95 if avg >= lat_t1 else 0.85 if avg >= lat_t2 else 0.70
+        else:
+            confidence = 1.0
+        if m.sent < 20 and cause in penalised:
+            confidence = max(0.30, confidence - 0.20)
+        return bits, cause, confidence
+
+    return evaluate
+
+
+class RuleBook:
+    """Compiled rules for the default and for every overridden target."""
+
+    def __init__(self, config: DiagnosisConfig):
+        self.config = config
+        self.default = compile_rules(config)
+        self._targets = {
+            target: compile_rules(override) for target, override in config.targets.items()
+        }
+
+    def for_target(self, target: str) -> Evaluate:
+        return self._targets.get(target, self.default)
+
+    def config_for(self, target: str) -> DiagnosisConfig:
+        return self.config.targets.get(target, self.config)
+
+    def diagnose(self,
+                 target: str,
+                 metrics: ping.PingMetrics) -> tuple[ping.PingSignals, ping.PingDiagnosis]:
+        return apply_rules(self.for_target(target), metrics)
+
+
+def apply_rules(evaluate: Evaluate,
+                metrics: ping.PingMetrics) -> tuple[ping.PingSignals, ping.PingDiagnosis]:
+    """The signals and diagnosis of metrics under the compiled rules."""
+    bits, cause, confidence = evaluate(metrics)
+    return ping.PingSignals.from_bits(bits), ping.PingDiagnosis(
+        cause=cause,
+        summary=ping.CAUSE_SUMMARY[cause],
+        confidence=confidence,
+        evidence={field: getattr(metrics, field) for field in ping.CAUSE_EVIDENCE_FIELDS[cause]},
+    )
@@ -0,0 +1,73 @@
+import math
+from collections.abc import Iterable
+
+
+class RttStats:
+    """Running RTT statistics updated once per reply in O(1) time and memory.
+
+    Mean and variance use Welford's algorithm, which stays accurate on long
+    runs where a sum of squares would lose precision. jitter is the mean
+    absolute difference between consecutive replies (what PingParseResult
+    reports); interarrival_jitter is the RFC 3550 estimator, which smooths
+    every difference with gain 1/16 and so tracks recent conditions.
+    """
+
+    __slots__ = ("count", "min_ms", "max_ms", "_mean", "_m2", "_last_ms", "_diff_sum",
+                 "interarrival_jitter")
+
+    def __init__(self):
+        self.count = 0
+        self.min_ms = math.inf
+        self.max_ms = -math.inf
+        self._mean = 0.0
+        self._m2 = 0.0
+        self._last_ms: float | None = None
+        self._diff_sum = 0.0
+        self.interarrival_jitter = 0.0
+
+    @classmethod
+    def from_samples(cls, times_ms: Iterable[float | None]) -> "RttStats":
+        """Accumulate every sample, skipping None (lost) entries."""
+        stats = cls()
+        for ms in times_ms:
+            if ms is not None:
+                stats.add(ms)
+        return stats
+
+    def add(self, ms: float) -> None:
+        self.count += 1
+        delta = ms - self._mean
+        self._mean += delta / self.count
+        self._m2 += delta * (ms - self._mean)
+
+        if ms < self.min_ms:
+            self.min_ms = ms
+        if ms > self.max_ms:
+            self.max_ms = ms
+
+        if self._last_ms is not None:
+            diff = abs(ms - self._last_ms)
+            self._diff_sum += diff
+            self.interarrival_jitter += (diff - self.interarrival_jitter) / 16
+        self._last_ms = ms
+
+    @property
+    def mean(self) -> float:
+        return self._mean
+
+    @property
+    def variance(self) -> float:
+        # Population variance, as ping itself reports
+        return self._m2 / self.count if self.count else 0.0
+
+    @property
+    def stddev(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def jitter(self) -> float:
+        return self._diff_sum / (self.count - 1) if self.count >= 2 else 0.0
+
+    @property
+    def jitter_ratio(self) -> float:
+        return self.jitter / max(self._mean, 1.0) if self.count >= 2 else 0.0
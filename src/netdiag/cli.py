@@ -1,17 +1,31 @@
 import argparse
+import signal
+import sqlite3
 import uuid
+from contextlib import ExitStack
+from datetime import datetime, timezone
 
+from netdiag.analysis.rules import RuleBook
 from netdiag.config.config import load_config
 from netdiag.database import (
     create_db,
     get_db_connection,
-    insert_ping_records_db,
+    insert_events_db,
+    insert_ping_batch_db,
     insert_sessions_db,
     update_session_status_db,
 )
 from netdiag.os import get_os_adapter
+from netdiag.partitions import PartitionWriter, open_partition, partition_layout
 from netdiag.presentation import format_ping_report
-from netdiag.probes.ping import run_ping
+from netdiag.probes.ping import PING_ENGINES, run_ping_batch
+from netdiag.recent import RecentResults
+from netdiag.rediagnose import rediagnose_history
+from netdiag.retention import enable_incremental_vacuum, prune
+from netdiag.rollups import check_rollups, compact_rollups, rebuild_rollups
+from netdiag.scheduler import Scheduler
+from netdiag.spool import append_to_spool, replay_spool, spool_path, spool_pending
+from netdiag.writer import BackgroundWriter, DatabaseWriter
 
 
 # Override the argparse
@@ -24,23 +38,136 @@ class MyParser(argparse.ArgumentParser):
 
 
 def cmd_ping(args, app_config, conn, session_id):
-    os_adapter = get_os_adapter()
+    os_adapter = get_os_adapter(gateway_ttl_s=app_config.ping.gateway_ttl_s)
+    record_writer = open_partition_writer(app_config)
+    try:
+        probe_ping_targets(args, app_config, conn, session_id, os_adapter, record_writer)
+    finally:
+        if record_writer is not None:
+            record_writer.close()
+
+
+def open_partition_writer(app_config):
+    # None unless [storage] partition is set; records then go to conn
+    layout = partition_layout(app_config)
+    return PartitionWriter(layout) if layout is not None else None
+
+
+def open_background_writer(app_config):
+    # The writer thread opens its own connection (or partition files)
+    def open_sink():
+        return open_partition_writer(app_config) or DatabaseWriter.connect(
+            app_config.database_path, app_config.storage
+        )
+
+    return BackgroundWriter(
+        open_sink, app_config.writer, spool=spool_path(app_config.database_path)
+    )
+
+
+def open_recent_results(app_config):
+    capacity = app_config.ping.recent_results
+    return RecentResults(capacity) if capacity > 0 else None
+
+
+def probe_ping_targets(args, app_config, conn, session_id, os_adapter, record_writer=None,
+                       recent=None, rules=None):
     ping_config = app_config.ping
-    for host in app_config.ping.targets:
-        ping_record = run_ping(
-            host=host,
-            os_adapter=os_adapter,
-            count=args.count
-            if hasattr(args, "count") and args.count is not None
-            else ping_config.count,
-            timeout_ms=args.timeout_ms
-            if hasattr(args, "timeout_ms") and args.timeout_ms is not None
-            else ping_config.timeout_ms,
+    if rules is None:
+        rules = RuleBook(app_config.diagnosis)
+    ping_records = run_ping_batch(
+        hosts=ping_config.targets,
+        os_adapter=os_adapter,
+        count=args.count
+        if hasattr(args, "count") and args.count is not None
+        else ping_config.count,
+        timeout_ms=args.timeout_ms
+        if hasattr(args, "timeout_ms") and args.timeout_ms is not None
+        else ping_config.timeout_ms,
+        session_id=session_id,
+        max_workers=args.max_workers
+        if hasattr(args, "max_workers") and args.max_workers is not None
+        else ping_config.max_workers,
+        engine=args.engine
+        if hasattr(args, "engine") and args.engine is not None
+        else ping_config.engine,
+        on_reply=print_reply if getattr(args, "live", False) else None,
+        rules=rules,
+    )
+
+    store_ping_records(app_config, conn, session_id, ping_records, record_writer, recent)
+    for ping_record in ping_records:
+        print(format_ping_report(ping_record))
+
+    if conn is None:
+        return
+    changes = os_adapter.drain_gateway_changes()
+    if changes:
+        # One commit for every change seen this cycle
+        insert_events_db(
             session_id=session_id,
+            events=[
+                ("gateway_changed",
+                 {"previous": change.previous, "current": change.current},
+                 change.detected_at)
+                for change in changes
+            ],
+            conn=conn,
         )
-        
-        insert_ping_records_db(session_id= session_id, conn=conn, ping_record=ping_record)
-        print(format_ping_report(ping_record))
+
+
+def store_ping_records(app_config, conn, session_id, ping_records, record_writer=None,
+                       recent=None):
+    # In-memory history does not wait on, or depend on, the database
+    if recent is not None:
+        recent.add(ping_records)
+    # Measurements outlive a locked, corrupt or full database: whatever
+    # cannot be stored goes to the spool and is replayed by a later run
+    if conn is None and record_writer is None:
+        spool_ping_records(app_config, ping_records, "no database connection")
+        return
+    try:
+        # One transaction for the whole cycle rather than a commit per target
+        if record_writer is not None:
+            record_writer.insert_batch(session_id=session_id, ping_records=ping_records)
+        else:
+            insert_ping_batch_db(session_id=session_id, ping_records=ping_records, conn=conn)
+    except (sqlite3.Error, OSError) as e:
+        spool_ping_records(app_config, ping_records, e)
+        return
+    # A background writer replays the spool itself once the database is
+    # back; written inline, the first write that succeeds again does it
+    if not isinstance(record_writer, BackgroundWriter):
+        try:
+            replay_spooled_records(app_config, conn, record_writer)
+        except (sqlite3.Error, OSError) as e:
+            print(f"[!] Could not replay spooled records ({e}); they stay spooled")
+
+
+def spool_ping_records(app_config, ping_records, reason):
+    spooled = append_to_spool(spool_path(app_config.database_path), ping_records)
+    print(f"[!] Could not store records ({reason}); spooled {spooled} for replay")
+
+
+def replay_spooled_records(app_config, conn, record_writer=None):
+    spool = spool_path(app_config.database_path)
+    if not spool_pending(spool):
+        return 0
+    partition_writer = None
+    if record_writer is None:
+        partition_writer = open_partition_writer(app_config)
+        record_writer = partition_writer or DatabaseWriter(conn)
+    try:
+        replayed = replay_spool(spool, record_writer)
+    finally:
+        if partition_writer is not None:
+            partition_writer.close()
+    print(f"Replayed {replayed} spooled records")
+    return replayed
+
+
+def print_reply(host, rtt_ms):
+    print(f"     {host}: reply time={rtt_ms:.1f} ms")
 
 
 def cmd_dns(args, app_config, conn, session_id):
@@ -51,6 +178,120 @@ def cmd_run(args, app_config, conn, session_id):
     cmd_ping(args, app_config, conn, session_id)
 
 
+def cmd_daemon(args, app_config, conn, session_id):
+    # Config, OS adapter and the DB connection are set up once and reused by
+    # every cycle instead of once per netdiag invocation
+    os_adapter = get_os_adapter(gateway_ttl_s=app_config.ping.gateway_ttl_s)
+    # With a background writer a slow or locked database never delays a probe
+    if app_config.writer.background:
+        record_writer = open_background_writer(app_config)
+    else:
+        record_writer = open_partition_writer(app_config)
+    recent = open_recent_results(app_config)
+    # Diagnosis rules are compiled once, not on every cycle
+    rules = RuleBook(app_config.diagnosis)
+    scheduler = Scheduler()
+
+    def ping_cycle():
+        try:
+            probe_ping_targets(
+                args, app_config, conn, session_id, os_adapter, record_writer, recent, rules
+            )
+        except Exception as e:
+            # One bad cycle (e.g. the gateway is briefly unresolvable)
+            # must not take the daemon down
+            print(f"[!] ping cycle failed: {e}")
+
+    if app_config.ping.enabled:
+        scheduler.add_job("ping", app_config.ping.interval_s, ping_cycle)
+    if not scheduler.jobs:
+        raise RuntimeError("No probes enabled in config")
+
+    def prune_cycle():
+        try:
+            prune(conn, app_config.retention, layout=partition_layout(app_config))
+        except Exception as e:
+            print(f"[!] prune failed: {e}")
+
+    scheduler.add_job(
+        "prune", app_config.retention.prune_interval_s, prune_cycle, run_immediately=False
+    )
+
+    previous_handler = signal.signal(signal.SIGTERM, lambda signum, frame: scheduler.stop())
+    try:
+        scheduler.run(max_ticks=args.cycles if hasattr(args, "cycles") else None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        signal.signal(signal.SIGTERM, previous_handler)
+        if record_writer is not None:
+            record_writer.close()
+        if getattr(record_writer, "dropped", 0):
+            print(f"[!] {record_writer.dropped} records could not be stored")
+
+
+def cmd_rollups(args, app_config, conn, session_id):
+    if args.action == "rebuild":
+        consumed = rebuild_rollups(conn)
+        print(f"Rebuilt rollups from {consumed} raw record ids")
+    elif args.action == "compact":
+        consumed = compact_rollups(conn)
+        print(f"Rolled up {consumed} pending raw record ids")
+    else:
+        mismatches = check_rollups(conn)
+        for resolution, target, bucket_ts in mismatches:
+            print(f"[!] {resolution} rollup for {target} at {bucket_ts} does not match raw records")
+        if mismatches:
+            raise RuntimeError(f"{len(mismatches)} rollup buckets are inconsistent")
+        print("Rollups match raw records")
+
+
+def cmd_prune(args, app_config, conn, session_id):
+    if args.vacuum:
+        if enable_incremental_vacuum(conn):
+            print("Switched the database to incremental auto_vacuum")
+        else:
+            print("Incremental auto_vacuum is already enabled")
+    report = prune(conn, app_config.retention, layout=partition_layout(app_config))
+    for table, rows in report.deleted.items():
+        print(f"Deleted {rows} rows from {table}")
+    for key in report.dropped_partitions:
+        print(f"Dropped partition {key}")
+    if not report.deleted and not report.dropped_partitions:
+        print("Nothing to prune")
+    print(
+        f"Database size: {report.size_before_bytes / 1024:.0f} KiB -> "
+        f"{report.size_after_bytes / 1024:.0f} KiB"
+    )
+
+
+def cmd_rediagnose(args, app_config, conn, session_id):
+    rules = app_config.diagnosis
+    report = rediagnose_history(conn, since=args.since, until=args.until, rules=rules)
+    layout = partition_layout(app_config)
+    if layout is not None:
+        for partition in layout.overlapping(args.since, args.until):
+            part = open_partition(partition, app_config.storage)
+            try:
+                rediagnose_history(
+                    part, since=args.since, until=args.until, rules=rules, report=report
+                )
+            finally:
+                part.close()
+    print(f"Re-diagnosed {report.records} records, {report.changed} changed cause")
+
+
+def parse_timestamp(value):
+    # Dates and datetimes without an offset are taken as UTC
+    try:
+        timestamp = datetime.fromisoformat(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"not an ISO date or datetime: {value!r}") from None
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return timestamp
+
+
 def build_parser():
     parser = MyParser(prog="netdiag", description="Local-first network diagnostics")
 
@@ -59,6 +300,13 @@ def build_parser():
     ping = sub.add_parser("ping")
     ping.add_argument("--count", "-c", type=int, help="")
     ping.add_argument("--timeout-ms", "-t", type=int, help="")
+    ping.add_argument(
+        "--max-workers", "-j", type=int, help="number of targets to probe concurrently"
+    )
+    ping.add_argument("--engine", choices=PING_ENGINES, help="how echo requests are sent")
+    ping.add_argument(
+        "--live", action="store_true", help="print each reply as it arrives"
+    )
     ping.set_defaults(func=cmd_ping)
 
     dns = sub.add_parser("dns")
@@ -67,22 +315,92 @@ def build_parser():
     run = sub.add_parser("run")
     run.set_defaults(func=cmd_run)
 
+    daemon = sub.add_parser("daemon", help="probe continuously on the configured intervals")
+    daemon.add_argument("--count", "-c", type=int, help="")
+    daemon.add_argument("--timeout-ms", "-t", type=int, help="")
+    daemon.add_argument(
+        "--max-workers", "-j", type=int, help="number of targets to probe concurrently"
+    )
+    daemon.add_argument("--engine", choices=PING_ENGINES, help="how echo requests are sent")
+    daemon.add_argument(
+        "--cycles", type=int, help="stop after this many scheduler ticks (default: run forever)"
+    )
+    daemon.set_defaults(func=cmd_daemon)
+
+    rollups = sub.add_parser("rollups", help="maintain the minute/hour/day rollup tables")
+    rollups.add_argument(
+        "action",
+        choices=("check", "compact", "rebuild"),
+        help="compare with raw records, catch up pending records, or rebuild from scratch",
+    )
+    rollups.set_defaults(func=cmd_rollups)
+
+    prune_cmd = sub.add_parser(
+        "prune", help="delete history past the [retention] windows and enforce the size cap"
+    )
+    prune_cmd.add_argument(
+        "--vacuum", action="store_true",
+        help="first switch a database created before incremental auto_vacuum over to it "
+             "(one full VACUUM: rewrites the whole file)",
+    )
+    prune_cmd.set_defaults(func=cmd_prune)
+
+    rediagnose = sub.add_parser(
+        "rediagnose", help="apply the current diagnosis rules to stored history"
+    )
+    rediagnose.add_argument(
+        "--since", type=parse_timestamp, required=True,
+        help="first record to re-diagnose (ISO date or datetime, UTC unless given)",
+    )
+    rediagnose.add_argument(
+        "--until", type=parse_timestamp, help="stop before this time (default: now)"
+    )
+    rediagnose.set_defaults(func=cmd_rediagnose)
+
     return parser
 
 
+def open_session(stack, app_config, session_id, command):
+    """Open the database, replay the spool and start a session.
+
+    Returns None when the database is locked, corrupt or out of space; the
+    command then runs without it and its records are spooled.
+    """
+    conn = None
+    try:
+        conn = stack.enter_context(
+            get_db_connection(app_config.database_path, app_config.storage)
+        )
+        create_db(conn)
+        try:
+            replay_spooled_records(app_config, conn)
+        except (sqlite3.Error, OSError) as e:
+            # The claimed spool is kept and replayed by a later write or run
+            print(f"[!] Could not replay spooled records ({e}); they stay spooled")
+            conn.rollback()
+        insert_sessions_db(session_id=session_id, command=command, conn=conn)
+        return conn
+    except sqlite3.Error as e:
+        print(f"[!] Database unavailable: {e}")
+        if conn is not None:
+            conn.rollback()
+        return None
+
+
 def main() -> None:
     parser = build_parser()
     args = parser.parse_args()
     app_config = load_config()
     session_id = str(uuid.uuid4())
-    
-    with get_db_connection(app_config.database_path) as conn:
-        create_db(conn)
-        insert_sessions_db(
-            session_id=session_id,
-            command=args.command,
-            conn=conn,
-        )
+
+    with ExitStack() as stack:
+        conn = open_session(stack, app_config, session_id, args.command)
+        if conn is None:
+            try:
+                args.func(args, app_config, None, session_id)
+            except Exception as e:
+                print(f"[!] {args.command} failed: {e}")
+            return None
 
         try:
             args.func(args, app_config, conn, session_id)
@@ -92,4 +410,4 @@ def main() -> None:
         finally:
             update_session_status_db(session_id=session_id, status=status, conn=conn)
 
-    return None
\ No newline at end of file
+    return None
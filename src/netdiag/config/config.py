@@ -1,7 +1,10 @@
 # config.py is used for loading configurations from config.toml
 
 import tomllib
-from dataclasses import dataclass
+from collections.abc import Mapping
+from dataclasses import dataclass, field, replace
+
+import netdiag.data.ping as ping
 
 from .loader import ensure_config_file
 
@@ -24,6 +27,15 @@ class PingConfig(Config):
     count: int
     timeout_ms: int
     interval_s: int
+    # Upper bound on targets probed at the same time within one cycle
+    max_workers: int = 8
+    # "system" runs the OS ping binary, "icmp" uses native ICMP sockets
+    engine: str = "system"
+    # How long a resolved "gateway" target is reused; 0 looks it up every probe
+    gateway_ttl_s: int = 30
+    # Results per target the daemon keeps in memory for live views and
+    # alerts; 0 keeps none
+    recent_results: int = 120
 
 
 @dataclass(frozen=True)
@@ -31,11 +43,93 @@ class DnsConfig(Config):
     targets: list[str]
 
 
+JOURNAL_MODES = ("wal", "delete", "truncate", "persist", "memory", "off")
+SYNCHRONOUS_LEVELS = ("off", "normal", "full", "extra")
+PARTITION_MODES = ("none", "day", "month")
+OVERFLOW_POLICIES = ("spill", "drop")
+
+
+@dataclass(frozen=True)
+class StorageConfig:
+    # WAL lets report readers work on a snapshot while the prober writes
+    journal_mode: str = "wal"
+    # In WAL mode "normal" only syncs at checkpoints and stays crash-safe
+    synchronous: str = "normal"
+    # SQLite semantics: negative is KiB, positive is pages
+    cache_size: int = -8192
+    # Bytes of the database file read through mmap; 0 disables it
+    mmap_size: int = 64 * 1024 * 1024
+    # How long a connection waits on a lock before "database is locked"
+    busy_timeout_ms: int = 5000
+    # "day" or "month" writes raw records to one file per period next to
+    # database_path; "none" keeps everything in database_path
+    partition: str = "none"
+
+
+@dataclass(frozen=True)
+class RetentionConfig:
+    # Days kept per resolution; 0 keeps that resolution forever
+    raw_days: int = 30
+    minute_rollup_days: int = 90
+    hour_rollup_days: int = 730
+    day_rollup_days: int = 0
+    # Hard cap on the database size in MiB, enforced by dropping the oldest
+    # data first; 0 disables the cap
+    max_db_mb: int = 0
+    # How often the daemon prunes
+    prune_interval_s: int = 3600
+
+
+@dataclass(frozen=True)
+class WriterConfig:
+    # The daemon hands records to a writer thread instead of writing inline
+    background: bool = True
+    # Probe cycles waiting for the writer before the overflow policy applies
+    max_pending_cycles: int = 100
+    # A commit is made once this many records are waiting...
+    batch_records: int = 500
+    # ...or this long after the first of them arrived
+    flush_interval_ms: int = 1000
+    # "spill" appends cycles that do not fit to a file next to the database
+    # and writes them later; "drop" discards them
+    overflow: str = "spill"
+
+
+# Cause names in the order diagnose_from_signals checks them
+CAUSE_PRECEDENCE = ("no_connectivity", "high_loss", "unstable_jitter", "high_latency")
+
+
+@dataclass(frozen=True)
+class DiagnosisConfig:
+    # Signal thresholds; the defaults are the data.ping constants
+    high_loss_pct: float = ping.HIGH_PACKET_LOSS_THRESHOLD_PCT
+    high_latency_ms: float = ping.HIGH_LATENCY_THRESHOLD_MS
+    unstable_jitter_ratio: float = ping.UNSTABLE_JITTER
+    unstable_jitter_ms: float = ping.UNSTABLE_JITTER_ABS_MS
+    unstable_deviation: float = ping.UNSTABLE_DEVIATION
+    unstable_rtt_spread_ms: float = ping.UNSTABLE_RTT_SPREAD_MS
+    # Confidence tiers: 0.95 at or above the first value, 0.85 at or above
+    # the second, 0.70 below
+    loss_tiers_pct: tuple[float, float] = (ping.LOSS_T1, ping.LOSS_T2)
+    latency_tiers_ms: tuple[float, float] = (ping.LAT_T1, ping.LAT_T2)
+    jitter_ratio_tiers: tuple[float, float] = (ping.JIT_R1, ping.JIT_R2)
+    jitter_tiers_ms: tuple[float, float] = (ping.JIT_A1, ping.JIT_A2)
+    # Causes in the order they are checked; the first whose signal is set wins
+    precedence: tuple[str, ...] = CAUSE_PRECEDENCE
+    # Complete rules for targets with their own budget (e.g. a satellite
+    # link), keyed by the target as written in ping.targets
+    targets: Mapping[str, "DiagnosisConfig"] = field(default_factory=dict)
+
+
 @dataclass(frozen=True)
 class AppConfig:
     ping: PingConfig
     # dns: DnsConfig
     database_path: str = "netdiag.db"
+    storage: StorageConfig = StorageConfig()
+    retention: RetentionConfig = RetentionConfig()
+    writer: WriterConfig = WriterConfig()
+    diagnosis: DiagnosisConfig = DiagnosisConfig()
 
 def parse_ping_config(raw: dict) -> PingConfig:
     try:
@@ -46,6 +140,10 @@ def parse_ping_config(raw: dict) -> PingConfig:
         interval_s = raw["interval_s"]
     except KeyError as e:
         raise ValueError(f"Missing ping config key: {e}") from None
+    max_workers = raw.get("max_workers", PingConfig.max_workers)
+    engine = raw.get("engine", PingConfig.engine)
+    gateway_ttl_s = raw.get("gateway_ttl_s", PingConfig.gateway_ttl_s)
+    recent_results = raw.get("recent_results", PingConfig.recent_results)
 
     if not isinstance(enabled, bool):
         raise ValueError("ping.enabled must be a boolean")
@@ -62,15 +160,153 @@ def parse_ping_config(raw: dict) -> PingConfig:
     if not isinstance(interval_s, int) or interval_s <= 0:
         raise ValueError("ping.interval_s must be a positive integer")
 
+    if not isinstance(max_workers, int) or max_workers <= 0:
+        raise ValueError("ping.max_workers must be a positive integer")
+
+    if engine not in ("system", "icmp"):
+        raise ValueError('ping.engine must be "system" or "icmp"')
+
+    if not isinstance(gateway_ttl_s, int) or gateway_ttl_s < 0:
+        raise ValueError("ping.gateway_ttl_s must be a non-negative integer")
+
+    if not isinstance(recent_results, int) or recent_results < 0:
+        raise ValueError("ping.recent_results must be a non-negative integer")
+
     return PingConfig(
         enabled=enabled,
         targets=targets,
         count=count,
         timeout_ms=timeout_ms,
         interval_s=interval_s,
+        max_workers=max_workers,
+        engine=engine,
+        gateway_ttl_s=gateway_ttl_s,
+        recent_results=recent_results,
     )
 
 
+def parse_storage_config(raw: dict) -> StorageConfig:
+    journal_mode = raw.get("journal_mode", StorageConfig.journal_mode)
+    synchronous = raw.get("synchronous", StorageConfig.synchronous)
+    cache_size = raw.get("cache_size", StorageConfig.cache_size)
+    mmap_size = raw.get("mmap_size", StorageConfig.mmap_size)
+    busy_timeout_ms = raw.get("busy_timeout_ms", StorageConfig.busy_timeout_ms)
+    partition = raw.get("partition", StorageConfig.partition)
+
+    if not isinstance(journal_mode, str) or journal_mode.lower() not in JOURNAL_MODES:
+        raise ValueError(f"storage.journal_mode must be one of {', '.join(JOURNAL_MODES)}")
+
+    if not isinstance(synchronous, str) or synchronous.lower() not in SYNCHRONOUS_LEVELS:
+        raise ValueError(f"storage.synchronous must be one of {', '.join(SYNCHRONOUS_LEVELS)}")
+
+    if not isinstance(cache_size, int) or isinstance(cache_size, bool):
+        raise ValueError("storage.cache_size must be an integer")
+
+    if not isinstance(mmap_size, int) or mmap_size < 0:
+        raise ValueError("storage.mmap_size must be a non-negative integer")
+
+    if not isinstance(busy_timeout_ms, int) or busy_timeout_ms < 0:
+        raise ValueError("storage.busy_timeout_ms must be a non-negative integer")
+
+    if partition not in PARTITION_MODES:
+        raise ValueError(f"storage.partition must be one of {', '.join(PARTITION_MODES)}")
+
+    return StorageConfig(
+        journal_mode=journal_mode.lower(),
+        synchronous=synchronous.lower(),
+        cache_size=cache_size,
+        mmap_size=mmap_size,
+        busy_timeout_ms=busy_timeout_ms,
+        partition=partition,
+    )
+
+
+def parse_retention_config(raw: dict) -> RetentionConfig:
+    values = {}
+    for key in ("raw_days", "minute_rollup_days", "hour_rollup_days", "day_rollup_days",
+                "max_db_mb"):
+        value = raw.get(key, getattr(RetentionConfig, key))
+        if not isinstance(value, int) or isinstance(value, bool) or value < 0:
+            raise ValueError(f"retention.{key} must be a non-negative integer")
+        values[key] = value
+
+    prune_interval_s = raw.get("prune_interval_s", RetentionConfig.prune_interval_s)
+    if (not isinstance(prune_interval_s, int) or isinstance(prune_interval_s, bool)
+            or prune_interval_s <= 0):
+        raise ValueError("retention.prune_interval_s must be a positive integer")
+
+    return RetentionConfig(**values, prune_interval_s=prune_interval_s)
+
+
+def parse_writer_config(raw: dict) -> WriterConfig:
+    background = raw.get("background", WriterConfig.background)
+    overflow = raw.get("overflow", WriterConfig.overflow)
+
+    if not isinstance(background, bool):
+        raise ValueError("writer.background must be a boolean")
+
+    values = {}
+    for key in ("max_pending_cycles", "batch_records", "flush_interval_ms"):
+        value = raw.get(key, getattr(WriterConfig, key))
+        if not isinstance(value, int) or isinstance(value, bool) or value <= 0:
+            raise ValueError(f"writer.{key} must be a positive integer")
+        values[key] = value
+
+    if overflow not in OVERFLOW_POLICIES:
+        raise ValueError(f"writer.overflow must be one of {', '.join(OVERFLOW_POLICIES)}")
+
+    return WriterConfig(background=background, overflow=overflow, **values)
+
+
+_THRESHOLD_KEYS = ("high_loss_pct", "high_latency_ms", "unstable_jitter_ratio",
+                   "unstable_jitter_ms", "unstable_deviation", "unstable_rtt_spread_ms")
+_TIER_KEYS = ("loss_tiers_pct", "latency_tiers_ms", "jitter_ratio_tiers", "jitter_tiers_ms")
+
+
+def _parse_rules(raw: dict, where: str) -> dict:
+    # The rule keys present in raw, validated; absent keys are left out
+    values = {}
+    for key in _THRESHOLD_KEYS:
+        if key in raw:
+            value = raw[key]
+            if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+                raise ValueError(f"{where}.{key} must be a non-negative number")
+            values[key] = float(value)
+
+    for key in _TIER_KEYS:
+        if key in raw:
+            value = raw[key]
+            if (not isinstance(value, list) or len(value) != 2
+                    or not all(isinstance(v, (int, float)) and not isinstance(v, bool)
+                               for v in value)
+                    or value[0] < value[1]):
+                raise ValueError(f"{where}.{key} must be two numbers, highest tier first")
+            values[key] = (float(value[0]), float(value[1]))
+
+    if "precedence" in raw:
+        precedence = raw["precedence"]
+        if not isinstance(precedence, list) or sorted(precedence) != sorted(CAUSE_PRECEDENCE):
+            raise ValueError(
+                f"{where}.precedence must list each of {', '.join(CAUSE_PRECEDENCE)} once"
+            )
+        values["precedence"] = tuple(precedence)
+    return values
+
+
+def parse_diagnosis_config(raw: dict) -> DiagnosisConfig:
+    base = DiagnosisConfig(**_parse_rules(raw, "diagnosis"))
+
+    targets = raw.get("targets", {})
+    if not isinstance(targets, dict) or not all(isinstance(t, dict) for t in targets.values()):
+        raise ValueError("diagnosis.targets must be a table of per-target tables")
+    # Overrides start from the [diagnosis] rules, not the built-in defaults
+    overrides = {
+        target: replace(base, **_parse_rules(override, f"diagnosis.targets.{target}"))
+        for target, override in targets.items()
+    }
+    return replace(base, targets=overrides)
+
+
 # Currently only load ping_config
 # TODO: modify the function to integrate for further config file uses
 def load_config() -> AppConfig:
@@ -78,4 +314,14 @@ def load_config() -> AppConfig:
     with config_file_path.open("rb") as f:
         config_raw = tomllib.load(f)
     ping_config = parse_ping_config(config_raw["probes"]["ping"])
-    return AppConfig(ping=ping_config)
+    storage_config = parse_storage_config(config_raw.get("storage", {}))
+    retention_config = parse_retention_config(config_raw.get("retention", {}))
+    writer_config = parse_writer_config(config_raw.get("writer", {}))
+    diagnosis_config = parse_diagnosis_config(config_raw.get("diagnosis", {}))
+    return AppConfig(
+        ping=ping_config,
+        storage=storage_config,
+        retention=retention_config,
+        writer=writer_config,
+        diagnosis=diagnosis_config,
+    )
@@ -4,5 +4,41 @@ enabled = true
 targets = ["1.1.1.1", "8.8.8.8", "gateway"]
 count = 5
 timeout_ms = 1000
-interval_s = 60\
+interval_s = 60
+max_workers = 8
+engine = "system"
+gateway_ttl_s = 30
+recent_results = 120
+
+[storage]
+journal_mode = "wal"
+synchronous = "normal"
+cache_size = -8192
+mmap_size = 67108864
+busy_timeout_ms = 5000
+partition = "none"
+
+[retention]
+raw_days = 30
+minute_rollup_days = 90
+hour_rollup_days = 730
+day_rollup_days = 0
+max_db_mb = 0
+prune_interval_s = 3600
+
+[writer]
+background = true
+max_pending_cycles = 100
+batch_records = 500
+flush_interval_ms = 1000
+overflow = "spill"
+
+[diagnosis]
+high_loss_pct = 5.0
+high_latency_ms = 150
+unstable_jitter_ratio = 0.25
+unstable_jitter_ms = 5.0
+unstable_deviation = 0.30
+unstable_rtt_spread_ms = 100.0
+precedence = ["no_connectivity", "high_loss", "unstable_jitter", "high_latency"]\
 """
@@ -1,3 +1,4 @@
+from array import array
 from dataclasses import dataclass
 from datetime import datetime
 from enum import Enum
@@ -35,6 +36,17 @@ CAUSE_SUMMARY = {
     DiagnosisCause.OK: "Connection appears normal.",
 }
 
+# Stable codes causes are stored under; never renumber, only append
+CAUSE_CODES = {
+    DiagnosisCause.OK: 0,
+    DiagnosisCause.NO_CONNECTIVITY: 1,
+    DiagnosisCause.HIGH_LOSS: 2,
+    DiagnosisCause.UNSTABLE_JITTER: 3,
+    DiagnosisCause.HIGH_LATENCY: 4,
+}
+
+CAUSES_BY_CODE = {code: cause for cause, code in CAUSE_CODES.items()}
+
 # This cause evidence fields could be refactored into metrics and reasoning
 # in the future if needed as it would be benefit to show multiple signals
 # as evidence
@@ -69,7 +81,8 @@ CAUSE_EVIDENCE_FIELDS = {
 @dataclass(frozen=True, slots=True)
 class PingParseResult:
     address: str
-    times_ms: list[float]
+    # Unboxed doubles; the parsers fill an array('d') as replies arrive
+    times_ms: array | list[float]
     sent: int
     received: int
     loss_pct: float
@@ -79,9 +92,18 @@ class PingParseResult:
     rtt_stddev_ms: float
     jitter: float
     jitter_ratio: float
+    # Set when ping was stopped at its deadline and the result was salvaged
+    # from partial output
+    truncated: bool = False
+    # Index (from 0) of the request each entry of times_ms answered; None
+    # when the output does not say which requests got a reply
+    reply_seqs: list[int] | None = None
 
 
-@dataclass
+# Records are slotted and, apart from PingRecord, frozen: an analysis job
+# holding a million of them pays for the fields only, and one metrics or
+# diagnosis object can be shared by every record that needs it
+@dataclass(frozen=True, slots=True)
 class PingMetrics:
     sent: int
     received: int
@@ -94,17 +116,80 @@ class PingMetrics:
     jitter_ratio: float
 
 
-@dataclass
+# Bit i of a stored signals integer is SIGNAL_FIELDS[i]; never reorder
+SIGNAL_FIELDS = (
+    "no_reply",
+    "any_loss",
+    "high_loss",
+    "high_latency",
+    "unstable_jitter",
+    "unstable",
+)
+
+
+def _signal(field: str) -> property:
+    mask = 1 << SIGNAL_FIELDS.index(field)
+    return property(lambda self: bool(self.bits & mask))
+
+
 class PingSignals:
-    no_reply: bool
-    any_loss: bool
-    high_loss: bool
-    high_latency: bool
-    unstable_jitter: bool
-    unstable: bool
+    """Threshold signals of one run, packed into one int.
+
+    Bit i of bits is SIGNAL_FIELDS[i], the same layout the database stores,
+    so to_bits() and from_bits() are free. Read-only, like a frozen
+    dataclass.
+    """
+
+    __slots__ = ("bits",)
+
+    def __init__(self,
+                 no_reply: bool,
+                 any_loss: bool,
+                 high_loss: bool,
+                 high_latency: bool,
+                 unstable_jitter: bool,
+                 unstable: bool):
+        bits = 0
+        for i, value in enumerate(
+            (no_reply, any_loss, high_loss, high_latency, unstable_jitter, unstable)
+        ):
+            if value:
+                bits |= 1 << i
+        object.__setattr__(self, "bits", bits)
+
+    no_reply = _signal("no_reply")
+    any_loss = _signal("any_loss")
+    high_loss = _signal("high_loss")
+    high_latency = _signal("high_latency")
+    unstable_jitter = _signal("unstable_jitter")
+    unstable = _signal("unstable")
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"cannot assign to field {name!r}")
+
+    def __eq__(self, other):
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self.bits == other.bits
+
+    def __hash__(self):
+        return hash(self.bits)
+
+    def __repr__(self):
+        fields = ", ".join(f"{field}={getattr(self, field)}" for field in SIGNAL_FIELDS)
+        return f"PingSignals({fields})"
+
+    def to_bits(self) -> int:
+        return self.bits
+
+    @classmethod
+    def from_bits(cls, bits: int) -> "PingSignals":
+        signals = cls.__new__(cls)
+        object.__setattr__(signals, "bits", bits)
+        return signals
 
 
-@dataclass
+@dataclass(frozen=True, slots=True)
 class PingDiagnosis:
     cause: DiagnosisCause
     summary: str
@@ -112,7 +197,8 @@ class PingDiagnosis:
     evidence: dict[str, float]
 
 
-@dataclass
+# Mutable, unlike its parts, so a record can be restamped after it is built
+@dataclass(slots=True)
 class PingRecord:
     session_id: str
     timestamp: datetime
@@ -120,6 +206,18 @@ class PingRecord:
     metrics: PingMetrics
     signals: PingSignals
     diagnosis: PingDiagnosis
+    # RTT of every request as a samples.encode_samples() BLOB, NaN where a
+    # request was lost; None when the individual replies were not kept
+    rtt_samples: bytes | None = None
+    # Replies as a histogram.build_histogram() BLOB, for percentiles that
+    # merge across records; None without replies or kept reply times
+    rtt_hist: bytes | None = None
+    # The target as written in ping.targets (e.g. "gateway") when it was
+    # probed under a different address; per-target rules are keyed by it
+    configured_target: str | None = None
+    # ping was stopped at its deadline; requests it had not answered by then
+    # count as lost, which may be the deadline rather than the network
+    truncated: bool = False
 
 
 class PingParseError(ValueError):
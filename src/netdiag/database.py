@@ -1,14 +1,39 @@
 import json
 import sqlite3
+from collections.abc import Iterable, Sequence
 from contextlib import contextmanager
+from datetime import datetime
 from pathlib import Path
 
-from netdiag.data.ping import PingRecord
+from netdiag.config.config import StorageConfig
+from netdiag.data.ping import CAUSE_CODES, PingRecord
+from netdiag.histogram import register_sql_functions
+from netdiag.migrations import migrate
+from netdiag.rollups import roll_up_pending
+from netdiag.samples import decode_samples
+
+
+def apply_storage_pragmas(conn: sqlite3.Connection, storage: StorageConfig) -> None:
+    # PRAGMA values cannot be bound as parameters; StorageConfig is validated
+    # when it is loaded and the numbers are forced through int() here
+    # auto_vacuum is chosen for new files only, before WAL is switched on.
+    # An existing file keeps its mode: a FULL one would otherwise switch
+    # straight away (see retention.enable_incremental_vacuum)
+    if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute(f"PRAGMA busy_timeout = {int(storage.busy_timeout_ms)}")
+    conn.execute(f"PRAGMA journal_mode = {storage.journal_mode}")
+    conn.execute(f"PRAGMA synchronous = {storage.synchronous}")
+    conn.execute(f"PRAGMA cache_size = {int(storage.cache_size)}")
+    conn.execute(f"PRAGMA mmap_size = {int(storage.mmap_size)}")
 
 
 @contextmanager
-def get_db_connection(db_path: Path):
+def get_db_connection(db_path: Path, storage: StorageConfig | None = None):
     conn = sqlite3.connect(db_path)
+    apply_storage_pragmas(conn, storage if storage is not None else StorageConfig())
+    # Rollups merge histograms in SQL (hist_merge, hist_add)
+    register_sql_functions(conn)
     try:
         yield conn
         conn.commit()
@@ -19,52 +44,12 @@ def get_db_connection(db_path: Path):
         conn.close()
 
 def create_db(conn: sqlite3.Connection) -> None:
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS sessions (
-            session_id TEXT PRIMARY KEY, 
-            command TEXT NOT NULL,
-            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            completed_at TIMESTAMP,
-            status TEXT NOT NULL
-        )
-    ''')
+    """Create or upgrade the schema; a single pragma read when it is current."""
+    migrate(conn)
 
-    conn.execute('''
-        CREATE TABLE IF NOT EXISTS ping_records (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            session_id TEXT NOT NULL,
-            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-            target TEXT NOT NULL,
-            
-            -- Metrics
-            sent INTEGER,
-            received INTEGER,
-            loss_pct REAL,
-            rtt_min_ms REAL,
-            rtt_avg_ms REAL,
-            rtt_max_ms REAL,
-            rtt_stddev_ms REAL,
-            jitter REAL,
-            jitter_ratio REAL,
-            
-            -- Signals 
-            no_reply BOOLEAN,
-            any_loss BOOLEAN,
-            high_loss BOOLEAN,
-            high_latency BOOLEAN,
-            unstable_jitter BOOLEAN,
-            unstable BOOLEAN,
-            
-            -- Diagnosis
-            diagnosis_cause TEXT,
-            diagnosis_confidence REAL,
-            diagnosis_summary TEXT,
-            diagnosis_evidence TEXT,  -- JSON string
-            
-            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
-        );
-    ''')
 
+def to_epoch_ms(timestamp: datetime) -> int:
+    return int(timestamp.timestamp() * 1000)
 
 
 def insert_sessions_db(*, session_id: str, 
@@ -92,21 +77,57 @@ def update_session_status_db(*,
     
     conn.commit()
 
-def insert_ping_records_db(*, 
-                           session_id: str, 
-                           ping_record: PingRecord, 
-                           conn: sqlite3.Connection) -> None:
-    conn.execute('''
-        INSERT INTO ping_records (
-            session_id, timestamp, target,
-            sent, received, loss_pct, rtt_min_ms, rtt_avg_ms, rtt_max_ms, rtt_stddev_ms,
-            jitter, jitter_ratio,
-            no_reply, any_loss, high_loss, high_latency, unstable_jitter, unstable,
-            diagnosis_cause, diagnosis_confidence, diagnosis_summary, diagnosis_evidence
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
+# configured_name is what the target was probed as ("gateway" for the
+# resolved gateway address); the latest known one is kept
+_INSERT_TARGET_SQL = '''
+    INSERT INTO targets (name, configured_name) VALUES (?, ?)
+    ON CONFLICT (name) DO UPDATE SET configured_name = excluded.configured_name
+    WHERE excluded.configured_name IS NOT NULL
+'''
+
+# Summary and evidence are not stored; the ping_records view derives them
+_INSERT_PING_RESULT_SQL = '''
+    INSERT INTO ping_results (
+        session_id, ts, target_id,
+        sent, received, loss_pct, rtt_min_ms, rtt_avg_ms, rtt_max_ms, rtt_stddev_ms,
+        jitter, jitter_ratio,
+        signals, cause, confidence, rtt_samples, rtt_hist, truncated
+    ) VALUES (?, ?, (SELECT id FROM targets WHERE name = ?),
+              ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# Same parameters as _INSERT_PING_RESULT_SQL, but a record already stored
+# for the same (session_id, target, ts) is skipped, so replaying a spool
+# twice stores each record once. The check is a seek on (target_id, ts).
+_INSERT_PING_RESULT_DEDUPE_SQL = '''
+    WITH new (
+        session_id, ts, target,
+        sent, received, loss_pct, rtt_min_ms, rtt_avg_ms, rtt_max_ms, rtt_stddev_ms,
+        jitter, jitter_ratio,
+        signals, cause, confidence, rtt_samples, rtt_hist, truncated
+    ) AS (VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?))
+    INSERT INTO ping_results (
+        session_id, ts, target_id,
+        sent, received, loss_pct, rtt_min_ms, rtt_avg_ms, rtt_max_ms, rtt_stddev_ms,
+        jitter, jitter_ratio,
+        signals, cause, confidence, rtt_samples, rtt_hist, truncated
+    )
+    SELECT n.session_id, n.ts, t.id,
+           n.sent, n.received, n.loss_pct, n.rtt_min_ms, n.rtt_avg_ms, n.rtt_max_ms,
+           n.rtt_stddev_ms, n.jitter, n.jitter_ratio,
+           n.signals, n.cause, n.confidence, n.rtt_samples, n.rtt_hist, n.truncated
+    FROM new n
+    JOIN targets t ON t.name = n.target
+    WHERE NOT EXISTS (
+        SELECT 1 FROM ping_results r
+        WHERE r.target_id = t.id AND r.ts = n.ts AND r.session_id = n.session_id
+    )
+'''
+
+def ping_record_row(session_id: str, ping_record: PingRecord) -> tuple:
+    return (
         session_id, 
-        ping_record.timestamp,
+        to_epoch_ms(ping_record.timestamp),
         ping_record.target,
         # Metrics
         ping_record.metrics.sent,
@@ -118,18 +139,112 @@ def insert_ping_records_db(*,
         ping_record.metrics.rtt_stddev_ms,
         ping_record.metrics.jitter,
         ping_record.metrics.jitter_ratio,
-        # Signals (all 6 fields from PingSignals)
-        int(ping_record.signals.no_reply),
-        int(ping_record.signals.any_loss),
-        int(ping_record.signals.high_loss),
-        int(ping_record.signals.high_latency),
-        int(ping_record.signals.unstable_jitter),
-        int(ping_record.signals.unstable),
+        # Signals (all 6 fields from PingSignals, one bit each)
+        ping_record.signals.to_bits(),
         # Diagnosis
-        ping_record.diagnosis.cause.value, 
+        CAUSE_CODES[ping_record.diagnosis.cause],
         ping_record.diagnosis.confidence,
-        ping_record.diagnosis.summary,
-        json.dumps(ping_record.diagnosis.evidence) 
-    ))
+        # Per-request RTTs and their histogram, already packed
+        ping_record.rtt_samples,
+        ping_record.rtt_hist,
+        # Stopped at its deadline
+        ping_record.truncated,
+    )
+
+def insert_ping_records_db(*, 
+                           session_id: str, 
+                           ping_record: PingRecord, 
+                           conn: sqlite3.Connection) -> None:
+    conn.execute(_INSERT_TARGET_SQL, (ping_record.target, ping_record.configured_target))
+    conn.execute(_INSERT_PING_RESULT_SQL, ping_record_row(session_id, ping_record))
+    roll_up_pending(conn)
     
     conn.commit()
+
+def insert_ping_batch_db(*,
+                         session_id: str,
+                         ping_records: Iterable[PingRecord],
+                         conn: sqlite3.Connection,
+                         dedupe: bool = False) -> None:
+    """Write a whole probe cycle in one transaction, so one commit (and fsync)
+    covers every record instead of one per target.
+
+    With dedupe, records already stored are skipped (spool replay).
+    """
+    ping_records = list(ping_records)
+    with conn:
+        configured = {}
+        for r in ping_records:
+            configured[r.target] = r.configured_target or configured.get(r.target)
+        conn.executemany(_INSERT_TARGET_SQL, configured.items())
+        conn.executemany(
+            _INSERT_PING_RESULT_DEDUPE_SQL if dedupe else _INSERT_PING_RESULT_SQL,
+            (ping_record_row(session_id, ping_record) for ping_record in ping_records),
+        )
+        # Rollups move in the same transaction, so they never miss a batch
+        roll_up_pending(conn)
+
+def select_ping_history_db(*,
+                          target: str,
+                          since: datetime,
+                          until: datetime | None = None,
+                          conn: sqlite3.Connection,
+                          schema: str = "main") -> list[tuple]:
+    """Records for one target in [since, until), oldest first.
+
+    Served by a range scan on (target_id, ts) however long the history is.
+    Rows are (ts, sent, received, loss_pct, rtt_min_ms, rtt_avg_ms,
+    rtt_max_ms, rtt_stddev_ms, jitter, jitter_ratio, diagnosis_cause).
+    schema names an attached database to read instead of main.
+    """
+    until_ms = to_epoch_ms(until) if until is not None else 2**63 - 1
+    return conn.execute(f'''
+        SELECT ts, sent, received, loss_pct, rtt_min_ms, rtt_avg_ms, rtt_max_ms,
+               rtt_stddev_ms, jitter, jitter_ratio, diagnosis_cause
+        FROM {schema}.ping_records
+        WHERE target = ? AND ts >= ? AND ts < ?
+        ORDER BY ts
+    ''', (target, to_epoch_ms(since), until_ms)).fetchall()
+
+def select_rtt_samples_db(*,
+                          target: str,
+                          since: datetime,
+                          until: datetime | None = None,
+                          conn: sqlite3.Connection,
+                          schema: str = "main") -> list[tuple[int, Sequence[float]]]:
+    """Per-request RTTs of one target in [since, until), oldest first.
+
+    Rows are (ts, samples) with samples decoded in place by
+    samples.decode_samples; records stored without samples are left out.
+    """
+    until_ms = to_epoch_ms(until) if until is not None else 2**63 - 1
+    rows = conn.execute(f'''
+        SELECT r.ts, r.rtt_samples
+        FROM {schema}.ping_results r
+        JOIN {schema}.targets t ON t.id = r.target_id
+        WHERE t.name = ? AND r.ts >= ? AND r.ts < ? AND r.rtt_samples IS NOT NULL
+        ORDER BY r.ts
+    ''', (target, to_epoch_ms(since), until_ms)).fetchall()
+    return [(ts, decode_samples(blob)) for ts, blob in rows]
+
+def insert_event_db(*,
+                    session_id: str,
+                    kind: str,
+                    detail: dict,
+                    timestamp: datetime,
+                    conn: sqlite3.Connection) -> None:
+    insert_events_db(session_id=session_id, events=[(kind, detail, timestamp)], conn=conn)
+
+def insert_events_db(*,
+                     session_id: str,
+                     events: Iterable[tuple[str, dict, datetime]],
+                     conn: sqlite3.Connection) -> None:
+    """Write (kind, detail, timestamp) events in one transaction, e.g. every
+    gateway change seen in a probe cycle."""
+    with conn:
+        conn.executemany('''
+            INSERT INTO events (session_id, timestamp, kind, detail) VALUES (?, ?, ?, ?)
+        ''', (
+            (session_id, timestamp, kind, json.dumps(detail))
+            for kind, detail, timestamp in events
+        ))
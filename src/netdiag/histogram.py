@@ -0,0 +1,146 @@
+"""Mergeable log-bucketed RTT histograms.
+
+Every histogram shares one fixed layout: bucket 0 holds RTTs up to MIN_MS,
+bucket i covers (MIN_MS * GAMMA**(i - 1), MIN_MS * GAMMA**i], and RTTs
+above MAX_MS are counted in the last bucket. Reporting a bucket by
+bucket_value() is within RELATIVE_ACCURACY of any RTT in it, the DDSketch
+guarantee, so a quantile read from a histogram is within 1% of the true
+sample quantile. Because the layout is fixed, merging histograms is adding
+counts bucket by bucket: a minute, hour or day of probes merges into one
+histogram with the same accuracy as a single probe's.
+
+Histograms are stored sparsely, as the little-endian bytes of the sorted
+bucket indexes (array('H')) followed by their counts (array('I')): 6 bytes
+per bucket in use, so a 5-probe cycle costs at most 30 bytes. Encoding is
+canonical, so equal histograms have equal bytes.
+
+register_sql_functions() adds hist_merge(blob), an aggregate, and
+hist_add(a, b) to a connection, so rollups can merge histograms in SQL.
+"""
+
+import math
+import sqlite3
+import sys
+from array import array
+from collections.abc import Iterable, Mapping, Sequence
+
+RELATIVE_ACCURACY = 0.01
+GAMMA = (1 + RELATIVE_ACCURACY) / (1 - RELATIVE_ACCURACY)
+MIN_MS = 0.01
+MAX_MS = 120_000.0
+BUCKETS = math.ceil(math.log(MAX_MS / MIN_MS, GAMMA)) + 1
+
+DEFAULT_QUANTILES = (0.5, 0.95, 0.99)
+
+_LOG_GAMMA = math.log(GAMMA)
+
+
+def bucket_index(ms: float) -> int:
+    if ms <= MIN_MS:
+        return 0
+    return min(BUCKETS - 1, math.ceil(math.log(ms / MIN_MS) / _LOG_GAMMA))
+
+
+def bucket_value(index: int) -> float:
+    """The RTT a bucket stands for: within RELATIVE_ACCURACY of its range."""
+    if index == 0:
+        return MIN_MS
+    return 2 * MIN_MS * GAMMA**index / (GAMMA + 1)
+
+
+def histogram_counts(times_ms: Iterable[float]) -> dict[int, int]:
+    """Count of RTTs per bucket; NaN (a lost request) is skipped."""
+    counts: dict[int, int] = {}
+    for ms in times_ms:
+        if ms == ms:
+            index = bucket_index(ms)
+            counts[index] = counts.get(index, 0) + 1
+    return counts
+
+
+def build_histogram(times_ms: Iterable[float]) -> bytes | None:
+    """Encoded histogram of times_ms, or None if there were no replies."""
+    return encode_histogram(histogram_counts(times_ms))
+
+
+def encode_histogram(counts: Mapping[int, int]) -> bytes | None:
+    if not counts:
+        return None
+    indexes = array("H", sorted(counts))
+    values = array("I", [counts[i] for i in indexes])
+    if sys.byteorder == "big":
+        indexes.byteswap()
+        values.byteswap()
+    return indexes.tobytes() + values.tobytes()
+
+
+def decode_histogram(blob: bytes | None) -> dict[int, int]:
+    if not blob:
+        return {}
+    n = len(blob) // 6
+    indexes = array("H", blob[:2 * n])
+    values = array("I", blob[2 * n:])
+    if sys.byteorder == "big":
+        indexes.byteswap()
+        values.byteswap()
+    return dict(zip(indexes, values))
+
+
+def merge_counts(into: dict[int, int], blob: bytes | None) -> dict[int, int]:
+    """Add the histogram in blob to into, in place, and return into."""
+    for index, count in decode_histogram(blob).items():
+        into[index] = into.get(index, 0) + count
+    return into
+
+
+def merge_histograms(blobs: Iterable[bytes | None]) -> bytes | None:
+    counts: dict[int, int] = {}
+    for blob in blobs:
+        merge_counts(counts, blob)
+    return encode_histogram(counts)
+
+
+def quantiles(counts: Mapping[int, int],
+              qs: Sequence[float] = DEFAULT_QUANTILES) -> list[float] | None:
+    """The RTT at each quantile in qs (0..1), or None for an empty histogram."""
+    total = sum(counts.values())
+    if total == 0:
+        return None
+    indexes = sorted(counts)
+    result = []
+    for q in qs:
+        if not 0.0 <= q <= 1.0:
+            raise ValueError(f"quantile must be between 0 and 1: {q}")
+        # Rank of the sample at q, counted from 0 as in DDSketch
+        rank = q * (total - 1)
+        seen = 0
+        for index in indexes:
+            seen += counts[index]
+            if seen > rank:
+                result.append(bucket_value(index))
+                break
+    return result
+
+
+class _HistogramMerge:
+    # sqlite3 aggregate: hist_merge(rtt_hist) over a group of rows
+    def __init__(self):
+        self.counts: dict[int, int] = {}
+
+    def step(self, blob):
+        merge_counts(self.counts, blob)
+
+    def finalize(self):
+        return encode_histogram(self.counts)
+
+
+def _add(a: bytes | None, b: bytes | None) -> bytes | None:
+    if a is None or b is None:
+        return a if b is None else b
+    return merge_histograms((a, b))
+
+
+def register_sql_functions(conn: sqlite3.Connection) -> None:
+    """Make hist_merge() and hist_add() available on conn."""
+    conn.create_aggregate("hist_merge", 1, _HistogramMerge)
+    conn.create_function("hist_add", 2, _add, deterministic=True)
@@ -0,0 +1,450 @@
+"""Versioned schema migrations keyed on PRAGMA user_version.
+
+MIGRATIONS[n] upgrades a database from version n to n + 1. The version is
+bumped and committed after each step, so an interrupted upgrade resumes at
+the step it stopped in. Every step must therefore be safe to run again on a
+database it already partly changed. When the schema is current, migrate()
+is a single pragma read.
+
+Steps that rewrite many rows go through update_in_chunks, which commits
+every chunk_rows rows so other connections get the lock in between instead
+of waiting for the whole table.
+"""
+
+import sqlite3
+from collections.abc import Callable
+
+DEFAULT_CHUNK_ROWS = 10_000
+
+# Legacy ping_records rows _v3_dictionary_encoding could not convert
+QUARANTINE_TABLE = "ping_records_unconverted"
+
+Migration = Callable[[sqlite3.Connection, int], None]
+
+
+def update_in_chunks(conn: sqlite3.Connection, table: str, sql: str, chunk_rows: int) -> None:
+    """Run sql over table one rowid range at a time, committing each range.
+
+    sql must take the range as two parameters: rowid > ? AND rowid <= ?.
+    Walking rowid ranges keeps each chunk an index seek on the primary key.
+    """
+    first, last = conn.execute(f"SELECT MIN(rowid), MAX(rowid) FROM {table}").fetchone()
+    if first is None:
+        return
+    start = first - 1
+    while start < last:
+        end = start + chunk_rows
+        conn.execute(sql, (start, end))
+        conn.commit()
+        start = end
+
+
+def _v1_initial_schema(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # The layout create_db built before versioning; IF NOT EXISTS adopts
+    # databases created back then. A new file gets incremental auto_vacuum,
+    # which can only be chosen before its first table.
+    if conn.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()[0] == 0:
+        conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sessions (
+            session_id TEXT PRIMARY KEY,
+            command TEXT NOT NULL,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            completed_at TIMESTAMP,
+            status TEXT NOT NULL
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ping_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            target TEXT NOT NULL,
+
+            -- Metrics
+            sent INTEGER,
+            received INTEGER,
+            loss_pct REAL,
+            rtt_min_ms REAL,
+            rtt_avg_ms REAL,
+            rtt_max_ms REAL,
+            rtt_stddev_ms REAL,
+            jitter REAL,
+            jitter_ratio REAL,
+
+            -- Signals
+            no_reply BOOLEAN,
+            any_loss BOOLEAN,
+            high_loss BOOLEAN,
+            high_latency BOOLEAN,
+            unstable_jitter BOOLEAN,
+            unstable BOOLEAN,
+
+            -- Diagnosis
+            diagnosis_cause TEXT,
+            diagnosis_confidence REAL,
+            diagnosis_summary TEXT,
+            diagnosis_evidence TEXT,  -- JSON string
+
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        );
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS events (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            kind TEXT NOT NULL,
+            detail TEXT,  -- JSON string
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id)
+        )
+    ''')
+
+
+def _v2_ping_records_ts(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # Epoch-ms ts column for range queries, backfilled from timestamp
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ping_records)")}
+    if "ts" not in columns:
+        conn.execute("ALTER TABLE ping_records ADD COLUMN ts INTEGER")
+    # julianday() understands the ISO text (with offset) the datetime adapter wrote
+    update_in_chunks(conn, "ping_records", '''
+        UPDATE ping_records
+        SET ts = CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000.0) AS INTEGER)
+        WHERE rowid > ? AND rowid <= ? AND ts IS NULL
+    ''', chunk_rows)
+    # Index builds are a single statement in SQLite, so they run once the
+    # backfill is done rather than being maintained row by row during it
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ping_records_target_ts ON ping_records (target, ts)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ping_records_session ON ping_records (session_id)"
+    )
+
+
+def _object_type(conn: sqlite3.Connection, name: str) -> str | None:
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _quarantine_unconverted(conn: sqlite3.Connection) -> None:
+    # Rows that did not make it into ping_results (e.g. an unknown
+    # diagnosis_cause, or a timestamp julianday() cannot read) are copied
+    # aside as they were, so the rest of the history can move on
+    conn.execute(
+        f"CREATE TABLE IF NOT EXISTS {QUARANTINE_TABLE} AS SELECT * FROM ping_records WHERE 0"
+    )
+    ids = [row[0] for row in conn.execute(f'''
+        SELECT id FROM ping_records
+        WHERE id NOT IN (SELECT id FROM ping_results)
+          AND id NOT IN (SELECT id FROM {QUARANTINE_TABLE})
+        ORDER BY id
+    ''')]
+    if not ids:
+        return
+    conn.execute(f'''
+        INSERT INTO {QUARANTINE_TABLE}
+        SELECT * FROM ping_records
+        WHERE id NOT IN (SELECT id FROM ping_results)
+          AND id NOT IN (SELECT id FROM {QUARANTINE_TABLE})
+    ''')
+    shown = ", ".join(map(str, ids[:20])) + (", ..." if len(ids) > 20 else "")
+    print(f"[!] {len(ids)} ping_records rows could not be converted and were kept "
+          f"in {QUARANTINE_TABLE} (ids {shown})")
+
+
+def _v3_dictionary_encoding(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # Move records to ping_results, which stores target ids, cause codes and
+    # a signal bitfield instead of repeated strings. The summary and the
+    # evidence are not stored: both follow from the cause and the metrics.
+    # ping_records becomes a view rebuilding the old columns.
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS targets (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE
+        )
+    ''')
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS diagnosis_causes (
+            code INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            summary TEXT NOT NULL
+        )
+    ''')
+    conn.executemany(
+        "INSERT OR IGNORE INTO diagnosis_causes (code, name, summary) VALUES (?, ?, ?)",
+        [
+            (0, "ok", "Connection appears normal."),
+            (1, "no_connectivity", "No connectivity detected."),
+            (2, "high_loss", "Packet loss is high."),
+            (3, "unstable_jitter", "Connection is unstable (high jitter)."),
+            (4, "high_latency", "Latency is high."),
+        ],
+    )
+
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS ping_results (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            session_id TEXT NOT NULL,
+            ts INTEGER NOT NULL,  -- epoch milliseconds
+            target_id INTEGER NOT NULL,
+
+            -- Metrics
+            sent INTEGER,
+            received INTEGER,
+            loss_pct REAL,
+            rtt_min_ms REAL,
+            rtt_avg_ms REAL,
+            rtt_max_ms REAL,
+            rtt_stddev_ms REAL,
+            jitter REAL,
+            jitter_ratio REAL,
+
+            -- Signals, bit i is data.ping.SIGNAL_FIELDS[i]
+            signals INTEGER NOT NULL,
+
+            -- Diagnosis
+            cause INTEGER NOT NULL,
+            confidence REAL,
+
+            FOREIGN KEY (session_id) REFERENCES sessions(session_id),
+            FOREIGN KEY (target_id) REFERENCES targets(id),
+            FOREIGN KEY (cause) REFERENCES diagnosis_causes(code)
+        )
+    ''')
+
+    if _object_type(conn, "ping_records") == "table":
+        conn.execute(
+            "INSERT OR IGNORE INTO targets (name) SELECT DISTINCT target FROM ping_records"
+        )
+        conn.commit()
+        # Same ids, so a resumed copy skips rows it already moved
+        update_in_chunks(conn, "ping_records", '''
+            INSERT OR IGNORE INTO ping_results (
+                id, session_id, ts, target_id,
+                sent, received, loss_pct, rtt_min_ms, rtt_avg_ms, rtt_max_ms, rtt_stddev_ms,
+                jitter, jitter_ratio, signals, cause, confidence
+            )
+            SELECT r.id, r.session_id, r.ts, t.id,
+                   r.sent, r.received, r.loss_pct, r.rtt_min_ms, r.rtt_avg_ms, r.rtt_max_ms,
+                   r.rtt_stddev_ms, r.jitter, r.jitter_ratio,
+                   -- <<, >>, & and | share one precedence level in SQLite
+                   (IFNULL(r.no_reply, 0) != 0)
+                   | ((IFNULL(r.any_loss, 0) != 0) << 1)
+                   | ((IFNULL(r.high_loss, 0) != 0) << 2)
+                   | ((IFNULL(r.high_latency, 0) != 0) << 3)
+                   | ((IFNULL(r.unstable_jitter, 0) != 0) << 4)
+                   | ((IFNULL(r.unstable, 0) != 0) << 5),
+                   c.code, r.diagnosis_confidence
+            FROM ping_records r
+            JOIN targets t ON t.name = r.target
+            JOIN diagnosis_causes c ON c.name = r.diagnosis_cause
+            WHERE r.rowid > ? AND r.rowid <= ?
+        ''', chunk_rows)
+        _quarantine_unconverted(conn)
+        conn.execute("DROP TABLE ping_records")
+
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ping_results_target_ts ON ping_results (target_id, ts)"
+    )
+    conn.execute(
+        "CREATE INDEX IF NOT EXISTS idx_ping_results_session ON ping_results (session_id)"
+    )
+
+    # The evidence keys per cause are data.ping.CAUSE_EVIDENCE_FIELDS
+    conn.execute('''
+        CREATE VIEW IF NOT EXISTS ping_records AS
+        SELECT
+            r.id,
+            r.session_id,
+            strftime('%Y-%m-%d %H:%M:%f', r.ts / 1000.0, 'unixepoch') || '+00:00' AS timestamp,
+            r.ts,
+            t.name AS target,
+            r.sent,
+            r.received,
+            r.loss_pct,
+            r.rtt_min_ms,
+            r.rtt_avg_ms,
+            r.rtt_max_ms,
+            r.rtt_stddev_ms,
+            r.jitter,
+            r.jitter_ratio,
+            r.signals & 1 AS no_reply,
+            (r.signals >> 1) & 1 AS any_loss,
+            (r.signals >> 2) & 1 AS high_loss,
+            (r.signals >> 3) & 1 AS high_latency,
+            (r.signals >> 4) & 1 AS unstable_jitter,
+            (r.signals >> 5) & 1 AS unstable,
+            c.name AS diagnosis_cause,
+            r.confidence AS diagnosis_confidence,
+            c.summary AS diagnosis_summary,
+            CASE r.cause
+                WHEN 0 THEN json_object(
+                    'loss_pct', r.loss_pct, 'rtt_avg_ms', r.rtt_avg_ms,
+                    'jitter_ratio', r.jitter_ratio)
+                WHEN 1 THEN json_object(
+                    'sent', r.sent, 'received', r.received, 'loss_pct', r.loss_pct)
+                WHEN 2 THEN json_object(
+                    'loss_pct', r.loss_pct, 'sent', r.sent, 'received', r.received)
+                WHEN 3 THEN json_object(
+                    'jitter', r.jitter, 'jitter_ratio', r.jitter_ratio,
+                    'rtt_avg_ms', r.rtt_avg_ms)
+                WHEN 4 THEN json_object(
+                    'rtt_avg_ms', r.rtt_avg_ms, 'rtt_min_ms', r.rtt_min_ms,
+                    'rtt_max_ms', r.rtt_max_ms, 'loss_pct', r.loss_pct)
+            END AS diagnosis_evidence
+        FROM ping_results r
+        JOIN targets t ON t.id = r.target_id
+        JOIN diagnosis_causes c ON c.code = r.cause
+    ''')
+
+
+def _v4_rollups(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # Imported here: rollups uses this module's chunk size
+    from netdiag.rollups import create_rollup_tables
+
+    # Existing history is rolled up by _v7_rtt_histograms, once ping_results
+    # has every column the rollups aggregate
+    create_rollup_tables(conn)
+
+
+def _v5_incremental_auto_vacuum(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # Incremental auto_vacuum lets retention hand freed pages back a few at a
+    # time. New files get it when they are created (v1); switching an
+    # existing file over rewrites all of it with a full VACUUM, so that only
+    # happens when asked for (netdiag prune --vacuum).
+    # Kept as a no-op rather than removed: databases already at user_version
+    # 5 or later ran the old step, and renumbering the ones after it would
+    # make migrate() skip or repeat them on those files
+    pass
+
+
+def _v6_rtt_samples(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # Every request's RTT as float32 bytes (samples.encode_samples); older
+    # rows keep NULL since their replies were never stored
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ping_results)")}
+    if "rtt_samples" not in columns:
+        conn.execute("ALTER TABLE ping_results ADD COLUMN rtt_samples BLOB")
+
+
+def _v7_rtt_histograms(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # Imported here: rollups uses this module's chunk size
+    from netdiag.histogram import build_histogram, register_sql_functions
+    from netdiag.rollups import RESOLUTIONS, compact_rollups, rollup_table, rollup_watermark
+    from netdiag.samples import decode_samples
+
+    for table in ("ping_results", *map(rollup_table, RESOLUTIONS)):
+        columns = {row[1] for row in conn.execute(f"PRAGMA table_info({table})")}
+        if "rtt_hist" not in columns:
+            conn.execute(f"ALTER TABLE {table} ADD COLUMN rtt_hist BLOB")
+    conn.commit()
+
+    # Records that kept their replies (v6) get a histogram of them
+    register_sql_functions(conn)
+    conn.create_function(
+        "hist_from_samples", 1, lambda blob: build_histogram(decode_samples(blob))
+    )
+    update_in_chunks(conn, "ping_results", '''
+        UPDATE ping_results SET rtt_hist = hist_from_samples(rtt_samples)
+        WHERE rtt_samples IS NOT NULL AND rtt_hist IS NULL AND rowid > ? AND rowid <= ?
+    ''', chunk_rows)
+
+    # Buckets already rolled up merge the raw histograms still on hand;
+    # where retention pruned raw rows, the bucket's histogram is partial.
+    # Rollup tables have no rowid, so chunks are (target_id, bucket_ts) ranges.
+    watermark = rollup_watermark(conn)
+    for resolution, width_ms in RESOLUTIONS.items():
+        table = rollup_table(resolution)
+        start = (-2**63, -2**63)
+        while True:
+            keys = conn.execute(f'''
+                SELECT target_id, bucket_ts FROM {table}
+                WHERE (target_id, bucket_ts) > (?, ?) AND rtt_hist IS NULL
+                ORDER BY target_id, bucket_ts LIMIT ?
+            ''', (*start, chunk_rows)).fetchall()
+            if not keys:
+                break
+            conn.execute(f'''
+                UPDATE {table} SET rtt_hist = (
+                    SELECT hist_merge(p.rtt_hist) FROM ping_results p
+                    WHERE p.target_id = {table}.target_id
+                      AND p.ts >= {table}.bucket_ts AND p.ts < {table}.bucket_ts + {width_ms}
+                      AND p.id <= ?
+                )
+                WHERE (target_id, bucket_ts) > (?, ?) AND (target_id, bucket_ts) <= (?, ?)
+                  AND rtt_hist IS NULL
+            ''', (watermark, *start, *keys[-1]))
+            conn.commit()
+            start = keys[-1]
+    # History not rolled up yet (a database older than v4) is caught up here
+    compact_rollups(conn, chunk_rows)
+
+
+def _v8_configured_targets(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # The ping.targets entry an address was probed as, so per-target rules
+    # find a resolved "gateway" again; NULL when it was probed by its name
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(targets)")}
+    if "configured_name" not in columns:
+        conn.execute("ALTER TABLE targets ADD COLUMN configured_name TEXT")
+
+
+def _v9_truncated(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # 1 for a ping stopped at its deadline, whose unanswered requests were
+    # counted as lost; older rows were never flagged
+    columns = {row[1] for row in conn.execute("PRAGMA table_info(ping_results)")}
+    if "truncated" not in columns:
+        conn.execute(
+            "ALTER TABLE ping_results ADD COLUMN truncated INTEGER NOT NULL DEFAULT 0"
+        )
+
+
+def _v10_merged_partitions(conn: sqlite3.Connection, chunk_rows: int) -> None:
+    # Partitions whose rollups were merged into this database but whose file
+    # may still be on disk; partitions.drop_partition skips merging these
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS merged_partitions (
+            key TEXT PRIMARY KEY
+        )
+    ''')
+
+
+MIGRATIONS: list[Migration] = [
+    _v1_initial_schema,
+    _v2_ping_records_ts,
+    _v3_dictionary_encoding,
+    _v4_rollups,
+    _v5_incremental_auto_vacuum,
+    _v6_rtt_samples,
+    _v7_rtt_histograms,
+    _v8_configured_targets,
+    _v9_truncated,
+    _v10_merged_partitions,
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+
+def schema_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """Bring the schema up to SCHEMA_VERSION and return the version it was at."""
+    version = schema_version(conn)
+    if version == SCHEMA_VERSION:
+        return version
+    if version > SCHEMA_VERSION:
+        raise RuntimeError(
+            f"Database schema version {version} is newer than this netdiag "
+            f"supports ({SCHEMA_VERSION})"
+        )
+
+    for step in range(version, SCHEMA_VERSION):
+        MIGRATIONS[step](conn, chunk_rows)
+        # PRAGMA values cannot be bound as parameters; step is an int
+        conn.execute(f"PRAGMA user_version = {step + 1}")
+        conn.commit()
+    return version
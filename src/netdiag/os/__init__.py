@@ -1,14 +1,20 @@
 import platform
 
-from .base import OSAdapter
+from .base import DEFAULT_GATEWAY_TTL_S, OSAdapter
+from .linux import LinuxAdapter
+from .macos import MacOSAdapter
 from .windows import WindowsOSAdapter
 
 
-def get_os_adapter() -> OSAdapter:
+def get_os_adapter(gateway_ttl_s: float = DEFAULT_GATEWAY_TTL_S) -> OSAdapter:
     system = platform.system()
 
     if system == "Windows":
-        return WindowsOSAdapter()
+        return WindowsOSAdapter(gateway_ttl_s=gateway_ttl_s)
+    elif system == "Linux":
+        return LinuxAdapter(gateway_ttl_s=gateway_ttl_s)
+    elif system == "Darwin":
+        return MacOSAdapter(gateway_ttl_s=gateway_ttl_s)
     else:
         raise RuntimeError(f"Unsupported OS: {system}")
 
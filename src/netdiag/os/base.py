@@ -1,9 +1,91 @@
-import math
+import dataclasses
+import os
+import signal
 import subprocess
+import threading
+import time
 from abc import ABC, abstractmethod
+from collections.abc import Callable
 from dataclasses import dataclass
+from datetime import datetime, timezone
 
 import netdiag.data.ping as ping
+from netdiag.analysis.stats import RttStats
+
+from .dialects import PingDialect
+from .stream import PingStreamParser
+
+DEFAULT_GATEWAY_TTL_S = 30.0
+
+# System ping binaries send one echo request per second by default
+PING_INTERVAL_S = 1.0
+# Slack on top of the expected run time, covering DNS lookup and process start
+PING_DEADLINE_GRACE_S = 2.0
+# How long an interrupted ping gets to print its statistics before being killed
+PING_INTERRUPT_GRACE_S = 0.5
+
+
+def ping_deadline_s(count: int, timeout_ms: int) -> float:
+    """Upper bound on how long a healthy `ping -c count` run can take.
+
+    Each request may wait up to timeout_ms for its reply before the next is
+    sent, so with a timeout above the interval every request can take that long.
+    """
+    return count * max(PING_INTERVAL_S, timeout_ms / 1000) + PING_DEADLINE_GRACE_S
+
+
+class PingProcess(subprocess.CompletedProcess):
+    """CompletedProcess that also says whether the run hit its deadline."""
+
+    def __init__(self, args, returncode, stdout=None, stderr=None, timed_out=False):
+        super().__init__(args, returncode, stdout, stderr)
+        self.timed_out = timed_out
+
+
+def run_with_deadline(cmd: list[str], deadline_s: float) -> PingProcess:
+    """Run cmd, stopping its whole process group once deadline_s has passed.
+
+    On POSIX the group first gets SIGINT, which makes ping print its
+    statistics as if stopped with Ctrl-C, and SIGKILL if it is still running
+    shortly after. Output written before the deadline is always kept.
+    """
+    proc = start_ping_process(cmd)
+    try:
+        stdout, stderr = proc.communicate(timeout=deadline_s)
+        return PingProcess(cmd, proc.returncode, stdout, stderr)
+    except subprocess.TimeoutExpired:
+        pass
+
+    stop_process_group(proc)
+    stdout, stderr = proc.communicate()
+    return PingProcess(cmd, proc.returncode, stdout, stderr, timed_out=True)
+
+
+def start_ping_process(cmd: list[str], stderr: int = subprocess.PIPE) -> subprocess.Popen:
+    # Own process group, so a deadline can stop ping and anything it spawned
+    if os.name == "nt":
+        popen_kwargs = {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    else:
+        popen_kwargs = {"start_new_session": True}
+    return subprocess.Popen(
+        cmd, stdout=subprocess.PIPE, stderr=stderr, text=True, **popen_kwargs
+    )
+
+
+def stop_process_group(proc: subprocess.Popen) -> None:
+    if os.name == "nt":
+        proc.kill()
+        return
+    try:
+        os.killpg(proc.pid, signal.SIGINT)
+        proc.wait(timeout=PING_INTERRUPT_GRACE_S)
+    except subprocess.TimeoutExpired:
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+    except ProcessLookupError:
+        pass
 
 
 @dataclass
@@ -14,51 +96,159 @@ class PingCommand:
     count_flag: str
 
 
+@dataclass(frozen=True)
+class GatewayChange:
+    previous: str
+    current: str
+    detected_at: datetime
+
+
 # Abstract class for OS-specific implementations
 class OSAdapter(ABC):
+    # Output format of the platform's ping binary
+    dialect: PingDialect
+
+    def __init__(self, gateway_ttl_s: float = DEFAULT_GATEWAY_TTL_S):
+        # Looking up the gateway spawns a process on most platforms, so the
+        # answer is cached for gateway_ttl_s seconds (0 disables the cache)
+        self.gateway_ttl_s = gateway_ttl_s
+        self._gateway_lock = threading.Lock()
+        self._gateway_ip: str | None = None
+        self._gateway_expires_at = 0.0
+        self._gateway_fingerprint: object = None
+        self._gateway_changes: list[GatewayChange] = []
+
     @abstractmethod
     def build_ping_command(self, host: str, count: int, timeout_ms: int) -> list[str]:
         """ ""Build the ping command based on the OS specifics."""
         pass
 
-    @abstractmethod
-    def execute_ping(
-        self, host: str, count: int, timeout_ms: int
-    ) -> subprocess.CompletedProcess[str]:
-        pass
+    def execute_ping(self, host: str, count: int, timeout_ms: int) -> PingProcess:
+        """Shared across all platforms: run ping with a hard deadline."""
+        cmd = self.build_ping_command(host=host, count=count, timeout_ms=timeout_ms)
+        return run_with_deadline(cmd, ping_deadline_s(count, timeout_ms))
 
-    @abstractmethod
     def parse_ping(self, raw_input: str) -> ping.PingParseResult:
-        """ ""Parse the ping command based on the OS specifics."""
-        pass
+        """Parse complete ping output in a single pass, using this OS's dialect."""
+        parser = self.stream_parser()
+        parser.feed_lines(raw_input.splitlines())
+        return parser.result()
+
+    def stream_parser(
+        self, on_reply: Callable[[float], None] | None = None, keep_samples: bool = True
+    ) -> PingStreamParser:
+        """Incremental parser for this platform's ping output."""
+        return PingStreamParser(self.dialect, on_reply=on_reply, keep_samples=keep_samples)
+
+    def stream_ping(self,
+                    host: str,
+                    count: int,
+                    timeout_ms: int,
+                    on_reply: Callable[[float], None] | None = None,
+                    keep_samples: bool = True) -> ping.PingParseResult:
+        """Run ping and parse its output line by line as it is printed.
+
+        on_reply is called with each reply time the moment it arrives. The
+        same deadline as execute_ping applies; a run stopped at the deadline
+        gives a truncated result (see salvage_ping).
+        """
+        cmd = self.build_ping_command(host=host, count=count, timeout_ms=timeout_ms)
+        parser = self.stream_parser(on_reply=on_reply, keep_samples=keep_samples)
+        proc = start_ping_process(cmd, stderr=subprocess.DEVNULL)
+        timed_out = threading.Event()
+
+        def on_deadline():
+            timed_out.set()
+            stop_process_group(proc)
+
+        deadline = threading.Timer(ping_deadline_s(count, timeout_ms), on_deadline)
+        deadline.start()
+        try:
+            for line in proc.stdout:
+                parser.feed(line)
+        finally:
+            deadline.cancel()
+            proc.stdout.close()
+            proc.wait()
+
+        if not timed_out.is_set():
+            return parser.result()
+        if parser.finished:
+            return dataclasses.replace(parser.result(), truncated=True)
+        return parser.partial_result(address=host, count=count)
+
+    def salvage_ping(self, raw_input: str, host: str, count: int) -> ping.PingParseResult:
+        """Build a truncated result from the output of a ping cut off at its deadline.
+
+        If ping managed to print its statistics the normal parse is used.
+        Otherwise the reply lines seen so far are kept, and every request that
+        had not been answered by the deadline is counted as lost.
+        """
+        parser = self.stream_parser()
+        for line in raw_input.splitlines():
+            parser.feed(line)
+        if parser.finished:
+            return dataclasses.replace(parser.result(), truncated=True)
+        return parser.partial_result(address=host, count=count)
 
     @abstractmethod
     def get_gateway_ip(self):
         pass
 
-    @staticmethod
-    def compute_jitter(times_ms: list[float]) -> tuple[float, float]:
-        ok = [t for t in times_ms if t is not None]
-        if len(ok) < 2:
-            return 0.0, 0.0
+    def gateway_fingerprint(self) -> object:
+        """Cheap token that changes whenever the routing table may have changed.
 
-        diffs = [abs(ok[i] - ok[i - 1]) for i in range(1, len(ok))]
-        jitter = sum(diffs) / len(diffs)
+        A cached gateway is dropped as soon as the fingerprint differs, even
+        before its TTL runs out. None means no such signal exists, and the
+        cache relies on the TTL alone.
+        """
+        return None
 
-        rtt_avg = sum(ok) / len(ok)
-        jitter_ratio = jitter / max(rtt_avg, 1.0)
+    def resolve_gateway(self) -> str:
+        """Return the default gateway, using the cached value while it is fresh."""
+        with self._gateway_lock:
+            now = time.monotonic()
+            fingerprint = self.gateway_fingerprint()
+            if (
+                self._gateway_ip is not None
+                and now < self._gateway_expires_at
+                and fingerprint == self._gateway_fingerprint
+            ):
+                return self._gateway_ip
 
-        return jitter, jitter_ratio
+            gateway_ip = self.get_gateway_ip()
+            if self._gateway_ip is not None and gateway_ip != self._gateway_ip:
+                self._gateway_changes.append(
+                    GatewayChange(
+                        previous=self._gateway_ip,
+                        current=gateway_ip,
+                        detected_at=datetime.now(timezone.utc),
+                    )
+                )
+            self._gateway_ip = gateway_ip
+            self._gateway_expires_at = now + self.gateway_ttl_s
+            self._gateway_fingerprint = fingerprint
+            return gateway_ip
+
+    def invalidate_gateway(self) -> None:
+        """Force the next resolve_gateway() call to look the gateway up again."""
+        with self._gateway_lock:
+            self._gateway_expires_at = 0.0
+
+    def drain_gateway_changes(self) -> list[GatewayChange]:
+        """Return and forget the gateway changes seen since the last call."""
+        with self._gateway_lock:
+            changes, self._gateway_changes = self._gateway_changes, []
+        return changes
+
+    @staticmethod
+    def compute_jitter(times_ms: list[float]) -> tuple[float, float]:
+        stats = RttStats.from_samples(times_ms)
+        return stats.jitter, stats.jitter_ratio
 
     @staticmethod
     def compute_std(times_ms: list[float]) -> float:
-        ok = [t for t in times_ms if t is not None]
-        n = len(ok)
-        if n == 0:
-            return 0.0
-        mean = sum(ok) / n
-        var = sum((t - mean) ** 2 for t in ok) / n  # population variance
-        return math.sqrt(var)
+        return RttStats.from_samples(times_ms).stddev  # population stddev
 
 
 """"
@@ -0,0 +1,139 @@
+import re
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class PingDialect:
+    """How one family of ping binaries formats its output.
+
+    Each line is classified once: a cheap substring or prefix test picks the
+    only regex that can match it, so most lines never reach a regex at all.
+    """
+
+    name: str
+    # Substring present in every reply line
+    reply_marker: str
+    time_re: re.Pattern
+    # Prefix of the line naming the pinged address in the statistics block
+    header_prefix: str
+    addr_re: re.Pattern
+    # Substring present in the packets sent/received line
+    packet_marker: str
+    packet_re: re.Pattern
+    # Prefixes of the RTT summary line
+    rtt_prefixes: tuple[str, ...]
+    rtt_re: re.Pattern
+    # False when the summary has no deviation and it is computed from replies
+    rtt_has_stddev: bool
+    # Sequence number and time of a reply line in one match, tried before
+    # time_re; None when reply lines do not say which request they answer
+    reply_re: re.Pattern | None = None
+    # Number the first request gets
+    first_seq: int = 0
+
+
+_ADDR_RE_UNIX = re.compile(r"^---\s+(?P<addr>.+?)\s+ping statistics\s+---$", re.IGNORECASE)
+
+_PACKET_RE_UNIX = re.compile(
+    r"(?P<tx>\d+)\s+packets transmitted,\s+"
+    r"(?P<rx>\d+)\s+(?:packets\s+)?received,\s+"
+    r"(?P<loss>\d+(?:\.\d+)?)%\s+packet loss",
+    re.IGNORECASE,
+)
+
+_MS = r"\d+(?:\.\d+)?"
+# macOS occasionally prints times like time=(1008).473 ms
+_MS_MACOS = r"[\d().]+"
+
+
+def _time_re(ms: str) -> re.Pattern:
+    return re.compile(rf"\btime[=<]\s*(?P<ms>{ms})\s*ms\b", re.IGNORECASE)
+
+
+def _reply_re_unix(ms: str) -> re.Pattern:
+    # iputils and macOS print icmp_seq=N, busybox seq=N; starting at the
+    # literal "seq=" keeps this a single fast search per reply line
+    return re.compile(
+        rf"seq=(?P<seq>\d+)\b.*?\btime[=<]\s*(?P<ms>{ms})\s*ms\b", re.IGNORECASE
+    )
+
+
+_RTT_RE_UNIX = re.compile(
+    r"(?:round-trip|rtt)\s+min/avg/max/(?:stddev|mdev)\s*=\s*"
+    r"(?P<min>\d+(?:\.\d+)?)/(?P<avg>\d+(?:\.\d+)?)/(?P<max>\d+(?:\.\d+)?)/(?P<std>\d+(?:\.\d+)?)",
+    re.IGNORECASE,
+)
+
+MACOS = PingDialect(
+    name="macos",
+    reply_marker=" bytes from ",
+    time_re=_time_re(_MS_MACOS),
+    header_prefix="---",
+    addr_re=_ADDR_RE_UNIX,
+    packet_marker="packets transmitted",
+    packet_re=_PACKET_RE_UNIX,
+    rtt_prefixes=("round-trip", "rtt"),
+    rtt_re=_RTT_RE_UNIX,
+    rtt_has_stddev=True,
+    reply_re=_reply_re_unix(_MS_MACOS),
+)
+
+IPUTILS = PingDialect(
+    name="iputils",
+    reply_marker=" bytes from ",
+    time_re=_time_re(_MS),
+    header_prefix="---",
+    addr_re=_ADDR_RE_UNIX,
+    packet_marker="packets transmitted",
+    packet_re=_PACKET_RE_UNIX,
+    rtt_prefixes=("rtt", "round-trip"),
+    rtt_re=_RTT_RE_UNIX,
+    rtt_has_stddev=True,
+    reply_re=_reply_re_unix(_MS),
+    # iputils numbers requests from 1
+    first_seq=1,
+)
+
+BUSYBOX = PingDialect(
+    name="busybox",
+    reply_marker=" bytes from ",
+    time_re=_time_re(_MS),
+    header_prefix="---",
+    addr_re=_ADDR_RE_UNIX,
+    packet_marker="packets transmitted",
+    packet_re=_PACKET_RE_UNIX,
+    rtt_prefixes=("round-trip",),
+    rtt_re=re.compile(
+        r"round-trip\s+min/avg/max\s*=\s*"
+        r"(?P<min>\d+(?:\.\d+)?)/(?P<avg>\d+(?:\.\d+)?)/(?P<max>\d+(?:\.\d+)?)",
+        re.IGNORECASE,
+    ),
+    rtt_has_stddev=False,
+    reply_re=_reply_re_unix(_MS),
+)
+
+WINDOWS = PingDialect(
+    name="windows",
+    reply_marker="Reply from ",
+    time_re=_time_re(_MS),
+    header_prefix="Ping statistics for",
+    addr_re=re.compile(r"^Ping statistics for (?P<addr>.+?):$", re.IGNORECASE),
+    packet_marker="Packets:",
+    packet_re=re.compile(
+        r"Packets:\s+Sent\s*=\s*(?P<tx>\d+),\s*"
+        r"Received\s*=\s*(?P<rx>\d+),\s*"
+        r"Lost\s*=\s*\d+\s*\((?P<loss>\d+(?:\.\d+)?)%\s+loss\)",
+        re.IGNORECASE,
+    ),
+    rtt_prefixes=("Minimum",),
+    rtt_re=re.compile(
+        r"Minimum\s*=\s*(?P<min>\d+(?:\.\d+)?)ms,\s*"
+        r"Maximum\s*=\s*(?P<max>\d+(?:\.\d+)?)ms,\s*"
+        r"Average\s*=\s*(?P<avg>\d+(?:\.\d+)?)ms",
+        re.IGNORECASE,
+    ),
+    # Windows prints no deviation, it is computed from the replies
+    rtt_has_stddev=False,
+)
+
+DIALECTS = {dialect.name: dialect for dialect in (MACOS, IPUTILS, BUSYBOX, WINDOWS)}
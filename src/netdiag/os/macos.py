@@ -0,0 +1,10 @@
+from .dialects import MACOS
+from .unix_base import UnixAdapter
+
+
+class MacOSAdapter(UnixAdapter):
+    dialect = MACOS
+
+    def build_ping_command(self, host: str, count: int, timeout_ms: int) -> list[str]:
+        # macOS takes -W in milliseconds, as in the shared Unix command
+        return super().build_ping_command(host=host, count=count, timeout_ms=timeout_ms)
@@ -0,0 +1,191 @@
+import re
+from array import array
+from collections.abc import Callable, Iterable
+
+import netdiag.data.ping as ping
+from netdiag.analysis.stats import RttStats
+
+from .dialects import PingDialect
+
+
+class PingStreamParser:
+    """Single-pass ping output parser, fed one line at a time.
+
+    Every line is classified once using the dialect's cheap markers before
+    any regex runs. Reply times are reported through on_reply as soon as
+    their line arrives, and min/avg/max/jitter are kept as running values so
+    a live view can read them mid-run. With keep_samples=False individual
+    reply times are not stored, which keeps memory constant however long
+    the run is.
+    """
+
+    def __init__(self,
+                 dialect: PingDialect,
+                 *,
+                 on_reply: Callable[[float], None] | None = None,
+                 keep_samples: bool = True):
+        self.dialect = dialect
+        self._on_reply = on_reply
+        self._keep_samples = keep_samples
+        self._seen_output = False
+
+        self.times_ms = array("d")
+        # Request index of each stored reply, while every reply line had one
+        self.reply_seqs: list[int] | None = [] if dialect.reply_re is not None else None
+        self.address: str | None = None
+        self.sent: int | None = None
+        self.received: int | None = None
+        self.loss_pct: float | None = None
+        self._rtt_summary: re.Match | None = None
+
+        # Running statistics over the replies seen so far
+        self.stats = RttStats()
+
+    @property
+    def finished(self) -> bool:
+        """True once the summary lines closing the output have been read."""
+        if self.received is None:
+            return False
+        return self._rtt_summary is not None or self.received == 0
+
+    @property
+    def reply_count(self) -> int:
+        return self.stats.count
+
+    @property
+    def rtt_min_ms(self) -> float:
+        return self.stats.min_ms
+
+    @property
+    def rtt_max_ms(self) -> float:
+        return self.stats.max_ms
+
+    @property
+    def rtt_avg_ms(self) -> float:
+        return self.stats.mean
+
+    @property
+    def rtt_stddev_ms(self) -> float:
+        return self.stats.stddev
+
+    @property
+    def jitter(self) -> float:
+        return self.stats.jitter
+
+    @property
+    def jitter_ratio(self) -> float:
+        return self.stats.jitter_ratio
+
+    def feed(self, line: str) -> float | None:
+        """Consume one line of output; return the reply time if it was a reply."""
+        line = line.strip()
+        if not line:
+            return None
+        self._seen_output = True
+
+        dialect = self.dialect
+        if dialect.reply_marker in line:
+            # One search per reply line: sequence number and time together,
+            # or the time alone for a line without a sequence number
+            seq = None
+            if dialect.reply_re is not None and (m := dialect.reply_re.search(line)):
+                seq = int(m.group("seq")) - dialect.first_seq
+            else:
+                m = dialect.time_re.search(line)
+            if m:
+                raw_ms = m.group("ms")
+                if "(" in raw_ms:
+                    raw_ms = raw_ms.replace("(", "").replace(")", "")
+                ms = float(raw_ms)
+                self._add_reply(ms, seq)
+                return ms
+        elif line.startswith(dialect.header_prefix):
+            if self.address is None and (m := dialect.addr_re.search(line)):
+                self.address = m.group("addr")
+        elif dialect.packet_marker in line:
+            if self.sent is None and (m := dialect.packet_re.search(line)):
+                self.sent = int(m.group("tx"))
+                self.received = int(m.group("rx"))
+                self.loss_pct = float(m.group("loss"))
+        elif line.startswith(dialect.rtt_prefixes):
+            if self._rtt_summary is None:
+                self._rtt_summary = dialect.rtt_re.search(line)
+        return None
+
+    def feed_lines(self, lines: Iterable[str]) -> None:
+        for line in lines:
+            self.feed(line)
+
+    def _add_reply(self, ms: float, seq: int | None) -> None:
+        self.stats.add(ms)
+        if self._keep_samples:
+            self.times_ms.append(ms)
+            if self.reply_seqs is not None:
+                if seq is not None:
+                    self.reply_seqs.append(seq)
+                else:
+                    self.reply_seqs = None
+        if self._on_reply is not None:
+            self._on_reply(ms)
+
+    def result(self) -> ping.PingParseResult:
+        """Build the final result; raise PingParseError if the output is incomplete."""
+        if not self._seen_output:
+            raise ping.PingParseError("empty ping output")
+        if self.address is None:
+            raise ping.PingParseError("missing ping statistics header")
+        if self.sent is None:
+            raise ping.PingParseError("missing packets summary line")
+
+        rtt = self._rtt_summary
+        if rtt:
+            rtt_min = float(rtt.group("min"))
+            rtt_avg = float(rtt.group("avg"))
+            rtt_max = float(rtt.group("max"))
+            if self.dialect.rtt_has_stddev:
+                rtt_std = float(rtt.group("std"))
+            else:
+                rtt_std = self.rtt_stddev_ms
+        elif self.received == 0:
+            # Policy: if no replies, allow RTT fields = 0.0
+            rtt_min = rtt_avg = rtt_max = rtt_std = 0.0
+        else:
+            raise ping.PingParseError("missing rtt stats line despite receiving replies")
+
+        return ping.PingParseResult(
+            address=self.address,
+            times_ms=self.times_ms,
+            sent=self.sent,
+            received=self.received,
+            loss_pct=self.loss_pct,
+            rtt_min_ms=rtt_min,
+            rtt_avg_ms=rtt_avg,
+            rtt_max_ms=rtt_max,
+            rtt_stddev_ms=rtt_std,
+            jitter=self.jitter,
+            jitter_ratio=self.jitter_ratio,
+            reply_seqs=self.reply_seqs,
+        )
+
+    def partial_result(self, address: str, count: int) -> ping.PingParseResult:
+        """Result for output cut off before its summary.
+
+        Replies seen so far are kept and every request that had not been
+        answered is counted as lost.
+        """
+        received = min(self.reply_count, count)
+        return ping.PingParseResult(
+            address=address,
+            times_ms=self.times_ms[:count],
+            reply_seqs=self.reply_seqs[:count] if self.reply_seqs is not None else None,
+            sent=count,
+            received=received,
+            loss_pct=(count - received) * 100.0 / count,
+            rtt_min_ms=self.rtt_min_ms if received else 0.0,
+            rtt_avg_ms=self.rtt_avg_ms,
+            rtt_max_ms=self.rtt_max_ms if received else 0.0,
+            rtt_stddev_ms=self.rtt_stddev_ms,
+            jitter=self.jitter,
+            jitter_ratio=self.jitter_ratio,
+            truncated=True,
+        )
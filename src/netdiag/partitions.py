@@ -0,0 +1,277 @@
+"""Time-partitioned storage: one SQLite file of raw records per day or month.
+
+With storage.partition set, raw records go to <stem>-<period><suffix> next
+to database_path (netdiag-2026-06-01.db, netdiag-2026-06.db) instead of to
+database_path itself. Each partition is a complete netdiag database, so
+inserts and their rollups work unchanged; database_path keeps sessions,
+events and the rollups of partitions that have been dropped.
+
+Writers only hold the partition they are writing to open. Retention drops a
+partition by merging its rollups into database_path and unlinking the file
+instead of deleting rows; the merge is recorded in merged_partitions until
+the file is gone, so a drop interrupted in between never merges twice.
+Range queries ATTACH only the partitions that overlap the window, a few at a
+time within SQLite's attach limit.
+"""
+
+import sqlite3
+from collections.abc import Iterable, Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+
+from netdiag.config.config import AppConfig, StorageConfig
+from netdiag.data.ping import PingRecord
+from netdiag.database import (
+    apply_storage_pragmas,
+    create_db,
+    insert_ping_batch_db,
+    select_ping_history_db,
+    to_epoch_ms,
+)
+from netdiag.histogram import register_sql_functions
+from netdiag.rollups import (
+    combine_rollup_rows,
+    compact_rollups,
+    merge_rollups_from,
+    select_rollups,
+)
+
+PERIOD_FORMATS = {"day": "%Y-%m-%d", "month": "%Y-%m"}
+
+# SQLite files that belong to a database and go when it is dropped
+_SIDE_FILES = ("-wal", "-shm", "-journal")
+
+
+@dataclass(frozen=True)
+class Partition:
+    key: str
+    path: Path
+    start: datetime
+    end: datetime  # exclusive
+
+
+@dataclass(frozen=True)
+class PartitionLayout:
+    database_path: Path
+    period: str
+    # Applied to every connection that opens a partition
+    storage: StorageConfig = StorageConfig()
+
+    def key_for(self, timestamp: datetime) -> str:
+        # Keyed on the stored epoch ms, so a record's file matches its ts
+        utc = datetime.fromtimestamp(to_epoch_ms(timestamp) / 1000, timezone.utc)
+        return utc.strftime(PERIOD_FORMATS[self.period])
+
+    def partition(self, key: str) -> Partition:
+        start = datetime.strptime(key, PERIOD_FORMATS[self.period]).replace(
+            tzinfo=timezone.utc
+        )
+        if self.period == "day":
+            end = datetime.fromordinal(start.toordinal() + 1).replace(tzinfo=timezone.utc)
+        elif start.month == 12:
+            end = start.replace(year=start.year + 1, month=1)
+        else:
+            end = start.replace(month=start.month + 1)
+        path = self.database_path.with_name(
+            f"{self.database_path.stem}-{key}{self.database_path.suffix}"
+        )
+        return Partition(key=key, path=path, start=start, end=end)
+
+    def partitions(self) -> list[Partition]:
+        """Partition files on disk, oldest first."""
+        found = []
+        prefix = f"{self.database_path.stem}-"
+        for path in self.database_path.parent.glob(f"{prefix}*{self.database_path.suffix}"):
+            key = path.name[len(prefix):len(path.name) - len(self.database_path.suffix)]
+            try:
+                found.append(self.partition(key))
+            except ValueError:
+                continue  # another file that happens to share the prefix
+        return sorted(found, key=lambda p: p.start)
+
+    def overlapping(self, since: datetime, until: datetime | None = None) -> list[Partition]:
+        return [
+            p for p in self.partitions()
+            if p.end > since and (until is None or p.start < until)
+        ]
+
+
+def partition_layout(app_config: AppConfig) -> PartitionLayout | None:
+    """The layout for app_config, or None when partitioning is off."""
+    if app_config.storage.partition == "none":
+        return None
+    return PartitionLayout(
+        Path(app_config.database_path), app_config.storage.partition, app_config.storage
+    )
+
+
+def open_partition(partition: Partition, storage: StorageConfig) -> sqlite3.Connection:
+    conn = sqlite3.connect(partition.path)
+    apply_storage_pragmas(conn, storage)
+    register_sql_functions(conn)
+    create_db(conn)
+    return conn
+
+
+class PartitionWriter:
+    """Write probe cycles to the partition their timestamps fall in.
+
+    One connection is kept open, to the partition written last; it is
+    swapped when records move on to the next period.
+    """
+
+    def __init__(self, layout: PartitionLayout):
+        self.layout = layout
+        self._key: str | None = None
+        self._conn: sqlite3.Connection | None = None
+
+    def _connection(self, key: str) -> sqlite3.Connection:
+        if key != self._key:
+            self.close()
+            self._conn = open_partition(self.layout.partition(key), self.layout.storage)
+            self._key = key
+        return self._conn
+
+    def insert_batch(self, *,
+                     session_id: str,
+                     ping_records: Iterable[PingRecord],
+                     dedupe: bool = False) -> None:
+        by_key: dict[str, list[PingRecord]] = {}
+        for ping_record in ping_records:
+            by_key.setdefault(self.layout.key_for(ping_record.timestamp), []).append(
+                ping_record
+            )
+        for key in sorted(by_key):
+            insert_ping_batch_db(
+                session_id=session_id, ping_records=by_key[key], conn=self._connection(key),
+                dedupe=dedupe,
+            )
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._key = None
+
+
+def _attach_limit(conn: sqlite3.Connection) -> int:
+    attached = sum(
+        1 for row in conn.execute("PRAGMA database_list") if row[1] not in ("main", "temp")
+    )
+    return conn.getlimit(sqlite3.SQLITE_LIMIT_ATTACHED) - attached
+
+
+@contextmanager
+def attached(conn: sqlite3.Connection,
+             partitions: list[Partition]) -> Iterator[list[tuple[str, Partition]]]:
+    """ATTACH partitions as p0, p1, ... and DETACH them afterwards.
+
+    Must not be called inside a transaction: SQLite refuses ATTACH there.
+    """
+    schemas = []
+    try:
+        for i, partition in enumerate(partitions):
+            schema = f"p{i}"
+            conn.execute("ATTACH DATABASE ? AS " + schema, (str(partition.path),))
+            schemas.append((schema, partition))
+        yield schemas
+    finally:
+        for schema, _ in schemas:
+            conn.execute(f"DETACH DATABASE {schema}")
+
+
+def each_attached(conn: sqlite3.Connection,
+                  partitions: list[Partition]) -> Iterator[tuple[str, Partition]]:
+    """Yield (schema, partition) for every partition, oldest first.
+
+    Partitions are attached in groups that fit SQLite's attach limit
+    (10 by default), so a year of daily files never needs 365 at once.
+    """
+    group_size = max(1, _attach_limit(conn))
+    for i in range(0, len(partitions), group_size):
+        with attached(conn, partitions[i:i + group_size]) as schemas:
+            yield from schemas
+
+
+def select_partitioned_history(*,
+                               layout: PartitionLayout,
+                               target: str,
+                               since: datetime,
+                               until: datetime | None = None,
+                               conn: sqlite3.Connection) -> list[tuple]:
+    """select_ping_history_db over database_path and the overlapping partitions.
+
+    database_path keeps the raw records written before partitioning was
+    turned on, so they are read too.
+    """
+    rows = select_ping_history_db(target=target, since=since, until=until, conn=conn)
+    for schema, _ in each_attached(conn, layout.overlapping(since, until)):
+        rows.extend(select_ping_history_db(
+            target=target, since=since, until=until, conn=conn, schema=schema
+        ))
+    # Stable, so each file's rows keep their order within a shared ts
+    return sorted(rows, key=lambda row: row[0])
+
+
+def merged_partition_keys(conn: sqlite3.Connection) -> set[str]:
+    """Keys of partitions already merged into conn's database."""
+    return {row[0] for row in conn.execute("SELECT key FROM merged_partitions")}
+
+
+def select_partitioned_rollups(conn: sqlite3.Connection,
+                               *,
+                               layout: PartitionLayout,
+                               target: str,
+                               resolution: str,
+                               since: datetime,
+                               until: datetime | None = None) -> list[tuple]:
+    """select_rollups over database_path and the overlapping partitions.
+
+    database_path holds the rollups of dropped partitions and of any raw
+    records written there before partitioning was turned on; the latter can
+    share buckets with a partition, so rows of the same bucket are combined.
+    A partition merged but not yet unlinked is skipped, as database_path
+    already counts it.
+    """
+    rows = select_rollups(conn, target=target, resolution=resolution, since=since, until=until)
+    merged = merged_partition_keys(conn)
+    partitions = [p for p in layout.overlapping(since, until) if p.key not in merged]
+    for schema, _ in each_attached(conn, partitions):
+        rows.extend(select_rollups(
+            conn, target=target, resolution=resolution, since=since, until=until,
+            schema=schema,
+        ))
+    return combine_rollup_rows(rows)
+
+
+def drop_partition(conn: sqlite3.Connection,
+                   partition: Partition,
+                   storage: StorageConfig) -> None:
+    """Keep a partition's rollups in conn's database, then delete its files.
+
+    Safe to run again after an interruption: the merge and its
+    merged_partitions row commit together, and a key already there is only
+    unlinked. The row goes once the files do, so a file created again
+    later for the same period is merged like any other.
+    """
+    if partition.key not in merged_partition_keys(conn):
+        # Any records not yet counted are rolled up in the partition first
+        part_conn = open_partition(partition, storage)
+        try:
+            compact_rollups(part_conn)
+            # A checkpoint folds the WAL back so the attached copy is complete
+            part_conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        finally:
+            part_conn.close()
+
+        with attached(conn, [partition]) as [(schema, _)]:
+            with conn:
+                merge_rollups_from(conn, schema)
+                conn.execute("INSERT INTO merged_partitions (key) VALUES (?)", (partition.key,))
+
+    for path in (partition.path, *(Path(f"{partition.path}{s}") for s in _SIDE_FILES)):
+        path.unlink(missing_ok=True)
+    with conn:
+        conn.execute("DELETE FROM merged_partitions WHERE key = ?", (partition.key,))
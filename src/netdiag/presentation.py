@@ -10,11 +10,13 @@ def format_ping_report(report: PingRecord) -> str:
     d = report.diagnosis
 
     icon = "[OK]" if d.cause == DiagnosisCause.OK else "[!]"
+    # Requests still unanswered at the deadline were counted as lost
+    truncated = " (stopped at deadline)" if report.truncated else ""
 
     return f"""
         {icon} {report.target} - {d.cause.value.upper()}
      {d.summary}
-     Packets: {m.received}/{m.sent} ({m.loss_pct:.1f}% loss)
+     Packets: {m.received}/{m.sent} ({m.loss_pct:.1f}% loss){truncated}
      Latency: {m.rtt_avg_ms:.1f}ms (min={m.rtt_min_ms:.1f}, max={m.rtt_max_ms:.1f})
      Jitter:  {m.jitter:.2f}ms
      Confidence: {d.confidence:.0%}
@@ -0,0 +1,195 @@
+"""Native ICMP echo engine built on unprivileged datagram sockets.
+
+Linux lets unprivileged processes open SOCK_DGRAM/IPPROTO_ICMP sockets when
+their group is inside net.ipv4.ping_group_range. The kernel then owns the
+echo identifier and routes matching replies back to the socket, so a single
+socket can probe many targets at once: every request gets a distinct
+sequence number and replies are matched on it.
+
+This avoids forking one ping process per target and parsing its text output.
+"""
+
+import math
+import select
+import socket
+import struct
+import time
+from array import array
+from collections.abc import Sequence
+
+import netdiag.data.ping as ping
+from netdiag.analysis.stats import RttStats
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+
+_ICMP_HEADER = struct.Struct("!BBHHH")
+
+DEFAULT_PAYLOAD_SIZE = 56
+
+
+def icmp_checksum(data: bytes) -> int:
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(seq: int, payload: bytes, ident: int = 0) -> bytes:
+    # Linux rewrites the identifier and checksum of datagram ICMP sockets;
+    # a valid checksum is still computed for platforms that don't
+    header = _ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    checksum = icmp_checksum(header + payload)
+    return _ICMP_HEADER.pack(ICMP_ECHO_REQUEST, 0, checksum, ident, seq) + payload
+
+
+def parse_echo_reply(data: bytes) -> int | None:
+    """Return the sequence number of an echo reply, or None for anything else."""
+    # Linux strips the IP header on datagram ICMP sockets, macOS does not
+    if data and data[0] >> 4 == 4:
+        data = data[(data[0] & 0x0F) * 4:]
+    if len(data) < _ICMP_HEADER.size:
+        return None
+    icmp_type, _code, _checksum, _ident, seq = _ICMP_HEADER.unpack_from(data)
+    if icmp_type != ICMP_ECHO_REPLY:
+        return None
+    return seq
+
+
+def open_icmp_socket() -> socket.socket:
+    try:
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+    except PermissionError as e:
+        raise PermissionError(
+            "unprivileged ICMP sockets are not allowed for this user; "
+            "check the net.ipv4.ping_group_range sysctl"
+        ) from e
+    except OSError as e:
+        # e.g. WinError 10043: Windows has no datagram ICMP sockets
+        raise OSError(
+            e.errno,
+            f"unprivileged ICMP sockets are not supported here ({e.strerror}); "
+            'use engine = "system"',
+        ) from e
+    sock.setblocking(False)
+    return sock
+
+
+def build_parse_result(address: str,
+                       times_ms: Sequence[float],
+                       sent: int,
+                       reply_seqs: list[int] | None = None) -> ping.PingParseResult:
+    stats = RttStats.from_samples(times_ms)
+    received = stats.count
+    if received:
+        rtt_min, rtt_avg, rtt_max, rtt_std = stats.min_ms, stats.mean, stats.max_ms, stats.stddev
+    else:
+        # Same policy as the text parsers: no replies means RTT fields are 0.0
+        rtt_min = rtt_avg = rtt_max = rtt_std = 0.0
+
+    return ping.PingParseResult(
+        address=address,
+        times_ms=times_ms,
+        sent=sent,
+        received=received,
+        loss_pct=(sent - received) * 100.0 / sent if sent else 0.0,
+        rtt_min_ms=rtt_min,
+        rtt_avg_ms=rtt_avg,
+        rtt_max_ms=rtt_max,
+        rtt_stddev_ms=rtt_std,
+        jitter=stats.jitter,
+        jitter_ratio=stats.jitter_ratio,
+        reply_seqs=reply_seqs,
+    )
+
+
+def icmp_ping_many(hosts: list[str],
+                   count: int,
+                   timeout_ms: int,
+                   interval_s: float = 1.0,
+                   payload_size: int = DEFAULT_PAYLOAD_SIZE) -> list[ping.PingParseResult]:
+    """Send count echo requests to every host over one socket.
+
+    Requests go out in rounds, one per host every interval_s, like running one
+    `ping -c count` per host side by side. A reply counts if it arrives within
+    timeout_ms of its request. Results are returned in the order of hosts.
+    """
+    if count <= 0:
+        raise ValueError("count must be positive")
+    if count * len(hosts) > 0x10000:
+        raise ValueError("too many probes for one batch: sequence numbers would repeat")
+
+    addrs = [
+        socket.getaddrinfo(host, None, socket.AF_INET, socket.SOCK_DGRAM)[0][4][0]
+        for host in hosts
+    ]
+    payload = bytes(payload_size)
+    timeout_ns = timeout_ms * 1_000_000
+    interval_ns = int(interval_s * 1_000_000_000)
+
+    # seq -> (host index, probe index, send time in ns)
+    pending: dict[int, tuple[int, int, int]] = {}
+    rtts: list[list[float]] = [[math.nan] * count for _ in hosts]
+    seq = 0
+
+    with open_icmp_socket() as sock:
+        start_ns = time.monotonic_ns()
+        for probe in range(count):
+            for idx, addr in enumerate(addrs):
+                pending[seq] = (idx, probe, time.monotonic_ns())
+                sock.sendto(build_echo_request(seq, payload), (addr, 0))
+                seq = (seq + 1) & 0xFFFF
+            if probe < count - 1:
+                until_ns = start_ns + (probe + 1) * interval_ns
+                _receive_until(sock, until_ns, addrs, pending, rtts, timeout_ns, False)
+
+        # Only the requests still in flight are left to wait for
+        until_ns = time.monotonic_ns() + timeout_ns
+        _receive_until(sock, until_ns, addrs, pending, rtts, timeout_ns, True)
+
+    results = []
+    for host, samples in zip(hosts, rtts):
+        reply_seqs = [probe for probe, t in enumerate(samples) if not math.isnan(t)]
+        times_ms = array("d", (samples[probe] for probe in reply_seqs))
+        results.append(build_parse_result(host, times_ms, count, reply_seqs))
+    return results
+
+
+def _receive_until(sock: socket.socket,
+                   until_ns: int,
+                   addrs: list[str],
+                   pending: dict[int, tuple[int, int, int]],
+                   rtts: list[list[float]],
+                   timeout_ns: int,
+                   stop_when_idle: bool) -> None:
+    while not (stop_when_idle and not pending):
+        now_ns = time.monotonic_ns()
+        if now_ns >= until_ns:
+            return
+        readable, _, _ = select.select([sock], [], [], (until_ns - now_ns) / 1e9)
+        if readable:
+            _drain(sock, addrs, pending, rtts, timeout_ns)
+
+
+def _drain(sock: socket.socket,
+           addrs: list[str],
+           pending: dict[int, tuple[int, int, int]],
+           rtts: list[list[float]],
+           timeout_ns: int) -> None:
+    while True:
+        try:
+            data, (src, _port) = sock.recvfrom(65535)
+        except BlockingIOError:
+            return
+        recv_ns = time.monotonic_ns()
+        seq = parse_echo_reply(data)
+        if seq is None or seq not in pending:
+            continue
+        idx, probe, sent_ns = pending[seq]
+        if src != addrs[idx]:
+            continue
+        del pending[seq]
+        if recv_ns - sent_ns <= timeout_ns:
+            rtts[idx][probe] = (recv_ns - sent_ns) / 1e6
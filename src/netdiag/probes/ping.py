@@ -1,17 +1,130 @@
-from netdiag.analysis.ping import ping_analysis
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+
+from netdiag.analysis.ping import analyse_ping_result, ping_analysis
+from netdiag.analysis.rules import RuleBook
 from netdiag.data.ping import PingRecord
 from netdiag.os.base import OSAdapter
+from netdiag.probes.icmp import icmp_ping_many
+
+# "system" forks the OS ping binary per target, "icmp" probes every target
+# natively over a single unprivileged ICMP socket (Linux)
+PING_ENGINES = ("system", "icmp")
+
+
+def run_ping(host: str,
+             os_adapter: OSAdapter,
+             count: int,
+             timeout_ms: int,
+             session_id: str,
+             on_reply: Callable[[str, float], None] | None = None,
+             rules: RuleBook | None = None) -> PingRecord:
+    """Ping host and analyse the result.
 
+    With on_reply, output is parsed as ping prints it and on_reply(host, ms)
+    is called for every reply as it arrives. rules diagnoses the result with
+    the rules configured for host, as written in ping.targets.
+    """
+    evaluate = rules.for_target(host) if rules is not None else None
+    target = os_adapter.resolve_gateway() if host == "gateway" else host
+    if on_reply is not None:
+        ping_info = os_adapter.stream_ping(
+            host=target,
+            count=count,
+            timeout_ms=timeout_ms,
+            on_reply=lambda ms: on_reply(host, ms),
+        )
+        record = _as_configured(analyse_ping_result(ping_info, session_id, evaluate), host)
+        if host == "gateway" and record.metrics.received == 0:
+            os_adapter.invalidate_gateway()
+        return record
 
-def run_ping(host: str, 
-             os_adapter: OSAdapter, 
-             count: int, 
-             timeout_ms: int, 
-             session_id: str) -> PingRecord:
     result = os_adapter.execute_ping(
-        host=os_adapter.get_gateway_ip() if host == "gateway" else host,
+        host=target,
         count=count,
         timeout_ms=timeout_ms,
     )
 
-    return ping_analysis(os_adapter=os_adapter, raw_input=result.stdout, session_id=session_id)
+    if getattr(result, "timed_out", False):
+        ping_info = os_adapter.salvage_ping(result.stdout, host=target, count=count)
+        record = analyse_ping_result(ping_info, session_id, evaluate)
+    else:
+        record = ping_analysis(
+            os_adapter=os_adapter, raw_input=result.stdout, session_id=session_id,
+            rules=evaluate,
+        )
+    record = _as_configured(record, host)
+    if host == "gateway" and record.metrics.received == 0:
+        # The cached gateway may be stale after a roam; look it up next time
+        os_adapter.invalidate_gateway()
+    return record
+
+
+def _as_configured(record: PingRecord, host: str) -> PingRecord:
+    # Records are stored under the probed address; keep the configured name
+    # too, which is what per-target rules are looked up by
+    if host != record.target:
+        record.configured_target = host
+    return record
+
+
+def run_ping_batch(hosts: list[str],
+                   os_adapter: OSAdapter,
+                   count: int,
+                   timeout_ms: int,
+                   session_id: str,
+                   max_workers: int = 1,
+                   engine: str = "system",
+                   on_reply: Callable[[str, float], None] | None = None,
+                   rules: RuleBook | None = None) -> list[PingRecord]:
+    """Ping every host, up to max_workers at a time.
+
+    Each probe spends nearly all of its time waiting on the ping process, so
+    threads are enough to overlap them. Records come back in the same order
+    as hosts, and the first failing probe's exception is re-raised.
+    on_reply is passed on to run_ping (system engine only).
+    """
+    if engine == "icmp":
+        return run_icmp_batch(hosts=hosts, os_adapter=os_adapter, count=count,
+                              timeout_ms=timeout_ms, session_id=session_id, rules=rules)
+    if engine != "system":
+        raise ValueError(f"Unknown ping engine: {engine}")
+
+    if max_workers <= 1 or len(hosts) <= 1:
+        return [
+            run_ping(host=host, os_adapter=os_adapter, count=count,
+                     timeout_ms=timeout_ms, session_id=session_id, on_reply=on_reply,
+                     rules=rules)
+            for host in hosts
+        ]
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(hosts))) as pool:
+        futures = [
+            pool.submit(run_ping, host=host, os_adapter=os_adapter, count=count,
+                        timeout_ms=timeout_ms, session_id=session_id, on_reply=on_reply,
+                        rules=rules)
+            for host in hosts
+        ]
+        return [future.result() for future in futures]
+
+
+def run_icmp_batch(hosts: list[str],
+                   os_adapter: OSAdapter,
+                   count: int,
+                   timeout_ms: int,
+                   session_id: str,
+                   rules: RuleBook | None = None) -> list[PingRecord]:
+    """Ping every host at once over one ICMP socket, without spawning processes."""
+    resolved = [os_adapter.resolve_gateway() if host == "gateway" else host for host in hosts]
+    results = icmp_ping_many(resolved, count=count, timeout_ms=timeout_ms)
+    if any(host == "gateway" and r.received == 0 for host, r in zip(hosts, results)):
+        os_adapter.invalidate_gateway()
+    return [
+        _as_configured(
+            analyse_ping_result(
+                ping_info, session_id, rules.for_target(host) if rules is not None else None
+            ),
+            host,
+        )
+        for host, ping_info in zip(hosts, results)
+    ]
@@ -0,0 +1,117 @@
+"""Recent results per target, held in memory by the prober.
+
+Each target gets a ResultRing: fixed-capacity, columnar arrays of epoch-ms
+timestamp, loss, avg/min/max RTT, jitter and cause code. Once a ring is
+full the oldest result is overwritten, so memory stays at
+targets * capacity * 49 bytes however large the database grows, and
+"the last N results for a target" is an array slice instead of a query.
+
+The prober feeds records in as it stores them; live views, trend signals
+and alerts read from other threads, so every access takes the ring's lock.
+"""
+
+import threading
+from array import array
+from collections.abc import Iterable
+
+from netdiag.data.ping import CAUSE_CODES, PingRecord
+from netdiag.database import to_epoch_ms
+
+# Column name and array typecode, in the order rows() returns them
+COLUMNS = (
+    ("ts", "q"),
+    ("loss_pct", "d"),
+    ("rtt_avg_ms", "d"),
+    ("rtt_min_ms", "d"),
+    ("rtt_max_ms", "d"),
+    ("jitter", "d"),
+    ("cause", "B"),
+)
+
+
+class ResultRing:
+    """The last capacity results of one target, oldest overwritten first."""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._columns = {
+            name: array(typecode, bytes(array(typecode).itemsize * capacity))
+            for name, typecode in COLUMNS
+        }
+        self._next = 0
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, ping_record: PingRecord) -> None:
+        metrics = ping_record.metrics
+        values = (
+            to_epoch_ms(ping_record.timestamp),
+            metrics.loss_pct,
+            metrics.rtt_avg_ms,
+            metrics.rtt_min_ms,
+            metrics.rtt_max_ms,
+            metrics.jitter,
+            CAUSE_CODES[ping_record.diagnosis.cause],
+        )
+        with self._lock:
+            i = self._next
+            for column, value in zip(self._columns.values(), values):
+                column[i] = value
+            self._next = (i + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def column(self, name: str, n: int | None = None) -> array:
+        """The last n values of one column (all kept if n is None), oldest first."""
+        with self._lock:
+            return self._tail(self._columns[name], n)
+
+    def rows(self, n: int | None = None) -> list[tuple]:
+        """The last n results as (ts, loss_pct, rtt_avg_ms, rtt_min_ms,
+        rtt_max_ms, jitter, cause) tuples, oldest first."""
+        with self._lock:
+            columns = [self._tail(column, n) for column in self._columns.values()]
+        return list(zip(*columns))
+
+    def _tail(self, column: array, n: int | None) -> array:
+        size = self._size if n is None else max(0, min(n, self._size))
+        start = (self._next - size) % self.capacity
+        if start + size <= self.capacity:
+            return column[start:start + size]
+        return column[start:] + column[:self._next]
+
+
+class RecentResults:
+    """One ResultRing per target, created when the target is first seen."""
+
+    def __init__(self, capacity: int):
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = capacity
+        self._rings: dict[str, ResultRing] = {}
+        self._lock = threading.Lock()
+
+    def add(self, ping_records: Iterable[PingRecord]) -> None:
+        for ping_record in ping_records:
+            ring = self._rings.get(ping_record.target)
+            if ring is None:
+                with self._lock:
+                    ring = self._rings.setdefault(
+                        ping_record.target, ResultRing(self.capacity)
+                    )
+            ring.append(ping_record)
+
+    def targets(self) -> list[str]:
+        return list(self._rings)
+
+    def ring(self, target: str) -> ResultRing | None:
+        return self._rings.get(target)
+
+    def last(self, target: str, n: int | None = None) -> list[tuple]:
+        """The last n results of target (see ResultRing.rows); [] if never seen."""
+        ring = self._rings.get(target)
+        return ring.rows(n) if ring is not None else []
@@ -0,0 +1,140 @@
+"""Re-label stored history with the current diagnosis rules.
+
+Signals, causes and confidences are stored with each record, so changing a
+threshold only affects new records until history is re-diagnosed. This
+walks ping_results one rowid range at a time, diagnoses each range in bulk
+with analysis.batch.diagnose_columns, and writes it back in one committed
+transaction per range, so the prober gets the lock in between. Targets
+with their own [diagnosis.targets] rules are diagnosed as a separate group.
+
+Rollups count records per cause. Rows that are already rolled up and
+change cause move from one cause column to the other in the same
+transaction, so rollups stay equal to a fresh aggregate.
+"""
+
+import sqlite3
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime
+
+from netdiag.analysis.batch import METRIC_COLUMNS, diagnose_columns
+from netdiag.config.config import DiagnosisConfig
+from netdiag.data.ping import CAUSES_BY_CODE
+from netdiag.database import to_epoch_ms
+from netdiag.migrations import DEFAULT_CHUNK_ROWS
+from netdiag.rollups import CAUSE_COLUMNS, RESOLUTIONS, rollup_table, rollup_watermark
+
+
+@dataclass
+class RediagnoseReport:
+    # Records diagnosed again, and how many of them changed cause
+    records: int = 0
+    changed: int = 0
+
+
+def rediagnose_history(conn: sqlite3.Connection,
+                       *,
+                       since: datetime,
+                       until: datetime | None = None,
+                       chunk_rows: int = DEFAULT_CHUNK_ROWS,
+                       rules: DiagnosisConfig | None = None,
+                       report: RediagnoseReport | None = None) -> RediagnoseReport:
+    """Diagnose every record in [since, until) again and store the results.
+
+    rules=None applies the data.ping constants.
+    """
+    report = report or RediagnoseReport()
+    since_ms = to_epoch_ms(since)
+    until_ms = to_epoch_ms(until) if until is not None else 2**63 - 1
+    # The id range of the window, from a seek per target on (target_id, ts);
+    # CROSS JOIN keeps SQLite from scanning the whole index instead. The
+    # chunks below then cover the window, not all of history
+    first, last = conn.execute('''
+        SELECT MIN(r.id), MAX(r.id)
+        FROM targets t CROSS JOIN ping_results r ON r.target_id = t.id
+        WHERE r.ts >= ? AND r.ts < ?
+    ''', (since_ms, until_ms)).fetchone()
+    if first is None:
+        return report
+    # Per-target rules are keyed as in ping.targets, like the live probes
+    # look them up (run_ping); records store a target_id
+    overrides = {}
+    if rules is not None and rules.targets:
+        overrides = {
+            target_id: rules.targets[name]
+            for target_id, name in conn.execute(
+                "SELECT id, COALESCE(configured_name, name) FROM targets"
+            )
+            if name in rules.targets
+        }
+
+    select_sql = f'''
+        SELECT id, target_id, ts, cause, {", ".join(METRIC_COLUMNS)}
+        FROM ping_results
+        WHERE id > ? AND id <= ? AND ts >= ? AND ts < ?
+    '''
+    start = first - 1
+    while start < last:
+        end = start + chunk_rows
+        rows = conn.execute(select_sql, (start, end, since_ms, until_ms)).fetchall()
+        if rows:
+            _rediagnose_chunk(conn, rows, rules, overrides, report)
+        start = end
+    return report
+
+
+def _rediagnose_chunk(conn: sqlite3.Connection, rows: list[tuple],
+                      rules: DiagnosisConfig | None,
+                      overrides: dict[int, DiagnosisConfig],
+                      report: RediagnoseReport) -> None:
+    # One group per overridden target_id, the rest under None
+    groups = {}
+    for row in rows:
+        groups.setdefault(row[1] if row[1] in overrides else None, []).append(row)
+
+    updates = []
+    for target_id, group in groups.items():
+        ids, _, _, _, *metrics = zip(*group)
+        result = diagnose_columns(
+            dict(zip(METRIC_COLUMNS, metrics)), rules=overrides.get(target_id, rules)
+        )
+        updates += zip(
+            result.signals.tolist(), result.causes.tolist(), result.confidences.tolist(), ids
+        )
+    updates.sort(key=lambda update: update[3])
+
+    ids, target_ids, timestamps, old_causes = zip(*(row[:4] for row in sorted(rows)))
+    causes = [cause for _, cause, _, _ in updates]
+
+    with conn:
+        conn.executemany(
+            "UPDATE ping_results SET signals = ?, cause = ?, confidence = ? WHERE id = ?",
+            updates,
+        )
+        # Rows past the watermark are rolled up later with their new cause
+        watermark = rollup_watermark(conn)
+        moved = [
+            (target_id, ts, old, new)
+            for row_id, target_id, ts, old, new
+            in zip(ids, target_ids, timestamps, old_causes, causes)
+            if old != new and row_id <= watermark
+        ]
+        _move_rollup_causes(conn, moved)
+
+    report.records += len(rows)
+    report.changed += sum(old != new for old, new in zip(old_causes, causes))
+
+
+def _move_rollup_causes(conn: sqlite3.Connection, moved: list[tuple]) -> None:
+    for resolution, width_ms in RESOLUTIONS.items():
+        counts = Counter(
+            (target_id, ts - ts % width_ms, old, new) for target_id, ts, old, new in moved
+        )
+        for (target_id, bucket_ts, old, new), n in counts.items():
+            old_column = CAUSE_COLUMNS[CAUSES_BY_CODE[old]]
+            new_column = CAUSE_COLUMNS[CAUSES_BY_CODE[new]]
+            conn.execute(f'''
+                UPDATE {rollup_table(resolution)}
+                SET {old_column} = {old_column} - ?, {new_column} = {new_column} + ?
+                WHERE target_id = ? AND bucket_ts = ?
+            ''', (n, n, target_id, bucket_ts))
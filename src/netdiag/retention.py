@@ -0,0 +1,199 @@
+"""Retention: delete history older than each resolution's window.
+
+Deletes run in chunks of chunk_rows with a commit after each, so a large
+prune never holds the write lock long enough to stall the prober. Freed
+pages are handed back with PRAGMA incremental_vacuum (new databases are
+created with auto_vacuum = INCREMENTAL; older ones need
+enable_incremental_vacuum once, until then freed pages are only reused).
+Raw records are always rolled up before any of them are deleted.
+
+With a PartitionLayout, raw records past raw_days go by dropping whole
+partition files (their rollups are merged into the main database first),
+and the size cap counts the partitions too.
+"""
+
+import sqlite3
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+
+from netdiag.config.config import RetentionConfig
+from netdiag.migrations import DEFAULT_CHUNK_ROWS
+from netdiag.partitions import Partition, PartitionLayout, drop_partition
+from netdiag.rollups import RESOLUTIONS, compact_rollups, rollup_table
+
+DAY_MS = 86_400_000
+
+
+@dataclass
+class PruneReport:
+    # Rows deleted per table
+    deleted: dict[str, int] = field(default_factory=dict)
+    # Keys of the partition files that were dropped
+    dropped_partitions: list[str] = field(default_factory=list)
+    size_before_bytes: int = 0
+    size_after_bytes: int = 0
+
+    def add(self, table: str, rows: int) -> None:
+        if rows:
+            self.deleted[table] = self.deleted.get(table, 0) + rows
+
+
+def database_size_bytes(conn: sqlite3.Connection) -> int:
+    """Bytes in use, not counting free pages still waiting to be vacuumed."""
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return (page_count - freelist) * page_size
+
+
+def partition_size_bytes(partition: Partition) -> int:
+    """database_size_bytes of a partition file, measured like the main database."""
+    conn = sqlite3.connect(f"{partition.path.as_uri()}?mode=ro", uri=True)
+    try:
+        return database_size_bytes(conn)
+    finally:
+        conn.close()
+
+
+def storage_size_bytes(conn: sqlite3.Connection, layout: PartitionLayout | None = None) -> int:
+    """database_size_bytes plus that of every partition."""
+    size = database_size_bytes(conn)
+    if layout is not None:
+        size += sum(partition_size_bytes(p) for p in layout.partitions())
+    return size
+
+
+def delete_in_chunks(conn: sqlite3.Connection, table: str, key: str, where: str,
+                     params: tuple, chunk_rows: int, limit: int | None = None) -> int:
+    """DELETE rows of table matching where, chunk_rows at a time.
+
+    key names the column(s) identifying a row, e.g. "id" or
+    "target_id, bucket_ts". With limit, at most that many rows go, oldest
+    first by key order. Returns how many rows were deleted.
+    """
+    deleted = 0
+    while limit is None or deleted < limit:
+        batch = chunk_rows if limit is None else min(chunk_rows, limit - deleted)
+        cur = conn.execute(f'''
+            DELETE FROM {table} WHERE ({key}) IN (
+                SELECT {key} FROM {table} WHERE {where} LIMIT ?
+            )
+        ''', (*params, batch))
+        conn.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < batch:
+            break
+    return deleted
+
+
+def release_free_pages(conn: sqlite3.Connection) -> None:
+    # incremental_vacuum frees one page per step and execute() only steps a
+    # statement without result columns once; executescript runs it to the end
+    conn.commit()
+    conn.executescript("PRAGMA incremental_vacuum;")
+
+
+def enable_incremental_vacuum(conn: sqlite3.Connection) -> bool:
+    """Switch conn's file to auto_vacuum = INCREMENTAL; False if it already was.
+
+    Converting a file needs one full VACUUM: it rewrites the whole database,
+    needs as much free disk again, and holds the write lock throughout.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return False
+    # VACUUM cannot run inside a transaction
+    conn.commit()
+    conn.execute("PRAGMA auto_vacuum = INCREMENTAL")
+    conn.execute("VACUUM")
+    return True
+
+
+def prune(conn: sqlite3.Connection,
+          retention: RetentionConfig,
+          now: datetime | None = None,
+          chunk_rows: int = DEFAULT_CHUNK_ROWS,
+          layout: PartitionLayout | None = None) -> PruneReport:
+    """Apply the retention windows, then the size cap if one is set."""
+    now_ms = int((now or datetime.now(timezone.utc)).timestamp() * 1000)
+    report = PruneReport(size_before_bytes=storage_size_bytes(conn, layout))
+
+    # Nothing may leave the raw table before it is counted in the rollups
+    compact_rollups(conn, chunk_rows)
+
+    if retention.raw_days:
+        cutoff_ms = now_ms - retention.raw_days * DAY_MS
+        report.add("ping_results", delete_in_chunks(
+            conn, "ping_results", "id", "ts < ?", (cutoff_ms,), chunk_rows
+        ))
+        cutoff = datetime.fromtimestamp(cutoff_ms / 1000, timezone.utc)
+        report.add("events", delete_in_chunks(
+            conn, "events", "id", "julianday(timestamp) < julianday(?)",
+            (cutoff.isoformat(" "),), chunk_rows,
+        ))
+        report.add("sessions", delete_in_chunks(
+            conn, "sessions", "session_id",
+            "julianday(started_at) < julianday(?) AND session_id NOT IN "
+            "(SELECT session_id FROM ping_results)",
+            (cutoff.strftime("%Y-%m-%d %H:%M:%S"),), chunk_rows,
+        ))
+        if layout is not None:
+            for partition in layout.partitions():
+                if partition.end <= cutoff:
+                    drop_partition(conn, partition, layout.storage)
+                    report.dropped_partitions.append(partition.key)
+
+    for resolution in RESOLUTIONS:
+        days = getattr(retention, f"{resolution}_rollup_days")
+        if days:
+            table = rollup_table(resolution)
+            report.add(table, delete_in_chunks(
+                conn, table, "target_id, bucket_ts", "bucket_ts < ?",
+                (now_ms - days * DAY_MS,), chunk_rows,
+            ))
+
+    release_free_pages(conn)
+    if retention.max_db_mb:
+        enforce_size_cap(conn, retention.max_db_mb * 1024 * 1024, chunk_rows, report, layout)
+
+    report.size_after_bytes = storage_size_bytes(conn, layout)
+    return report
+
+
+def enforce_size_cap(conn: sqlite3.Connection, max_bytes: int, chunk_rows: int,
+                     report: PruneReport, layout: PartitionLayout | None = None) -> None:
+    """Drop the oldest data until the database fits in max_bytes.
+
+    Raw records go first, then minute and hour rollups. Day rollups are
+    never dropped for size: they are what is left of the long-term history.
+    With a layout, the oldest partitions are dropped before anything else,
+    but never the newest one, which the prober is writing to. The main
+    database then gets whatever the remaining partitions leave; if they
+    leave nothing, its rollups (the history of dropped partitions) are kept.
+    """
+    if layout is not None:
+        for partition in layout.partitions()[:-1]:
+            if storage_size_bytes(conn, layout) <= max_bytes:
+                break
+            drop_partition(conn, partition, layout.storage)
+            report.dropped_partitions.append(partition.key)
+        partitions_bytes = storage_size_bytes(conn, layout) - database_size_bytes(conn)
+        max_bytes = max(0, max_bytes - partitions_bytes)
+        if max_bytes == 0:
+            return
+
+    for table, key, order in (
+        ("ping_results", "id", "ts"),
+        (rollup_table("minute"), "target_id, bucket_ts", "bucket_ts"),
+        (rollup_table("hour"), "target_id, bucket_ts", "bucket_ts"),
+    ):
+        while database_size_bytes(conn) > max_bytes:
+            oldest = conn.execute(f"SELECT MIN({order}) FROM {table}").fetchone()[0]
+            if oldest is None:
+                break
+            # One day of the oldest data per round, then re-measure
+            deleted = delete_in_chunks(
+                conn, table, key, f"{order} < ?", (oldest + DAY_MS,), chunk_rows
+            )
+            report.add(table, deleted)
+            release_free_pages(conn)
+
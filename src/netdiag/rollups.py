@@ -0,0 +1,326 @@
+"""Per-target minute/hour/day rollups of ping_results.
+
+Each rollup row sums one target's records over one bucket, so a report over
+weeks reads a few hundred rows instead of every raw record. Rollups are kept
+up to date incrementally: rollup_state holds a watermark, the highest
+ping_results id already counted, and roll_up_pending() folds every newer row
+into all resolutions with one UPSERT per resolution. Inserts call it inside
+their own transaction; compact_rollups() catches up in committed chunks.
+
+Sums rather than averages are stored so buckets merge exactly: an hour is
+the sum of its minutes. RTT columns only count records that got replies.
+The same holds for percentiles: rtt_hist merges the records' log-bucketed
+histograms (histogram.py), so p50/p95/p99 over any window is a merge of a
+few rollup rows rather than a scan of raw samples. The merge runs in SQL,
+so connections need histogram.register_sql_functions(), which every
+connection opened through database.py, partitions.py or writer.py has.
+"""
+
+import math
+import sqlite3
+from collections.abc import Sequence
+from datetime import datetime
+
+from netdiag.data.ping import CAUSE_CODES, DiagnosisCause
+from netdiag.histogram import DEFAULT_QUANTILES, merge_counts, merge_histograms, quantiles
+from netdiag.migrations import DEFAULT_CHUNK_ROWS
+
+# Bucket width in milliseconds per resolution
+RESOLUTIONS = {
+    "minute": 60_000,
+    "hour": 3_600_000,
+    "day": 86_400_000,
+}
+
+CAUSE_COLUMNS = {cause: f"cause_{cause.value}" for cause in DiagnosisCause}
+
+# Columns after (target_id, bucket_ts), in table order
+ROLLUP_COLUMNS = (
+    "records",
+    "sent",
+    "received",
+    "loss_pct_sum",
+    "replied",
+    "rtt_min_ms",
+    "rtt_max_ms",
+    "rtt_avg_sum",
+    "rtt_avg_sq_sum",
+    "jitter_sum",
+    *CAUSE_COLUMNS.values(),
+    "rtt_hist",
+)
+
+
+def rollup_table(resolution: str) -> str:
+    if resolution not in RESOLUTIONS:
+        raise ValueError(f"Unknown rollup resolution: {resolution}")
+    return f"ping_rollup_{resolution}"
+
+
+def _aggregate_sql(width_ms: int) -> str:
+    # The raw-side aggregate shared by incremental updates and the check
+    causes = ",\n               ".join(
+        f"SUM(cause = {CAUSE_CODES[cause]})" for cause in CAUSE_COLUMNS
+    )
+    return f'''
+        SELECT target_id, ts - ts % {width_ms},
+               COUNT(*), TOTAL(sent), TOTAL(received), TOTAL(loss_pct),
+               TOTAL(received > 0),
+               MIN(CASE WHEN received > 0 THEN rtt_min_ms END),
+               MAX(CASE WHEN received > 0 THEN rtt_max_ms END),
+               TOTAL(CASE WHEN received > 0 THEN rtt_avg_ms END),
+               TOTAL(CASE WHEN received > 0 THEN rtt_avg_ms * rtt_avg_ms END),
+               TOTAL(jitter),
+               {causes},
+               hist_merge(rtt_hist)
+        FROM ping_results
+        WHERE id > ? AND id <= ?
+        GROUP BY target_id, ts - ts % {width_ms}
+    '''
+
+
+def _on_conflict_sql() -> str:
+    # Adds an incoming bucket to a stored one, shared by roll-ups and merges
+    summed = [c for c in ROLLUP_COLUMNS if c not in ("rtt_min_ms", "rtt_max_ms", "rtt_hist")]
+    updates = ",\n            ".join(
+        [f"{c} = {c} + excluded.{c}" for c in summed]
+        + [
+            # Scalar MIN/MAX return NULL if either side is NULL (no replies)
+            "rtt_min_ms = COALESCE(MIN(rtt_min_ms, excluded.rtt_min_ms), "
+            "rtt_min_ms, excluded.rtt_min_ms)",
+            "rtt_max_ms = COALESCE(MAX(rtt_max_ms, excluded.rtt_max_ms), "
+            "rtt_max_ms, excluded.rtt_max_ms)",
+            "rtt_hist = hist_add(rtt_hist, excluded.rtt_hist)",
+        ]
+    )
+    return f'''
+        ON CONFLICT (target_id, bucket_ts) DO UPDATE SET
+            {updates}
+    '''
+
+
+def _upsert_sql(resolution: str) -> str:
+    table = rollup_table(resolution)
+    return f'''
+        INSERT INTO {table} (target_id, bucket_ts, {", ".join(ROLLUP_COLUMNS)})
+        {_aggregate_sql(RESOLUTIONS[resolution])}
+        {_on_conflict_sql()}
+    '''
+
+
+def create_rollup_tables(conn: sqlite3.Connection) -> None:
+    causes = ",\n            ".join(f"{c} INTEGER NOT NULL" for c in CAUSE_COLUMNS.values())
+    for resolution in RESOLUTIONS:
+        conn.execute(f'''
+            CREATE TABLE IF NOT EXISTS {rollup_table(resolution)} (
+                target_id INTEGER NOT NULL,
+                bucket_ts INTEGER NOT NULL,  -- epoch ms at the start of the bucket
+                records INTEGER NOT NULL,
+                sent INTEGER NOT NULL,
+                received INTEGER NOT NULL,
+                loss_pct_sum REAL NOT NULL,
+                replied INTEGER NOT NULL,  -- records with at least one reply
+                rtt_min_ms REAL,
+                rtt_max_ms REAL,
+                rtt_avg_sum REAL NOT NULL,
+                rtt_avg_sq_sum REAL NOT NULL,
+                jitter_sum REAL NOT NULL,
+                {causes},
+                rtt_hist BLOB,  -- merged histogram.py histogram of every reply
+                PRIMARY KEY (target_id, bucket_ts)
+            ) WITHOUT ROWID
+        ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rollup_state (
+            id INTEGER PRIMARY KEY CHECK (id = 1),
+            watermark INTEGER NOT NULL  -- highest ping_results id rolled up
+        )
+    ''')
+    conn.execute("INSERT OR IGNORE INTO rollup_state (id, watermark) VALUES (1, 0)")
+
+
+def rollup_watermark(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT watermark FROM rollup_state WHERE id = 1").fetchone()[0]
+
+
+def roll_up_pending(conn: sqlite3.Connection, max_rows: int | None = None) -> int:
+    """Fold ping_results rows past the watermark into every resolution.
+
+    Runs in the caller's transaction and does not commit. At most max_rows
+    ids are consumed when given. Returns how many ids the watermark moved.
+    """
+    watermark = rollup_watermark(conn)
+    last_id = conn.execute("SELECT MAX(id) FROM ping_results").fetchone()[0]
+    if last_id is None or last_id <= watermark:
+        return 0
+    end = last_id if max_rows is None else min(last_id, watermark + max_rows)
+
+    for resolution in RESOLUTIONS:
+        conn.execute(_upsert_sql(resolution), (watermark, end))
+    conn.execute("UPDATE rollup_state SET watermark = ? WHERE id = 1", (end,))
+    return end - watermark
+
+
+def compact_rollups(conn: sqlite3.Connection, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """Catch the rollups up in committed chunks; return how many ids were consumed."""
+    total = 0
+    while moved := roll_up_pending(conn, max_rows=chunk_rows):
+        conn.commit()
+        total += moved
+    return total
+
+
+def rebuild_rollups(conn: sqlite3.Connection, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> int:
+    """Recompute the rollups the raw rows still in ping_results cover.
+
+    Buckets before the one holding the oldest raw record are kept: retention
+    already deleted the records they were built from, so they are all that
+    is left of that history. The bucket holding the oldest record is rebuilt
+    from what remains of it.
+    """
+    first_ts = conn.execute("SELECT MIN(ts) FROM ping_results").fetchone()[0]
+    with conn:
+        if first_ts is not None:
+            for resolution, width_ms in RESOLUTIONS.items():
+                conn.execute(
+                    f"DELETE FROM {rollup_table(resolution)} WHERE bucket_ts >= ?",
+                    (first_ts // width_ms * width_ms,),
+                )
+        conn.execute("UPDATE rollup_state SET watermark = 0 WHERE id = 1")
+    return compact_rollups(conn, chunk_rows)
+
+
+def merge_rollups_from(conn: sqlite3.Connection, schema: str) -> None:
+    """Add every rollup bucket of an attached database into main's rollups.
+
+    Target ids are translated by name, since each database numbers its own
+    targets. Runs in the caller's transaction and does not commit.
+    """
+    conn.execute(f'''
+        INSERT INTO main.targets (name, configured_name)
+        SELECT name, configured_name FROM {schema}.targets WHERE true
+        ON CONFLICT (name) DO UPDATE SET configured_name = excluded.configured_name
+        WHERE excluded.configured_name IS NOT NULL
+    ''')
+    columns = ", ".join(ROLLUP_COLUMNS)
+    source_columns = ", ".join(f"r.{c}" for c in ROLLUP_COLUMNS)
+    for resolution in RESOLUTIONS:
+        table = rollup_table(resolution)
+        # WHERE true keeps ON CONFLICT from parsing as part of the join
+        conn.execute(f'''
+            INSERT INTO main.{table} (target_id, bucket_ts, {columns})
+            SELECT mt.id, r.bucket_ts, {source_columns}
+            FROM {schema}.{table} r
+            JOIN {schema}.targets pt ON pt.id = r.target_id
+            JOIN main.targets mt ON mt.name = pt.name
+            WHERE true
+            {_on_conflict_sql()}
+        ''')
+
+
+def check_rollups(conn: sqlite3.Connection, since: datetime | None = None) -> list[tuple]:
+    """Compare rollups with the raw rows they were built from.
+
+    Returns (resolution, target, bucket_ts) for every bucket whose stored
+    values differ from a fresh aggregate of ping_results. Only buckets
+    starting at or after since are compared. since defaults to the oldest
+    raw record, because retention may have pruned part of earlier buckets.
+    """
+    watermark = rollup_watermark(conn)
+    if since is not None:
+        since_ms = int(since.timestamp() * 1000)
+    else:
+        since_ms = conn.execute("SELECT MIN(ts) FROM ping_results").fetchone()[0] or 0
+    names = dict(conn.execute("SELECT id, name FROM targets"))
+    mismatches = []
+    for resolution, width_ms in RESOLUTIONS.items():
+        raw = {
+            (row[0], row[1]): row[2:]
+            for row in conn.execute(_aggregate_sql(width_ms), (0, watermark))
+            if row[1] >= since_ms
+        }
+        for key, expected in raw.items():
+            stored = conn.execute(
+                f"SELECT {', '.join(ROLLUP_COLUMNS)} FROM {rollup_table(resolution)} "
+                "WHERE target_id = ? AND bucket_ts = ?",
+                key,
+            ).fetchone()
+            if stored is None or not all(map(_same, stored, expected)):
+                mismatches.append((resolution, names.get(key[0]), key[1]))
+    return mismatches
+
+
+def _same(stored, expected) -> bool:
+    if stored is None or expected is None:
+        return stored is None and expected is None
+    if isinstance(stored, bytes):
+        # Histograms are encoded canonically
+        return stored == expected
+    return math.isclose(stored, expected, rel_tol=1e-9, abs_tol=1e-9)
+
+
+def select_rollups(conn: sqlite3.Connection,
+                   *,
+                   target: str,
+                   resolution: str,
+                   since: datetime,
+                   until: datetime | None = None,
+                   schema: str = "main") -> list[tuple]:
+    """Rollup rows of one target for buckets starting in [since, until).
+
+    Rows are (bucket_ts, *ROLLUP_COLUMNS), oldest first. schema names an
+    attached database to read instead of main.
+    """
+    until_ms = int(until.timestamp() * 1000) if until is not None else 2**63 - 1
+    return conn.execute(f'''
+        SELECT r.bucket_ts, {", ".join(f"r.{c}" for c in ROLLUP_COLUMNS)}
+        FROM {schema}.{rollup_table(resolution)} r
+        JOIN {schema}.targets t ON t.id = r.target_id
+        WHERE t.name = ? AND r.bucket_ts >= ? AND r.bucket_ts < ?
+        ORDER BY r.bucket_ts
+    ''', (target, int(since.timestamp() * 1000), until_ms)).fetchall()
+
+
+def combine_rollup_rows(rows: Sequence[tuple]) -> list[tuple]:
+    """Merge rows of select_rollups that share a bucket_ts, oldest first.
+
+    The Python counterpart of _on_conflict_sql, for buckets read from more
+    than one database: each file's row counts different raw records.
+    """
+    by_bucket: dict[int, list[tuple]] = {}
+    for row in rows:
+        by_bucket.setdefault(row[0], []).append(row)
+    combined = []
+    for bucket_ts in sorted(by_bucket):
+        group = by_bucket[bucket_ts]
+        if len(group) == 1:
+            combined.append(group[0])
+            continue
+        values = []
+        for i, column in enumerate(ROLLUP_COLUMNS, start=1):
+            column_values = [row[i] for row in group]
+            present = [v for v in column_values if v is not None]
+            if column == "rtt_hist":
+                values.append(merge_histograms(column_values))
+            elif column == "rtt_min_ms":
+                values.append(min(present, default=None))
+            elif column == "rtt_max_ms":
+                values.append(max(present, default=None))
+            else:
+                values.append(sum(present))
+        combined.append((bucket_ts, *values))
+    return combined
+
+
+def rollup_percentiles(rows: Sequence[tuple],
+                       qs: Sequence[float] = DEFAULT_QUANTILES) -> list[float] | None:
+    """RTT percentiles over rollup rows, as returned by select_rollups.
+
+    The rows' histograms are merged, so any mix of buckets, resolutions and
+    partitions can be combined. None if no record in them had replies.
+    """
+    column = 1 + ROLLUP_COLUMNS.index("rtt_hist")
+    counts: dict[int, int] = {}
+    for row in rows:
+        merge_counts(counts, row[column])
+    return quantiles(counts, qs)
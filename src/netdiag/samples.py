@@ -0,0 +1,63 @@
+"""Per-request RTT samples in a compact binary form.
+
+A record's samples hold one float32 per echo request, in the order the
+requests were sent, with NaN for a request that got no reply. They are
+stored as the little-endian bytes of array('f'): 4 bytes per request, so a
+5-probe cycle costs 20 bytes next to a row of summary columns, and percentile
+or loss-burst analysis can be run later without keeping the raw output.
+
+decode_samples() does not copy: it returns a memoryview over the stored
+bytes, which indexes, iterates and slices like a list of floats.
+"""
+
+import math
+import sys
+from array import array
+from collections.abc import Iterable, Sequence
+
+# A request that got no reply
+LOST = math.nan
+
+
+def request_samples(times_ms: Sequence[float],
+                    sent: int,
+                    reply_seqs: Sequence[int] | None = None) -> bytes | None:
+    """Encoded samples for one run, or None if its replies were not kept.
+
+    reply_seqs gives the request each reply answered. Without it, which
+    requests were lost is unknown and the lost ones are placed last.
+    """
+    if sent <= 0 or len(times_ms) > sent:
+        return None
+    samples = array("f", [LOST]) * sent
+    if reply_seqs is None:
+        samples[:len(times_ms)] = array("f", times_ms)
+    else:
+        for seq, ms in zip(reply_seqs, times_ms):
+            # Sequence numbers outside the run (wrapped or foreign) are ignored
+            if 0 <= seq < sent:
+                samples[seq] = ms
+    return encode_samples(samples)
+
+
+def encode_samples(samples: Iterable[float]) -> bytes:
+    if not isinstance(samples, array) or samples.typecode != "f":
+        samples = array("f", samples)
+    if sys.byteorder == "big":
+        samples = array("f", samples)
+        samples.byteswap()
+    return samples.tobytes()
+
+
+def decode_samples(blob: bytes) -> Sequence[float]:
+    """The samples in blob, read in place rather than copied."""
+    if sys.byteorder == "big":
+        samples = array("f", blob)
+        samples.byteswap()
+        return samples
+    return memoryview(blob).cast("f")
+
+
+def lost_requests(samples: Iterable[float]) -> list[int]:
+    """Indexes of the requests that got no reply."""
+    return [i for i, ms in enumerate(samples) if math.isnan(ms)]
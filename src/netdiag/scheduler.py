@@ -0,0 +1,82 @@
+import threading
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+
+@dataclass
+class Job:
+    name: str
+    interval_s: float
+    func: Callable[[], None]
+    next_due: float
+
+
+class Scheduler:
+    """Run jobs on fixed intervals measured with a monotonic clock.
+
+    Jobs keep a fixed rate: the next run is scheduled one interval after the
+    previous due time rather than after the job finished, so a slow cycle does
+    not make the schedule drift. If a job falls a whole interval behind, the
+    missed runs are skipped instead of being fired back to back.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self._clock = clock
+        self._jobs: list[Job] = []
+        self._stop = threading.Event()
+
+    @property
+    def jobs(self) -> list[Job]:
+        return list(self._jobs)
+
+    def add_job(self, name: str, interval_s: float, func: Callable[[], None],
+                run_immediately: bool = True) -> Job:
+        if interval_s <= 0:
+            raise ValueError("interval_s must be positive")
+        now = self._clock()
+        job = Job(
+            name=name,
+            interval_s=interval_s,
+            func=func,
+            next_due=now if run_immediately else now + interval_s,
+        )
+        self._jobs.append(job)
+        return job
+
+    def run_pending(self) -> int:
+        """Run every job that is due and return how many ran."""
+        ran = 0
+        for job in self._jobs:
+            if self._clock() < job.next_due:
+                continue
+            job.func()
+            ran += 1
+            job.next_due += job.interval_s
+            now = self._clock()
+            if job.next_due <= now:
+                job.next_due = now + job.interval_s
+        return ran
+
+    def seconds_until_next(self) -> float:
+        if not self._jobs:
+            return 0.0
+        return max(0.0, min(job.next_due for job in self._jobs) - self._clock())
+
+    def run(self, max_ticks: int | None = None) -> None:
+        """Block running jobs until stop() is called or max_ticks ticks ran.
+
+        A tick is one pass of run_pending() that ran at least one job.
+        """
+        if not self._jobs:
+            raise ValueError("no jobs scheduled")
+        ticks = 0
+        while not self._stop.is_set():
+            if self.run_pending():
+                ticks += 1
+                if max_ticks is not None and ticks >= max_ticks:
+                    return
+            self._stop.wait(self.seconds_until_next())
+
+    def stop(self) -> None:
+        self._stop.set()
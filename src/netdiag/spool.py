@@ -0,0 +1,161 @@
+"""Crash-safe, append-only spool of ping records that could not be stored.
+
+Records land here when the database cannot take them (locked, corrupt, full
+disk) and when the background writer's queue overflows. One JSON object per
+line, appended and fsynced once per batch, so a crash loses at most the
+torn final line.
+
+replay_spool() writes the records back through a sink once the database is
+usable. The spool is first renamed to <spool>.replay so appends made during
+the replay start a fresh spool, and the claimed file is only deleted after
+the records are committed. Replays insert with dedupe, keyed on
+(session_id, target, timestamp), so a replay interrupted after its commit
+stores nothing twice when it runs again.
+"""
+
+import base64
+import json
+import os
+from collections.abc import Iterable
+from contextlib import nullcontext
+from dataclasses import asdict
+from datetime import datetime, timezone
+from itertools import groupby
+from pathlib import Path
+
+from netdiag.data.ping import (
+    DiagnosisCause,
+    PingDiagnosis,
+    PingMetrics,
+    PingRecord,
+    PingSignals,
+)
+
+
+def spool_path(database_path: str | Path) -> Path:
+    return Path(database_path).with_suffix(".spool")
+
+
+def _claimed_path(path: Path) -> Path:
+    return path.with_name(path.name + ".replay")
+
+
+def ping_record_to_json(ping_record: PingRecord) -> str:
+    return json.dumps({
+        "session_id": ping_record.session_id,
+        "timestamp": ping_record.timestamp.isoformat(),
+        "target": ping_record.target,
+        "metrics": asdict(ping_record.metrics),
+        "signals": ping_record.signals.to_bits(),
+        "cause": ping_record.diagnosis.cause.value,
+        "summary": ping_record.diagnosis.summary,
+        "confidence": ping_record.diagnosis.confidence,
+        "evidence": ping_record.diagnosis.evidence,
+        "rtt_samples": _encode_blob(ping_record.rtt_samples),
+        "rtt_hist": _encode_blob(ping_record.rtt_hist),
+        "configured_target": ping_record.configured_target,
+        "truncated": ping_record.truncated,
+    }, separators=(",", ":"))
+
+
+def ping_record_from_json(line: str) -> PingRecord:
+    raw = json.loads(line)
+    timestamp = datetime.fromisoformat(raw["timestamp"])
+    if timestamp.tzinfo is None:
+        timestamp = timestamp.replace(tzinfo=timezone.utc)
+    return PingRecord(
+        session_id=raw["session_id"],
+        timestamp=timestamp,
+        target=raw["target"],
+        metrics=PingMetrics(**raw["metrics"]),
+        signals=PingSignals.from_bits(raw["signals"]),
+        diagnosis=PingDiagnosis(
+            cause=DiagnosisCause(raw["cause"]),
+            summary=raw["summary"],
+            confidence=raw["confidence"],
+            evidence=raw["evidence"],
+        ),
+        rtt_samples=_decode_blob(raw.get("rtt_samples")),
+        rtt_hist=_decode_blob(raw.get("rtt_hist")),
+        configured_target=raw.get("configured_target"),
+        truncated=raw.get("truncated", False),
+    )
+
+
+def _encode_blob(blob: bytes | None) -> str | None:
+    return base64.b64encode(blob).decode("ascii") if blob is not None else None
+
+
+def _decode_blob(text: str | None) -> bytes | None:
+    return base64.b64decode(text) if text is not None else None
+
+
+def append_to_spool(path: Path, ping_records: Iterable[PingRecord]) -> int:
+    """Append records to the spool, durably, and return how many were written."""
+    lines = [(ping_record_to_json(r) + "\n").encode("utf-8") for r in ping_records]
+    if not lines:
+        return 0
+    with open(path, "ab+") as f:
+        # A crash mid-append leaves a torn last line; end it first, so the
+        # new records start on a line of their own instead of being skipped
+        # along with it
+        if f.seek(0, os.SEEK_END) > 0:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+        f.writelines(lines)
+        f.flush()
+        # One fsync for the whole batch rather than one per record
+        os.fsync(f.fileno())
+    return len(lines)
+
+
+def read_spool(path: Path) -> list[PingRecord]:
+    """Every record in a spool file, oldest first.
+
+    A line that does not parse (the tail of an interrupted append) is
+    skipped rather than failing the whole spool.
+    """
+    try:
+        with open(path, encoding="utf-8") as f:
+            lines = f.readlines()
+    except FileNotFoundError:
+        return []
+
+    records = []
+    for line in lines:
+        try:
+            records.append(ping_record_from_json(line))
+        except (ValueError, KeyError, TypeError):
+            continue
+    return records
+
+
+def spool_pending(path: Path) -> bool:
+    """Whether there is anything to replay, without reading it."""
+    return path.exists() or _claimed_path(path).exists()
+
+
+def replay_spool(path: Path, sink, claim_lock=None) -> int:
+    """Store spooled records through sink and delete them once committed.
+
+    sink is anything with insert_batch(session_id=, ping_records=, dedupe=),
+    e.g. a writer.DatabaseWriter or a partitions.PartitionWriter. claim_lock,
+    if given, is held only while the spool is renamed, so appends made under
+    the same lock never land in a file that is being replayed. Returns how
+    many records were replayed. If the sink raises, the records stay claimed
+    and the next replay picks them up again.
+    """
+    claimed = _claimed_path(path)
+    with claim_lock or nullcontext():
+        if not claimed.exists():
+            try:
+                os.replace(path, claimed)
+            except FileNotFoundError:
+                return 0
+
+    records = read_spool(claimed)
+    for session_id, group in groupby(records, key=lambda r: r.session_id):
+        sink.insert_batch(session_id=session_id, ping_records=list(group), dedupe=True)
+    claimed.unlink()
+    return len(records)
@@ -0,0 +1,212 @@
+"""Background persistence of probe cycles.
+
+The prober hands each cycle to BackgroundWriter.insert_batch(), which only
+puts it on a bounded queue; a dedicated thread takes cycles off the queue
+and writes them. A slow disk or a reader holding the lock then delays the
+writer, never the next probe.
+
+The thread groups cycles into one transaction until batch_records records
+are waiting or flush_interval_ms has passed since the first of them. When
+the queue is full, the overflow policy either spills the cycle to the
+spool file or drops it. Writes that fail (locked, corrupt or full database)
+always go to the spool. The spool is replayed whenever the queue is idle,
+at most every SPOOL_RETRY_S after a failure.
+
+SQLite connections belong to the thread that opened them, so the thread
+opens its own through the open_sink factory, and opens a fresh one after
+a failed write.
+"""
+
+import queue
+import sqlite3
+import threading
+import time
+from collections.abc import Callable, Iterable
+from itertools import groupby
+from pathlib import Path
+from typing import Protocol
+
+from netdiag.config.config import StorageConfig, WriterConfig
+from netdiag.data.ping import PingRecord
+from netdiag.database import apply_storage_pragmas, insert_ping_batch_db
+from netdiag.histogram import register_sql_functions
+from netdiag.spool import append_to_spool, replay_spool, spool_pending
+
+# One probe cycle: the session it belongs to and its records
+Cycle = tuple[str, list[PingRecord]]
+
+# How long the writer leaves the database alone after a failure
+SPOOL_RETRY_S = 30.0
+
+
+class RecordSink(Protocol):
+    def insert_batch(self, *,
+                     session_id: str,
+                     ping_records: Iterable[PingRecord],
+                     dedupe: bool = False) -> None: ...
+
+    def close(self) -> None: ...
+
+
+class DatabaseWriter:
+    """RecordSink writing over one connection; close() closes it."""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    @classmethod
+    def connect(cls, database_path: str | Path, storage: StorageConfig) -> "DatabaseWriter":
+        conn = sqlite3.connect(database_path)
+        apply_storage_pragmas(conn, storage)
+        register_sql_functions(conn)
+        return cls(conn)
+
+    def insert_batch(self, *,
+                     session_id: str,
+                     ping_records: Iterable[PingRecord],
+                     dedupe: bool = False) -> None:
+        insert_ping_batch_db(
+            session_id=session_id, ping_records=ping_records, conn=self.conn, dedupe=dedupe
+        )
+
+    def close(self) -> None:
+        self.conn.close()
+
+
+class BackgroundWriter:
+    def __init__(self,
+                 open_sink: Callable[[], RecordSink],
+                 config: WriterConfig,
+                 spool: Path | None = None):
+        self._open_sink = open_sink
+        self.config = config
+        self.spool = spool
+        self._queue: queue.Queue[Cycle] = queue.Queue(config.max_pending_cycles)
+        self._closing = threading.Event()
+        self._spool_lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+        self._sink: RecordSink | None = None
+        self._retry_at = 0.0
+        # Records written, spilled to the spool and lost, for reporting
+        self.written = 0
+        self.spilled = 0
+        self.dropped = 0
+
+    def insert_batch(self, *, session_id: str, ping_records: Iterable[PingRecord]) -> None:
+        """Queue one cycle for writing; never blocks on storage."""
+        ping_records = list(ping_records)
+        if not ping_records:
+            return
+        if self._thread is None:
+            # Started on first use, so a daemon that never probes opens nothing
+            self._thread = threading.Thread(target=self._run, name="netdiag-writer",
+                                            daemon=True)
+            self._thread.start()
+        try:
+            self._queue.put_nowait((session_id, ping_records))
+        except queue.Full:
+            self._overflow(ping_records)
+
+    def _overflow(self, ping_records: list[PingRecord]) -> None:
+        if self.config.overflow == "spill":
+            self._spill(ping_records)
+        else:
+            self.dropped += len(ping_records)
+
+    def _spill(self, ping_records: list[PingRecord]) -> None:
+        if self.spool is None:
+            self.dropped += len(ping_records)
+            return
+        try:
+            with self._spool_lock:
+                self.spilled += append_to_spool(self.spool, ping_records)
+        except OSError as e:
+            print(f"[!] spooling {len(ping_records)} records failed: {e}")
+            self.dropped += len(ping_records)
+
+    def close(self) -> None:
+        """Write everything still queued, then stop the thread."""
+        self._closing.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self) -> None:
+        try:
+            self._sink = self._open_sink()
+        except Exception as e:
+            self._failed(e)
+        try:
+            while True:
+                batch = self._collect()
+                if batch:
+                    self._write(batch)
+                if self._queue.empty():
+                    self._replay_spool()
+                    if not batch and self._closing.is_set():
+                        break
+        finally:
+            self._close_sink()
+
+    def _close_sink(self) -> None:
+        if self._sink is not None:
+            try:
+                self._sink.close()
+            except Exception:
+                pass
+        self._sink = None
+
+    def _failed(self, e: Exception) -> None:
+        # Drop the connection, it may be the broken part, and back off
+        print(f"[!] database write failed, spooling records: {e}")
+        self._close_sink()
+        self._retry_at = time.monotonic() + SPOOL_RETRY_S
+
+    def _collect(self) -> list[Cycle]:
+        """Wait for cycles and return the ones that make up one group commit."""
+        flush_s = self.config.flush_interval_ms / 1000
+        try:
+            batch = [self._queue.get(timeout=0 if self._closing.is_set() else flush_s)]
+        except queue.Empty:
+            return []
+        records = len(batch[0][1])
+        deadline = time.monotonic() + flush_s
+        while records < self.config.batch_records:
+            # Once closing, take what is queued without waiting for more
+            remaining = 0 if self._closing.is_set() else deadline - time.monotonic()
+            try:
+                cycle = self._queue.get(timeout=max(0.0, remaining))
+            except queue.Empty:
+                break
+            batch.append(cycle)
+            records += len(cycle[1])
+        return batch
+
+    def _write(self, batch: list[Cycle]) -> None:
+        # Consecutive cycles of one session (every cycle, in the daemon) go
+        # through a single insert_batch and so a single commit
+        for session_id, cycles in groupby(batch, key=lambda cycle: cycle[0]):
+            ping_records = [r for _, records in cycles for r in records]
+            if time.monotonic() < self._retry_at:
+                self._spill(ping_records)
+                continue
+            try:
+                if self._sink is None:
+                    self._sink = self._open_sink()
+                self._sink.insert_batch(session_id=session_id, ping_records=ping_records)
+                self.written += len(ping_records)
+            except Exception as e:
+                self._failed(e)
+                self._spill(ping_records)
+
+    def _replay_spool(self) -> None:
+        if self.spool is None or time.monotonic() < self._retry_at:
+            return
+        if not spool_pending(self.spool):
+            return
+        try:
+            if self._sink is None:
+                self._sink = self._open_sink()
+            self.written += replay_spool(self.spool, self._sink, claim_lock=self._spool_lock)
+        except Exception as e:
+            self._failed(e)
@@ -0,0 +1,84 @@
+"""Tests for bulk diagnosis (analysis/batch.py)
+
+Both backends are checked row by row against the per-record functions.
+"""
+
+import importlib.util
+import random
+
+import pytest
+
+import netdiag.data.ping as ping
+from netdiag.analysis.batch import METRIC_COLUMNS, diagnose_columns
+from netdiag.analysis.ping import build_ping_diagnosis, build_ping_signals
+
+
+def random_metrics(n, seed=0):
+    rng = random.Random(seed)
+    metrics = []
+    for _ in range(n):
+        sent = rng.choice((3, 5, 20, 50))
+        received = rng.choice((0, sent, sent, max(0, sent - rng.randint(1, sent))))
+        avg = rng.choice((0.0, rng.uniform(1, 600), 150.0, 400.0))
+        metrics.append(ping.PingMetrics(
+            sent=sent,
+            received=received,
+            loss_pct=(sent - received) * 100.0 / sent,
+            rtt_min_ms=avg * rng.uniform(0.2, 1.0),
+            rtt_avg_ms=avg,
+            rtt_max_ms=avg * rng.uniform(1.0, 2.0),
+            rtt_stddev_ms=avg * rng.uniform(0.0, 0.5),
+            jitter=rng.choice((0.0, 5.0, 8.0, 12.0, rng.uniform(0, 40))),
+            jitter_ratio=rng.choice((0.25, 0.35, 0.5, rng.uniform(0, 1))),
+        ))
+    return metrics
+
+
+def columns(metrics):
+    return {name: [getattr(m, name) for m in metrics] for name in METRIC_COLUMNS}
+
+
+def expected(metrics):
+    rows = []
+    for m in metrics:
+        signals = build_ping_signals(m)
+        diagnosis = build_ping_diagnosis(m, signals)
+        rows.append((signals.to_bits(), ping.CAUSE_CODES[diagnosis.cause], diagnosis.confidence))
+    return rows
+
+
+HAS_NUMPY = importlib.util.find_spec("numpy") is not None
+
+BACKENDS = [
+    False,
+    pytest.param(True, marks=pytest.mark.skipif(not HAS_NUMPY, reason="NumPy is not installed")),
+]
+
+
+class TestDiagnoseColumns:
+    """Test bulk diagnosis matches the per-record rules"""
+
+    @pytest.mark.parametrize("use_numpy", BACKENDS)
+    def test_matches_per_record_diagnosis(self, use_numpy):
+        metrics = random_metrics(2000)
+        result = diagnose_columns(columns(metrics), use_numpy=use_numpy)
+
+        got = list(zip(
+            result.signals.tolist(), result.causes.tolist(), result.confidences.tolist()
+        ))
+        for row, want in zip(got, expected(metrics)):
+            assert row[:2] == want[:2]
+            assert row[2] == pytest.approx(want[2])
+
+    @pytest.mark.parametrize("use_numpy", BACKENDS)
+    def test_empty_columns(self, use_numpy):
+        result = diagnose_columns(columns([]), use_numpy=use_numpy)
+        assert result.causes.tolist() == []
+
+    def test_follows_changed_thresholds(self, monkeypatch):
+        metrics = random_metrics(200, seed=1)
+        monkeypatch.setattr(ping, "HIGH_LATENCY_THRESHOLD_MS", 50)
+
+        result = diagnose_columns(columns(metrics), use_numpy=False)
+
+        assert result.causes.tolist() == [row[1] for row in expected(metrics)]
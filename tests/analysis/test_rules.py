@@ -0,0 +1,119 @@
+"""Tests for compiled diagnosis rules (analysis/rules.py)
+
+The default rules are checked record by record against the hand-written
+chain in analysis/ping.py.
+"""
+
+from dataclasses import replace
+
+import pytest
+
+import netdiag.data.ping as ping
+from netdiag.analysis.batch import diagnose_columns
+from netdiag.analysis.ping import build_ping_diagnosis, build_ping_signals
+from netdiag.analysis.rules import RuleBook, cause_table, compile_rules, constant_rules
+from netdiag.config.config import DiagnosisConfig
+from tests.analysis.test_batch import columns, random_metrics
+
+
+def slow_metrics(rtt_avg_ms, sent=50):
+    return ping.PingMetrics(
+        sent=sent, received=sent, loss_pct=0.0, rtt_min_ms=rtt_avg_ms,
+        rtt_avg_ms=rtt_avg_ms, rtt_max_ms=rtt_avg_ms, rtt_stddev_ms=0.0,
+        jitter=0.0, jitter_ratio=0.0,
+    )
+
+
+class TestCompileRules:
+    """Test compiled rules against the hand-written chain"""
+
+    def test_default_rules_match_chain(self):
+        evaluate = compile_rules(DiagnosisConfig())
+        for m in random_metrics(2000):
+            signals = build_ping_signals(m)
+            diagnosis = build_ping_diagnosis(m, signals)
+
+            bits, cause, confidence = evaluate(m)
+
+            assert bits == signals.to_bits()
+            assert cause == diagnosis.cause
+            assert confidence == pytest.approx(diagnosis.confidence)
+
+    def test_constant_rules_follow_module_constants(self, monkeypatch):
+        monkeypatch.setattr(ping, "HIGH_LATENCY_THRESHOLD_MS", 50)
+        assert constant_rules().high_latency_ms == 50
+
+    def test_threshold_changes_cause(self):
+        evaluate = compile_rules(DiagnosisConfig(high_latency_ms=700))
+        assert evaluate(slow_metrics(600.0))[1] == ping.DiagnosisCause.OK
+        assert evaluate(slow_metrics(800.0))[1] == ping.DiagnosisCause.HIGH_LATENCY
+
+    def test_tiers_change_confidence(self):
+        evaluate = compile_rules(DiagnosisConfig(latency_tiers_ms=(1000.0, 500.0)))
+        assert evaluate(slow_metrics(600.0))[2] == 0.85
+
+    def test_small_samples_are_penalised(self):
+        assert compile_rules(DiagnosisConfig())(slow_metrics(500.0, sent=5))[2] == 0.75
+
+
+class TestCauseTable:
+    """Test the lookup table follows the configured precedence"""
+
+    def test_default_precedence(self):
+        table = cause_table(DiagnosisConfig().precedence)
+        loss_and_latency = 1 << 2 | 1 << 3
+        assert table[0] == ping.DiagnosisCause.OK
+        assert table[loss_and_latency] == ping.DiagnosisCause.HIGH_LOSS
+
+    def test_reordered_precedence(self):
+        table = cause_table(("no_connectivity", "high_latency", "high_loss", "unstable_jitter"))
+        assert table[1 << 2 | 1 << 3] == ping.DiagnosisCause.HIGH_LATENCY
+
+    def test_signals_without_a_cause_are_ok(self):
+        table = cause_table(DiagnosisConfig().precedence)
+        any_loss_and_unstable = 1 << 1 | 1 << 5
+        assert table[any_loss_and_unstable] == ping.DiagnosisCause.OK
+
+
+class TestRuleBook:
+    """Test per-target overrides"""
+
+    def test_override_applies_to_its_target_only(self):
+        base = DiagnosisConfig()
+        rules = RuleBook(replace(base, targets={"sat": replace(base, high_latency_ms=700)}))
+
+        assert rules.diagnose("sat", slow_metrics(600.0))[1].cause == ping.DiagnosisCause.OK
+        assert (rules.diagnose("8.8.8.8", slow_metrics(600.0))[1].cause
+                == ping.DiagnosisCause.HIGH_LATENCY)
+
+    def test_diagnosis_matches_chain(self):
+        m = slow_metrics(300.0)
+        signals, diagnosis = RuleBook(DiagnosisConfig()).diagnose("8.8.8.8", m)
+
+        assert signals == build_ping_signals(m)
+        assert diagnosis == build_ping_diagnosis(m, signals)
+
+
+class TestBatchRules:
+    """Test bulk diagnosis with a DiagnosisConfig matches compiled rules"""
+
+    @pytest.mark.parametrize("use_numpy", [False, True])
+    def test_matches_compiled_rules(self, use_numpy):
+        if use_numpy:
+            pytest.importorskip("numpy")
+        config = DiagnosisConfig(
+            high_latency_ms=80, loss_tiers_pct=(40.0, 20.0),
+            precedence=("high_latency", "no_connectivity", "unstable_jitter", "high_loss"),
+        )
+        metrics = random_metrics(1000, seed=2)
+        evaluate = compile_rules(config)
+
+        result = diagnose_columns(columns(metrics), use_numpy=use_numpy, rules=config)
+
+        for m, bits, cause, confidence in zip(
+            metrics, result.signals.tolist(), result.causes.tolist(),
+            result.confidences.tolist(),
+        ):
+            want = evaluate(m)
+            assert (bits, cause) == (want[0], ping.CAUSE_CODES[want[1]])
+            assert confidence == pytest.approx(want[2])
@@ -0,0 +1,61 @@
+"""Tests for the running RTT statistics (analysis/stats.py)
+
+The accumulator must agree with the two-pass formulas it replaces while
+seeing every sample only once.
+"""
+
+import random
+import statistics
+
+import pytest
+
+from netdiag.analysis.stats import RttStats
+
+
+class TestRttStats:
+    """Test Welford variance, jitter and min/max against direct computation"""
+
+    def test_empty(self):
+        stats = RttStats()
+        assert stats.count == 0
+        assert stats.mean == 0.0
+        assert stats.stddev == 0.0
+        assert stats.jitter == 0.0
+        assert stats.jitter_ratio == 0.0
+
+    def test_single_sample_has_no_spread(self):
+        stats = RttStats.from_samples([12.5])
+        assert stats.min_ms == stats.max_ms == stats.mean == 12.5
+        assert stats.stddev == 0.0
+        assert stats.jitter == 0.0
+
+    def test_matches_two_pass_formulas(self):
+        samples = [random.Random(7).uniform(5.0, 200.0) for _ in range(1000)]
+        stats = RttStats.from_samples(samples)
+
+        assert stats.count == 1000
+        assert stats.mean == pytest.approx(statistics.fmean(samples))
+        assert stats.stddev == pytest.approx(statistics.pstdev(samples))
+        assert stats.min_ms == min(samples)
+        assert stats.max_ms == max(samples)
+        diffs = [abs(b - a) for a, b in zip(samples, samples[1:])]
+        assert stats.jitter == pytest.approx(sum(diffs) / len(diffs))
+
+    def test_stable_with_large_offset(self):
+        # A naive sum of squares cancels catastrophically here
+        samples = [1e9 + x for x in (4.0, 7.0, 13.0, 16.0)]
+        assert RttStats.from_samples(samples).variance == pytest.approx(22.5)
+
+    def test_skips_lost_samples(self):
+        stats = RttStats.from_samples([10.0, None, 20.0])
+        assert stats.count == 2
+        assert stats.jitter == 10.0
+
+    def test_interarrival_jitter_follows_rfc3550(self):
+        stats = RttStats.from_samples([10.0, 26.0, 10.0])
+        # J1 = 16/16 = 1, J2 = 1 + (16 - 1)/16
+        assert stats.interarrival_jitter == pytest.approx(1.0 + 15.0 / 16)
+
+    def test_jitter_ratio_floors_mean_at_1ms(self):
+        stats = RttStats.from_samples([0.2, 0.6])
+        assert stats.jitter_ratio == pytest.approx(0.4)
@@ -0,0 +1,156 @@
+"""Tests for config parsing (config/config.py)"""
+
+import pytest
+
+from netdiag.config.config import (
+    DiagnosisConfig,
+    PingConfig,
+    RetentionConfig,
+    StorageConfig,
+    WriterConfig,
+    parse_diagnosis_config,
+    parse_ping_config,
+    parse_retention_config,
+    parse_storage_config,
+    parse_writer_config,
+)
+
+PING = {"enabled": True, "targets": ["8.8.8.8"], "count": 5, "timeout_ms": 1000,
+        "interval_s": 60}
+
+
+class TestParsePingConfig:
+    """Test the optional keys of [probes.ping]"""
+
+    def test_recent_results_default(self):
+        assert parse_ping_config(PING).recent_results == PingConfig.recent_results
+
+    def test_zero_keeps_no_recent_results(self):
+        assert parse_ping_config({**PING, "recent_results": 0}).recent_results == 0
+
+    @pytest.mark.parametrize("value", [-1, 1.5, "many"])
+    def test_rejects_invalid_recent_results(self, value):
+        with pytest.raises(ValueError):
+            parse_ping_config({**PING, "recent_results": value})
+
+
+class TestParseStorageConfig:
+    """Test the optional [storage] section"""
+
+    def test_missing_section_uses_defaults(self):
+        assert parse_storage_config({}) == StorageConfig()
+
+    def test_defaults_favour_concurrent_readers(self):
+        storage = StorageConfig()
+        assert storage.journal_mode == "wal"
+        assert storage.synchronous == "normal"
+        assert storage.busy_timeout_ms > 0
+
+    def test_modes_are_case_insensitive(self):
+        storage = parse_storage_config({"journal_mode": "WAL", "synchronous": "Full"})
+        assert storage.journal_mode == "wal"
+        assert storage.synchronous == "full"
+
+    def test_partitioning_is_opt_in(self):
+        assert StorageConfig().partition == "none"
+        assert parse_storage_config({"partition": "month"}).partition == "month"
+
+    @pytest.mark.parametrize("raw", [
+        {"journal_mode": "wal; DROP TABLE sessions"},
+        {"synchronous": "sometimes"},
+        {"cache_size": "big"},
+        {"mmap_size": -1},
+        {"busy_timeout_ms": 1.5},
+        {"partition": "week"},
+    ])
+    def test_rejects_invalid_values(self, raw):
+        with pytest.raises(ValueError):
+            parse_storage_config(raw)
+
+
+class TestParseRetentionConfig:
+    """Test the optional [retention] section"""
+
+    def test_missing_section_uses_defaults(self):
+        assert parse_retention_config({}) == RetentionConfig()
+
+    def test_rollups_outlive_raw_records_by_default(self):
+        retention = RetentionConfig()
+        assert 0 < retention.raw_days < retention.minute_rollup_days < retention.hour_rollup_days
+        assert retention.day_rollup_days == 0
+
+    def test_zero_disables_a_window(self):
+        retention = parse_retention_config({"raw_days": 0, "max_db_mb": 0})
+        assert retention.raw_days == 0
+        assert retention.max_db_mb == 0
+
+    @pytest.mark.parametrize("raw", [
+        {"raw_days": -1},
+        {"hour_rollup_days": 1.5},
+        {"max_db_mb": "64"},
+        {"day_rollup_days": True},
+        {"prune_interval_s": 0},
+    ])
+    def test_rejects_invalid_values(self, raw):
+        with pytest.raises(ValueError):
+            parse_retention_config(raw)
+
+
+class TestParseWriterConfig:
+    """Test the optional [writer] section"""
+
+    def test_missing_section_uses_defaults(self):
+        assert parse_writer_config({}) == WriterConfig()
+
+    def test_background_by_default(self):
+        writer = WriterConfig()
+        assert writer.background
+        assert writer.overflow == "spill"
+
+    @pytest.mark.parametrize("raw", [
+        {"background": "yes"},
+        {"max_pending_cycles": 0},
+        {"batch_records": -1},
+        {"flush_interval_ms": 0.5},
+        {"overflow": "block"},
+    ])
+    def test_rejects_invalid_values(self, raw):
+        with pytest.raises(ValueError):
+            parse_writer_config(raw)
+
+
+class TestParseDiagnosisConfig:
+    """Test the optional [diagnosis] section and its per-target overrides"""
+
+    def test_missing_section_uses_defaults(self):
+        assert parse_diagnosis_config({}) == DiagnosisConfig()
+
+    def test_overrides_start_from_section(self):
+        config = parse_diagnosis_config({
+            "high_loss_pct": 10,
+            "targets": {"sat": {"high_latency_ms": 700, "latency_tiers_ms": [1200, 900]}},
+        })
+        sat = config.targets["sat"]
+
+        assert config.high_loss_pct == sat.high_loss_pct == 10.0
+        assert sat.high_latency_ms == 700.0
+        assert sat.latency_tiers_ms == (1200.0, 900.0)
+        assert config.high_latency_ms == DiagnosisConfig.high_latency_ms
+
+    def test_precedence_is_a_tuple(self):
+        order = ["no_connectivity", "high_latency", "high_loss", "unstable_jitter"]
+        assert parse_diagnosis_config({"precedence": order}).precedence == tuple(order)
+
+    @pytest.mark.parametrize("raw", [
+        {"high_latency_ms": -1},
+        {"high_loss_pct": "5"},
+        {"loss_tiers_pct": [8.0, 15.0]},
+        {"latency_tiers_ms": [400.0]},
+        {"precedence": ["high_loss", "no_connectivity"]},
+        {"precedence": ["no_connectivity", "high_loss", "high_loss", "high_latency"]},
+        {"targets": ["sat"]},
+        {"targets": {"sat": {"high_latency_ms": True}}},
+    ])
+    def test_rejects_invalid_values(self, raw):
+        with pytest.raises(ValueError):
+            parse_diagnosis_config(raw)
@@ -148,6 +148,29 @@ class TestPingSignals:
         assert signals.unstable_jitter
         assert signals.unstable
 
+    def test_bits_round_trip(self):
+        """Test signals pack into one bit per field and back"""
+        signals = PingSignals(
+            no_reply=True,
+            any_loss=False,
+            high_loss=True,
+            high_latency=False,
+            unstable_jitter=False,
+            unstable=True,
+        )
+
+        assert signals.to_bits() == 0b100101
+        assert PingSignals.from_bits(signals.to_bits()) == signals
+
+    def test_signals_are_read_only(self):
+        """Test packed signals cannot be changed after construction"""
+        signals = PingSignals.from_bits(0b000001)
+
+        with pytest.raises(AttributeError):
+            signals.no_reply = False
+        assert signals.no_reply
+        assert not hasattr(signals, "__dict__")
+
 
 class TestPingDiagnosis:
     """Test PingDiagnosis dataclass"""
@@ -276,3 +299,14 @@ class TestPingRecord:
         assert isinstance(record.metrics, PingMetrics)
         assert isinstance(record.signals, PingSignals)
         assert isinstance(record.diagnosis, PingDiagnosis)
+
+    def test_record_parts_are_slotted(self):
+        """Test records carry no per-instance __dict__"""
+        metrics = PingMetrics(
+            sent=1, received=1, loss_pct=0.0, rtt_min_ms=1.0, rtt_avg_ms=1.0,
+            rtt_max_ms=1.0, rtt_stddev_ms=0.0, jitter=0.0, jitter_ratio=0.0,
+        )
+
+        assert not hasattr(metrics, "__dict__")
+        with pytest.raises(Exception):  # FrozenInstanceError
+            metrics.sent = 2
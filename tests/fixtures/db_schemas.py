@@ -0,0 +1,22 @@
+"""Schemas of databases written by earlier netdiag versions
+
+Migration tests build these by hand to check that existing netdiag.db
+files are upgraded in place.
+"""
+
+# ping_records as created before the ts column existed
+LEGACY_PING_RECORDS = """
+    CREATE TABLE ping_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        target TEXT NOT NULL,
+        sent INTEGER, received INTEGER, loss_pct REAL,
+        rtt_min_ms REAL, rtt_avg_ms REAL, rtt_max_ms REAL, rtt_stddev_ms REAL,
+        jitter REAL, jitter_ratio REAL,
+        no_reply BOOLEAN, any_loss BOOLEAN, high_loss BOOLEAN, high_latency BOOLEAN,
+        unstable_jitter BOOLEAN, unstable BOOLEAN,
+        diagnosis_cause TEXT, diagnosis_confidence REAL, diagnosis_summary TEXT,
+        diagnosis_evidence TEXT
+    )
+"""
@@ -4,6 +4,7 @@ These are actual outputs collected from real systems to ensure
 our parser handles all variations correctly across:
 - macOS
 - Linux (iputils-ping)
+- Linux (BusyBox ping)
 - Windows
 """
 
@@ -121,6 +122,26 @@ LINUX_UNSTABLE = """PING 8.8.8.8 (8.8.8.8) 56(84) bytes of data.
 rtt min/avg/max/mdev = 10.100/73.760/180.300/75.234 ms
 """
 
+# ============================================================================
+# Linux (BusyBox ping) Cases
+# ============================================================================
+
+BUSYBOX_SUCCESS = """PING 8.8.8.8 (8.8.8.8): 56 data bytes
+64 bytes from 8.8.8.8: seq=0 ttl=117 time=10.100 ms
+64 bytes from 8.8.8.8: seq=1 ttl=117 time=15.400 ms
+64 bytes from 8.8.8.8: seq=2 ttl=117 time=12.700 ms
+
+--- 8.8.8.8 ping statistics ---
+3 packets transmitted, 3 packets received, 0% packet loss
+round-trip min/avg/max = 10.100/12.733/15.400 ms
+"""
+
+BUSYBOX_TOTAL_LOSS = """PING 192.0.2.1 (192.0.2.1): 56 data bytes
+
+--- 192.0.2.1 ping statistics ---
+3 packets transmitted, 0 packets received, 100% packet loss
+"""
+
 # ============================================================================
 # Windows Cases
 # ============================================================================
@@ -221,6 +242,11 @@ LINUX_SAMPLES = {
     "unstable": LINUX_UNSTABLE,
 }
 
+BUSYBOX_SAMPLES = {
+    "success": BUSYBOX_SUCCESS,
+    "total_loss": BUSYBOX_TOTAL_LOSS,
+}
+
 WINDOWS_SAMPLES = {
     "success": WINDOWS_SUCCESS,
     "partial_loss": WINDOWS_PARTIAL_LOSS,
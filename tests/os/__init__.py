@@ -0,0 +1 @@
+"""Tests for OS adapters"""
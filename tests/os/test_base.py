@@ -0,0 +1,251 @@
+"""Tests for shared OSAdapter behaviour (gateway cache, ping deadlines)"""
+
+import sqlite3
+import subprocess
+import sys
+import time
+from unittest.mock import Mock, patch
+
+import pytest
+
+from netdiag.database import create_db, insert_ping_batch_db
+from netdiag.os.base import OSAdapter, PingProcess, ping_deadline_s, run_with_deadline
+from netdiag.os.linux import LinuxAdapter
+from netdiag.presentation import format_ping_report
+from netdiag.probes.ping import run_ping
+from netdiag.spool import ping_record_from_json, ping_record_to_json
+from tests.fixtures.ping_samples import LINUX_SAMPLES
+
+
+class FakeAdapter(OSAdapter):
+    """Adapter whose gateway and routing fingerprint are set by the test"""
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.gateway = "192.168.1.1"
+        self.fingerprint = None
+        self.lookups = 0
+
+    def build_ping_command(self, host, count, timeout_ms):
+        return []
+
+    def execute_ping(self, host, count, timeout_ms):
+        raise NotImplementedError
+
+    def parse_ping(self, raw_input):
+        raise NotImplementedError
+
+    def stream_parser(self, on_reply=None, keep_samples=True):
+        raise NotImplementedError
+
+    def get_gateway_ip(self):
+        self.lookups += 1
+        return self.gateway
+
+    def gateway_fingerprint(self):
+        return self.fingerprint
+
+
+@pytest.fixture
+def clock():
+    with patch("netdiag.os.base.time.monotonic", return_value=1000.0) as mock_clock:
+        yield mock_clock
+
+
+class TestGatewayCache:
+    """Test TTL caching and change detection in resolve_gateway"""
+
+    def test_reuses_gateway_within_ttl(self, clock):
+        adapter = FakeAdapter(gateway_ttl_s=30)
+
+        assert adapter.resolve_gateway() == "192.168.1.1"
+        clock.return_value += 29
+        assert adapter.resolve_gateway() == "192.168.1.1"
+
+        assert adapter.lookups == 1
+
+    def test_looks_up_again_after_ttl(self, clock):
+        adapter = FakeAdapter(gateway_ttl_s=30)
+
+        adapter.resolve_gateway()
+        clock.return_value += 30
+        adapter.resolve_gateway()
+
+        assert adapter.lookups == 2
+
+    def test_zero_ttl_disables_cache(self, clock):
+        adapter = FakeAdapter(gateway_ttl_s=0)
+
+        adapter.resolve_gateway()
+        adapter.resolve_gateway()
+
+        assert adapter.lookups == 2
+
+    def test_fingerprint_change_invalidates(self, clock):
+        """Test a routing table change is picked up before the TTL expires"""
+        adapter = FakeAdapter(gateway_ttl_s=30)
+        adapter.fingerprint = "table-a"
+        adapter.resolve_gateway()
+
+        adapter.fingerprint = "table-b"
+        adapter.gateway = "10.0.0.1"
+
+        assert adapter.resolve_gateway() == "10.0.0.1"
+
+    def test_invalidate_forces_lookup(self, clock):
+        adapter = FakeAdapter(gateway_ttl_s=30)
+        adapter.resolve_gateway()
+
+        adapter.invalidate_gateway()
+        adapter.resolve_gateway()
+
+        assert adapter.lookups == 2
+
+    def test_records_gateway_change(self, clock):
+        adapter = FakeAdapter(gateway_ttl_s=0)
+        adapter.resolve_gateway()
+        adapter.gateway = "10.0.0.1"
+        adapter.resolve_gateway()
+
+        [change] = adapter.drain_gateway_changes()
+        assert change.previous == "192.168.1.1"
+        assert change.current == "10.0.0.1"
+        assert adapter.drain_gateway_changes() == []
+
+    def test_first_lookup_is_not_a_change(self, clock):
+        adapter = FakeAdapter()
+        adapter.resolve_gateway()
+        assert adapter.drain_gateway_changes() == []
+
+
+# Stand-in for a wedged ping: prints two replies, then hangs
+WEDGED_PING = """
+import time
+print("64 bytes from 10.0.0.1: icmp_seq=1 ttl=64 time=1.5 ms", flush=True)
+print("64 bytes from 10.0.0.1: icmp_seq=2 ttl=64 time=2.5 ms", flush=True)
+time.sleep(60)
+"""
+
+# Stand-in for ping stopped with Ctrl-C: prints its statistics on SIGINT
+INTERRUPTIBLE_PING = """
+import time
+print("64 bytes from 10.0.0.1: icmp_seq=1 ttl=64 time=1.5 ms", flush=True)
+try:
+    time.sleep(60)
+except KeyboardInterrupt:
+    print("--- 10.0.0.1 ping statistics ---")
+    print("3 packets transmitted, 1 received, 66% packet loss, time 2003ms")
+    print("rtt min/avg/max/mdev = 1.500/1.500/1.500/0.000 ms")
+"""
+
+
+class TestRunWithDeadline:
+    """Test the deadline-aware ping executor with real child processes"""
+
+    def test_fast_command_completes(self):
+        result = run_with_deadline([sys.executable, "-c", "print('done')"], deadline_s=10)
+
+        assert not result.timed_out
+        assert result.returncode == 0
+        assert result.stdout.strip() == "done"
+
+    def test_wedged_command_is_stopped_and_output_kept(self):
+        started = time.monotonic()
+        result = run_with_deadline([sys.executable, "-c", WEDGED_PING], deadline_s=1.0)
+
+        assert time.monotonic() - started < 5
+        assert result.timed_out
+        assert "time=2.5 ms" in result.stdout
+
+    @pytest.mark.skipif(sys.platform == "win32", reason="SIGINT delivery is POSIX only")
+    def test_interrupted_ping_prints_statistics(self):
+        result = run_with_deadline([sys.executable, "-c", INTERRUPTIBLE_PING], deadline_s=1.0)
+
+        assert result.timed_out
+        assert "ping statistics" in result.stdout
+
+    def test_deadline_budget(self):
+        assert ping_deadline_s(count=5, timeout_ms=1000) == 7.0
+
+    def test_deadline_allows_every_request_its_timeout(self):
+        # With -W 3 each unanswered request can hold the run for 3 s
+        assert ping_deadline_s(count=5, timeout_ms=3000) == 17.0
+
+
+class TestSalvagePing:
+    """Test turning partial ping output into a truncated result"""
+
+    def test_partial_output_counts_missing_replies_as_lost(self):
+        raw = "\n".join(LINUX_SAMPLES["success"].splitlines()[:3])
+        result = LinuxAdapter().salvage_ping(raw, host="8.8.8.8", count=5)
+
+        assert result.truncated
+        assert result.address == "8.8.8.8"
+        assert list(result.times_ms) == [10.1, 15.4]
+        assert result.sent == 5
+        assert result.received == 2
+        assert result.loss_pct == 60.0
+        assert result.rtt_avg_ms == pytest.approx(12.75)
+
+    def test_no_output_is_total_loss(self):
+        result = LinuxAdapter().salvage_ping("", host="8.8.8.8", count=3)
+
+        assert result.truncated
+        assert result.received == 0
+        assert result.loss_pct == 100.0
+
+    def test_complete_output_is_parsed_normally(self):
+        result = LinuxAdapter().salvage_ping(LINUX_SAMPLES["success"], host="8.8.8.8", count=5)
+
+        assert result.truncated
+        assert result.rtt_stddev_ms == 2.891
+
+    def test_run_ping_salvages_timed_out_probe(self):
+        adapter = LinuxAdapter()
+        raw = "\n".join(LINUX_SAMPLES["success"].splitlines()[:2])
+        adapter.execute_ping = Mock(
+            return_value=PingProcess(["ping"], -9, stdout=raw, stderr="", timed_out=True)
+        )
+
+        record = run_ping(
+            host="8.8.8.8", os_adapter=adapter, count=4, timeout_ms=1000, session_id="test-123"
+        )
+
+        assert record.metrics.sent == 4
+        assert record.metrics.received == 1
+        assert record.signals.high_loss
+        assert record.truncated
+
+    def test_truncated_flag_reaches_storage_and_report(self):
+        adapter = LinuxAdapter()
+        raw = "\n".join(LINUX_SAMPLES["success"].splitlines()[:2])
+        adapter.execute_ping = Mock(
+            return_value=PingProcess(["ping"], -9, stdout=raw, stderr="", timed_out=True)
+        )
+        record = run_ping(
+            host="8.8.8.8", os_adapter=adapter, count=4, timeout_ms=1000, session_id="s1"
+        )
+        conn = sqlite3.connect(":memory:")
+        create_db(conn)
+
+        insert_ping_batch_db(session_id="s1", ping_records=[record], conn=conn)
+
+        assert conn.execute("SELECT truncated FROM ping_results").fetchone() == (1,)
+        assert ping_record_from_json(ping_record_to_json(record)).truncated
+        assert "stopped at deadline" in format_ping_report(record)
+        conn.close()
+
+    def test_completed_process_without_flag_parsed_normally(self):
+        adapter = LinuxAdapter()
+        adapter.execute_ping = Mock(
+            return_value=subprocess.CompletedProcess(
+                ["ping"], 0, stdout=LINUX_SAMPLES["success"], stderr=""
+            )
+        )
+
+        record = run_ping(
+            host="8.8.8.8", os_adapter=adapter, count=5, timeout_ms=1000, session_id="test-123"
+        )
+
+        assert record.metrics.received == 5
+        assert not record.truncated
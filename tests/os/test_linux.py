@@ -0,0 +1,169 @@
+"""Tests for the Linux OS adapter
+
+Gateway lookup reads /proc/net/route, so tests feed it captured routing
+tables through a temporary file instead of mocking subprocess calls.
+"""
+
+import socket
+import struct
+import sys
+from unittest.mock import patch
+
+import pytest
+
+from netdiag.os import get_os_adapter
+from netdiag.os.dialects import BUSYBOX, IPUTILS
+from netdiag.os.linux import LinuxAdapter, detect_linux_dialect, parse_proc_net_route
+from tests.fixtures.ping_samples import BUSYBOX_SAMPLES, LINUX_SAMPLES
+
+ROUTE_HEADER = (
+    "Iface\tDestination\tGateway \tFlags\tRefCnt\tUse\tMetric\tMask\t\tMTU\tWindow\tIRTT"
+)
+
+
+def hex_addr(address):
+    # As the kernel prints it: the address as a host byte order u32
+    return f"{struct.unpack('=L', socket.inet_aton(address))[0]:08X}"
+
+
+ANY, GW, WLAN_GW = hex_addr("0.0.0.0"), hex_addr("192.168.1.1"), hex_addr("10.0.0.1")
+LAN, LAN_MASK = hex_addr("192.168.1.0"), hex_addr("255.255.255.0")
+
+ROUTE_SINGLE_DEFAULT = f"""{ROUTE_HEADER}
+eth0\t{ANY}\t{GW}\t0003\t0\t0\t100\t{ANY}\t0\t0\t0
+eth0\t{LAN}\t{ANY}\t0001\t0\t0\t100\t{LAN_MASK}\t0\t0\t0
+"""
+
+ROUTE_TWO_DEFAULTS = f"""{ROUTE_HEADER}
+wlan0\t{ANY}\t{WLAN_GW}\t0003\t0\t0\t600\t{ANY}\t0\t0\t0
+eth0\t{ANY}\t{GW}\t0003\t0\t0\t100\t{ANY}\t0\t0\t0
+"""
+
+ROUTE_NO_DEFAULT = f"""{ROUTE_HEADER}
+eth0\t{LAN}\t{ANY}\t0001\t0\t0\t100\t{LAN_MASK}\t0\t0\t0
+"""
+
+ROUTE_DEFAULT_DOWN = f"""{ROUTE_HEADER}
+eth0\t{ANY}\t{GW}\t0002\t0\t0\t100\t{ANY}\t0\t0\t0
+"""
+
+# Captured on x86_64
+ROUTE_LITTLE_ENDIAN = f"""{ROUTE_HEADER}
+eth0\t00000000\t0101A8C0\t0003\t0\t0\t100\t00000000\t0\t0\t0
+"""
+
+
+class TestParseProcNetRoute:
+    """Test default gateway extraction from the kernel routing table"""
+
+    def test_single_default_route(self):
+        assert parse_proc_net_route(ROUTE_SINGLE_DEFAULT) == "192.168.1.1"
+
+    def test_lowest_metric_wins(self):
+        assert parse_proc_net_route(ROUTE_TWO_DEFAULTS) == "192.168.1.1"
+
+    def test_no_default_route(self):
+        assert parse_proc_net_route(ROUTE_NO_DEFAULT) is None
+
+    def test_ignores_routes_that_are_down(self):
+        assert parse_proc_net_route(ROUTE_DEFAULT_DOWN) is None
+
+    def test_empty_table(self):
+        assert parse_proc_net_route(ROUTE_HEADER + "\n") is None
+
+    def test_gateway_is_read_in_host_byte_order(self):
+        table = f"{ROUTE_HEADER}\neth0\t{ANY}\t{hex_addr('10.20.30.1')}\t0003\t0\t0\t0\t{ANY}\n"
+        assert parse_proc_net_route(table) == "10.20.30.1"
+
+    @pytest.mark.skipif(sys.byteorder != "little", reason="table captured on a little-endian host")
+    def test_little_endian_capture(self):
+        assert parse_proc_net_route(ROUTE_LITTLE_ENDIAN) == "192.168.1.1"
+
+    @pytest.mark.skipif(sys.byteorder != "big", reason="needs a big-endian host")
+    def test_big_endian_host(self):
+        table = f"{ROUTE_HEADER}\neth0\t00000000\tC0A80101\t0003\t0\t0\t100\t00000000\n"
+        assert parse_proc_net_route(table) == "192.168.1.1"
+
+
+class TestLinuxAdapter:
+    """Test LinuxAdapter command building and gateway lookup"""
+
+    @pytest.fixture
+    def adapter_with_routes(self, tmp_path):
+        def make(table):
+            route_file = tmp_path / "route"
+            route_file.write_text(table)
+            adapter = LinuxAdapter()
+            adapter.route_table_path = str(route_file)
+            return adapter
+
+        return make
+
+    def test_gateway_from_route_table(self, adapter_with_routes):
+        adapter = adapter_with_routes(ROUTE_SINGLE_DEFAULT)
+        with patch("subprocess.run") as mock_run:
+            assert adapter.get_gateway_ip() == "192.168.1.1"
+        mock_run.assert_not_called()
+
+    def test_missing_gateway_raises(self, adapter_with_routes):
+        adapter = adapter_with_routes(ROUTE_NO_DEFAULT)
+        with pytest.raises(ValueError):
+            adapter.get_gateway_ip()
+
+    def test_fingerprint_tracks_route_table(self, adapter_with_routes, tmp_path):
+        adapter = adapter_with_routes(ROUTE_SINGLE_DEFAULT)
+        before = adapter.gateway_fingerprint()
+        assert adapter.gateway_fingerprint() == before
+
+        (tmp_path / "route").write_text(ROUTE_TWO_DEFAULTS)
+        assert adapter.gateway_fingerprint() != before
+
+    @pytest.mark.parametrize("timeout_ms,expected", [
+        (1000, "1"),
+        (1500, "2"),
+        (200, "1"),
+    ])
+    def test_timeout_flag_in_seconds(self, timeout_ms, expected):
+        cmd = LinuxAdapter().build_ping_command(host="8.8.8.8", count=3, timeout_ms=timeout_ms)
+        assert cmd == ["ping", "-c", "3", "-W", expected, "8.8.8.8"]
+
+    def test_parses_iputils_output(self):
+        result = LinuxAdapter(dialect=IPUTILS).parse_ping(LINUX_SAMPLES["success"])
+        assert result.address == "8.8.8.8"
+        assert result.sent == result.received == 5
+        assert list(result.times_ms) == [10.1, 15.4, 12.7, 18.2, 14.5]
+        assert result.rtt_stddev_ms == 2.891
+
+    def test_selected_on_linux(self):
+        with patch("netdiag.os.platform.system", return_value="Linux"):
+            assert isinstance(get_os_adapter(), LinuxAdapter)
+
+
+class TestBusyBoxDialect:
+    """Test BusyBox ping detection and its min/avg/max-only summary"""
+
+    def test_detects_busybox_symlink(self, tmp_path):
+        busybox = tmp_path / "busybox"
+        busybox.touch()
+        (tmp_path / "ping").symlink_to(busybox)
+        with patch("netdiag.os.linux.shutil.which", return_value=str(tmp_path / "ping")):
+            assert detect_linux_dialect() is BUSYBOX
+
+    def test_defaults_to_iputils(self):
+        with patch("netdiag.os.linux.shutil.which", return_value=None):
+            assert detect_linux_dialect() is IPUTILS
+
+    def test_parses_busybox_output(self):
+        result = LinuxAdapter(dialect=BUSYBOX).parse_ping(BUSYBOX_SAMPLES["success"])
+        assert result.address == "8.8.8.8"
+        assert result.sent == result.received == 3
+        assert list(result.times_ms) == [10.1, 15.4, 12.7]
+        assert result.rtt_avg_ms == 12.733
+        # No deviation is printed, so it is computed from the replies
+        assert result.rtt_stddev_ms == pytest.approx(2.1638, abs=1e-3)
+
+    def test_parses_busybox_total_loss(self):
+        result = LinuxAdapter(dialect=BUSYBOX).parse_ping(BUSYBOX_SAMPLES["total_loss"])
+        assert result.received == 0
+        assert result.loss_pct == 100.0
+        assert result.rtt_avg_ms == 0.0
@@ -0,0 +1,269 @@
+"""Tests for the incremental ping output parser (os/stream.py)
+
+Both the streaming parser and the whole-output parsers must read every real
+sample as written down below, and the streaming one must also report replies
+one by one as lines arrive.
+"""
+
+import sys
+import time
+from dataclasses import replace
+
+import pytest
+
+from netdiag.data.ping import PingParseError
+from netdiag.os.dialects import IPUTILS
+from netdiag.os.linux import LinuxAdapter
+from netdiag.os.macos import MacOSAdapter
+from netdiag.os.stream import PingStreamParser
+from netdiag.os.windows import WindowsOSAdapter
+from netdiag.probes.ping import run_ping
+from tests.fixtures.ping_samples import (
+    LINUX_SAMPLES,
+    MACOS_SAMPLES,
+    WINDOWS_SAMPLES,
+)
+
+SAMPLES = {
+    MacOSAdapter: MACOS_SAMPLES,
+    LinuxAdapter: LINUX_SAMPLES,
+    WindowsOSAdapter: WINDOWS_SAMPLES,
+}
+
+# What each sample says: (address, sent, received, loss_pct,
+# (min, avg, max, stddev) as printed in the summary, reply times in order).
+# Windows prints no stddev; it is computed from the whole-millisecond replies.
+EXPECTED = {
+    (MacOSAdapter, "success"): (
+        "8.8.8.8", 5, 5, 0.0, (10.123, 14.234, 18.234, 2.891),
+        [10.123, 15.456, 12.789, 18.234, 14.567],
+    ),
+    (MacOSAdapter, "partial_loss"): (
+        "8.8.8.8", 5, 3, 40.0, (10.5, 12.833, 15.7, 2.146), [10.5, 12.3, 15.7],
+    ),
+    (MacOSAdapter, "total_loss"): ("192.0.2.1", 5, 0, 100.0, (0.0, 0.0, 0.0, 0.0), []),
+    (MacOSAdapter, "high_latency"): (
+        "example.com", 5, 5, 0.0, (250.123, 272.434, 290.567, 14.523),
+        [250.123, 280.456, 265.789, 275.234, 290.567],
+    ),
+    (MacOSAdapter, "high_jitter"): (
+        "8.8.8.8", 5, 5, 0.0, (5.123, 48.434, 120.234, 49.123),
+        [5.123, 95.456, 8.789, 120.234, 12.567],
+    ),
+    (MacOSAdapter, "time_parentheses"): (
+        "8.8.8.8", 2, 2, 0.0, (1008.473, 1011.854, 1015.234, 3.381), [1008.473, 1015.234],
+    ),
+    (LinuxAdapter, "success"): (
+        "8.8.8.8", 5, 5, 0.0, (10.123, 14.234, 18.234, 2.891), [10.1, 15.4, 12.7, 18.2, 14.5],
+    ),
+    (LinuxAdapter, "high_loss"): ("8.8.8.8", 10, 1, 90.0, (10.5, 10.5, 10.5, 0.0), [10.5]),
+    (LinuxAdapter, "no_response"): ("192.0.2.1", 5, 0, 100.0, (0.0, 0.0, 0.0, 0.0), []),
+    (LinuxAdapter, "unstable"): (
+        "8.8.8.8", 5, 5, 0.0, (10.1, 73.76, 180.3, 75.234), [10.1, 150.4, 15.2, 180.3, 12.8],
+    ),
+    (WindowsOSAdapter, "success"): (
+        "8.8.8.8", 5, 5, 0.0, (10.0, 13.0, 18.0, 2.713), [10.0, 15.0, 12.0, 18.0, 14.0],
+    ),
+    (WindowsOSAdapter, "partial_loss"): (
+        "8.8.8.8", 5, 3, 40.0, (10.0, 12.0, 15.0, 2.055), [10.0, 12.0, 15.0],
+    ),
+    (WindowsOSAdapter, "total_loss"): ("192.0.2.1", 4, 0, 100.0, (0.0, 0.0, 0.0, 0.0), []),
+    (WindowsOSAdapter, "high_latency"): (
+        "93.184.216.34", 4, 4, 0.0, (250.0, 267.0, 280.0, 11.456),
+        [250.0, 280.0, 265.0, 275.0],
+    ),
+    (WindowsOSAdapter, "decimal_time"): (
+        "8.8.8.8", 3, 3, 0.0, (10.5, 12.8, 15.2, 1.919), [10.5, 15.2, 12.8],
+    ),
+    # time<1ms replies count as 1 ms; the summary rounds them down to 0
+    (WindowsOSAdapter, "less_than_1ms"): (
+        "127.0.0.1", 3, 3, 0.0, (0.0, 0.0, 0.0, 0.0), [1.0, 1.0, 1.0],
+    ),
+}
+
+ALL_SAMPLES = [
+    (adapter_cls, name, raw)
+    for adapter_cls, samples in SAMPLES.items()
+    for name, raw in samples.items()
+]
+
+
+class CountingPattern:
+    def __init__(self, pattern):
+        self.pattern = pattern
+        self.searches = 0
+
+    def search(self, line):
+        self.searches += 1
+        return self.pattern.search(line)
+
+
+def feed_all(parser, raw):
+    for line in raw.splitlines():
+        parser.feed(line)
+    return parser
+
+
+class TestPingStreamParser:
+    """Test line-by-line parsing against the real samples"""
+
+    def test_every_sample_has_expected_values(self):
+        assert {(cls, name) for cls, name, _ in ALL_SAMPLES} == EXPECTED.keys()
+
+    @pytest.mark.parametrize("streamed", [True, False], ids=["stream", "whole"])
+    @pytest.mark.parametrize("adapter_cls,name,raw", ALL_SAMPLES)
+    def test_reads_sample_as_written(self, adapter_cls, name, raw, streamed):
+        adapter = adapter_cls()
+        if streamed:
+            result = feed_all(adapter.stream_parser(), raw).result()
+        else:
+            result = adapter.parse_ping(raw)
+        address, sent, received, loss_pct, rtt, times_ms = EXPECTED[adapter_cls, name]
+
+        assert result.address == address
+        assert (result.sent, result.received) == (sent, received)
+        assert result.loss_pct == loss_pct
+        stats = (result.rtt_min_ms, result.rtt_avg_ms, result.rtt_max_ms, result.rtt_stddev_ms)
+        assert stats == pytest.approx(rtt, abs=1e-3)
+        assert list(result.times_ms) == pytest.approx(times_ms)
+
+    def test_reports_each_reply_as_it_arrives(self):
+        replies = []
+        parser = LinuxAdapter().stream_parser(on_reply=replies.append)
+
+        lines = LINUX_SAMPLES["success"].splitlines()
+        parser.feed(lines[0])
+        assert replies == []
+        parser.feed(lines[1])
+        assert replies == [10.1]
+        for line in lines[2:]:
+            parser.feed(line)
+
+        assert replies == [10.1, 15.4, 12.7, 18.2, 14.5]
+
+    def test_running_stats_mid_run(self):
+        parser = LinuxAdapter().stream_parser()
+        for line in LINUX_SAMPLES["success"].splitlines()[:3]:
+            parser.feed(line)
+
+        assert parser.reply_count == 2
+        assert parser.rtt_min_ms == 10.1
+        assert parser.rtt_max_ms == 15.4
+        assert parser.rtt_avg_ms == pytest.approx(12.75)
+        assert parser.jitter == pytest.approx(5.3)
+        assert not parser.finished
+
+    def test_finished_after_summary(self):
+        parser = feed_all(LinuxAdapter().stream_parser(), LINUX_SAMPLES["success"])
+        assert parser.finished
+
+    def test_finished_without_rtt_line_on_total_loss(self):
+        parser = feed_all(LinuxAdapter().stream_parser(), LINUX_SAMPLES["no_response"])
+        assert parser.finished
+
+    def test_keep_samples_false_stores_no_replies(self):
+        parser = feed_all(
+            LinuxAdapter().stream_parser(keep_samples=False), LINUX_SAMPLES["success"]
+        )
+        result = parser.result()
+
+        assert list(result.times_ms) == []
+        assert result.received == 5
+        assert result.jitter == pytest.approx(
+            LinuxAdapter().parse_ping(LINUX_SAMPLES["success"]).jitter
+        )
+
+    def test_reply_seqs_locate_losses(self):
+        parser = feed_all(MacOSAdapter().stream_parser(), MACOS_SAMPLES["partial_loss"])
+        assert parser.result().reply_seqs == [0, 2, 4]
+
+    def test_iputils_seqs_count_from_one(self):
+        parser = feed_all(LinuxAdapter().stream_parser(), LINUX_SAMPLES["high_loss"])
+        assert parser.result().reply_seqs == [0]
+
+    def test_one_regex_search_per_reply_line(self):
+        reply_re, time_re = CountingPattern(IPUTILS.reply_re), CountingPattern(IPUTILS.time_re)
+        dialect = replace(IPUTILS, reply_re=reply_re, time_re=time_re)
+
+        parser = feed_all(PingStreamParser(dialect), LINUX_SAMPLES["success"])
+
+        assert parser.result().reply_seqs == [0, 1, 2, 3, 4]
+        assert (reply_re.searches, time_re.searches) == (5, 0)
+
+    def test_reply_without_seq_still_counts(self):
+        parser = LinuxAdapter().stream_parser()
+        assert parser.feed("64 bytes from 8.8.8.8: ttl=117 time=10.1 ms") == 10.1
+        assert parser.reply_seqs is None
+
+    def test_windows_replies_have_no_seqs(self):
+        parser = feed_all(WindowsOSAdapter().stream_parser(), WINDOWS_SAMPLES["partial_loss"])
+        assert parser.result().reply_seqs is None
+
+    def test_incomplete_output_raises(self):
+        parser = LinuxAdapter().stream_parser()
+        parser.feed(LINUX_SAMPLES["success"].splitlines()[1])
+        with pytest.raises(PingParseError):
+            parser.result()
+
+    def test_empty_output_raises(self):
+        with pytest.raises(PingParseError, match="empty"):
+            LinuxAdapter().stream_parser().result()
+
+
+# Prints ping output slowly, like a real ping run with one reply per interval
+SLOW_PING = """
+import sys, time
+print("PING 10.0.0.1 (10.0.0.1) 56(84) bytes of data.", flush=True)
+for i, ms in enumerate([1.5, 2.5, 3.5], 1):
+    time.sleep(0.2)
+    print(f"64 bytes from 10.0.0.1: icmp_seq={i} ttl=64 time={ms} ms", flush=True)
+print("", flush=True)
+print("--- 10.0.0.1 ping statistics ---")
+print("3 packets transmitted, 3 received, 0% packet loss, time 400ms")
+print("rtt min/avg/max/mdev = 1.500/2.500/3.500/0.816 ms", flush=True)
+"""
+
+
+class ScriptedAdapter(LinuxAdapter):
+    """Linux adapter that runs a Python script instead of ping"""
+
+    def __init__(self, script):
+        super().__init__()
+        self.script = script
+
+    def build_ping_command(self, host, count, timeout_ms):
+        return [sys.executable, "-c", self.script]
+
+
+class TestStreamPing:
+    """Test streaming a real child process's output"""
+
+    def test_replies_arrive_before_process_ends(self):
+        arrivals = []
+        started = time.monotonic()
+        result = ScriptedAdapter(SLOW_PING).stream_ping(
+            host="10.0.0.1",
+            count=3,
+            timeout_ms=1000,
+            on_reply=lambda ms: arrivals.append(time.monotonic() - started),
+        )
+        finished = time.monotonic() - started
+
+        assert list(result.times_ms) == [1.5, 2.5, 3.5]
+        assert result.rtt_stddev_ms == 0.816
+        assert not result.truncated
+        assert arrivals[0] < finished - 0.3
+
+    def test_run_ping_with_on_reply(self):
+        seen = []
+        record = run_ping(
+            host="10.0.0.1",
+            os_adapter=ScriptedAdapter(SLOW_PING),
+            count=3,
+            timeout_ms=1000,
+            session_id="test-123",
+            on_reply=lambda host, ms: seen.append((host, ms)),
+        )
+
+        assert seen == [("10.0.0.1", 1.5), ("10.0.0.1", 2.5), ("10.0.0.1", 3.5)]
+        assert record.metrics.received == 3
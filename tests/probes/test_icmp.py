@@ -0,0 +1,185 @@
+"""Tests for the native ICMP probe engine
+
+Packet encoding and result building are pure functions. The engine itself is
+exercised against 127.0.0.1 in integration tests, which are skipped when the
+kernel does not allow unprivileged ICMP sockets (net.ipv4.ping_group_range).
+"""
+
+import struct
+from unittest.mock import Mock, patch
+
+import pytest
+
+from netdiag.data.ping import DiagnosisCause
+from netdiag.probes.icmp import (
+    ICMP_ECHO_REPLY,
+    ICMP_ECHO_REQUEST,
+    build_echo_request,
+    build_parse_result,
+    icmp_checksum,
+    icmp_ping_many,
+    open_icmp_socket,
+    parse_echo_reply,
+)
+from netdiag.probes.ping import run_icmp_batch, run_ping_batch
+
+
+def _echo_reply(seq, payload=b"\x00" * 8):
+    return struct.pack("!BBHHH", ICMP_ECHO_REPLY, 0, 0, 1234, seq) + payload
+
+
+class TestPacketEncoding:
+    """Test echo request construction and reply decoding"""
+
+    def test_checksum_of_valid_packet_is_zero(self):
+        """Test a packet including its own checksum sums to zero"""
+        packet = build_echo_request(seq=7, payload=b"abcdefgh")
+        assert icmp_checksum(packet) == 0
+
+    def test_checksum_handles_odd_length(self):
+        packet = build_echo_request(seq=1, payload=b"abc")
+        assert icmp_checksum(packet) == 0
+
+    def test_request_header_fields(self):
+        packet = build_echo_request(seq=513, payload=b"")
+        icmp_type, code, _checksum, _ident, seq = struct.unpack("!BBHHH", packet)
+        assert icmp_type == ICMP_ECHO_REQUEST
+        assert code == 0
+        assert seq == 513
+
+    def test_parse_reply_returns_sequence(self):
+        assert parse_echo_reply(_echo_reply(42)) == 42
+
+    def test_parse_reply_skips_ip_header(self):
+        """Test replies carrying an IPv4 header (macOS) are decoded too"""
+        ip_header = bytes([0x45]) + bytes(19)
+        assert parse_echo_reply(ip_header + _echo_reply(9)) == 9
+
+    def test_parse_ignores_non_replies(self):
+        request = build_echo_request(seq=3, payload=b"")
+        assert parse_echo_reply(request) is None
+        assert parse_echo_reply(b"\x00\x00") is None
+
+
+class TestBuildParseResult:
+    """Test summary statistics computed from raw RTT samples"""
+
+    def test_all_replies(self):
+        result = build_parse_result("8.8.8.8", [10.0, 20.0, 30.0], sent=3)
+
+        assert result.address == "8.8.8.8"
+        assert result.received == 3
+        assert result.loss_pct == 0.0
+        assert result.rtt_min_ms == 10.0
+        assert result.rtt_avg_ms == 20.0
+        assert result.rtt_max_ms == 30.0
+        assert result.rtt_stddev_ms == pytest.approx(8.165, abs=1e-3)
+        assert result.jitter == 10.0
+
+    def test_partial_loss(self):
+        result = build_parse_result("8.8.8.8", [10.0, 12.0], sent=5)
+        assert result.received == 2
+        assert result.loss_pct == 60.0
+
+    def test_no_replies(self):
+        result = build_parse_result("192.0.2.1", [], sent=4)
+        assert result.received == 0
+        assert result.loss_pct == 100.0
+        assert result.rtt_avg_ms == 0.0
+
+
+class TestEngineSelection:
+    """Test run_ping_batch dispatches to the native engine"""
+
+    def test_icmp_engine_skips_ping_process(self):
+        adapter = Mock()
+        results = [build_parse_result("10.0.0.1", [1.0, 1.2], sent=2)]
+        with patch("netdiag.probes.ping.icmp_ping_many", return_value=results) as mock_icmp:
+            records = run_ping_batch(
+                hosts=["10.0.0.1"],
+                os_adapter=adapter,
+                count=2,
+                timeout_ms=1000,
+                session_id="test-123",
+                engine="icmp",
+            )
+
+        mock_icmp.assert_called_once()
+        adapter.execute_ping.assert_not_called()
+        assert records[0].target == "10.0.0.1"
+        assert records[0].diagnosis.cause == DiagnosisCause.OK
+
+    def test_icmp_engine_resolves_gateway(self):
+        adapter = Mock()
+        adapter.resolve_gateway.return_value = "192.168.1.1"
+        results = [
+            build_parse_result("8.8.8.8", [10.0], sent=1),
+            build_parse_result("192.168.1.1", [1.0], sent=1),
+        ]
+        with patch("netdiag.probes.ping.icmp_ping_many", return_value=results) as mock_icmp:
+            run_icmp_batch(
+                hosts=["8.8.8.8", "gateway"],
+                os_adapter=adapter,
+                count=1,
+                timeout_ms=1000,
+                session_id="test-123",
+            )
+
+        assert mock_icmp.call_args.args[0] == ["8.8.8.8", "192.168.1.1"]
+
+    def test_unknown_engine_rejected(self):
+        with pytest.raises(ValueError):
+            run_ping_batch(
+                hosts=["10.0.0.1"],
+                os_adapter=Mock(),
+                count=1,
+                timeout_ms=1000,
+                session_id="test-123",
+                engine="raw",
+            )
+
+
+class TestOpenIcmpSocket:
+    """Test socket errors are reported in terms of the engine setting"""
+
+    def test_unsupported_protocol_names_system_engine(self):
+        error = OSError(10043, "The requested protocol has not been configured")
+        with patch("netdiag.probes.icmp.socket.socket", side_effect=error):
+            with pytest.raises(OSError, match='engine = "system"'):
+                open_icmp_socket()
+
+    def test_permission_error_names_sysctl(self):
+        with patch("netdiag.probes.icmp.socket.socket", side_effect=PermissionError(1, "x")):
+            with pytest.raises(PermissionError, match="ping_group_range"):
+                open_icmp_socket()
+
+
+def _icmp_sockets_allowed():
+    # Windows raises a plain OSError (protocol not supported)
+    try:
+        open_icmp_socket().close()
+    except OSError:
+        return False
+    return True
+
+
+@pytest.mark.integration
+@pytest.mark.skipif(not _icmp_sockets_allowed(), reason="unprivileged ICMP sockets not allowed")
+class TestIcmpEngineIntegration:
+    """Real echo requests to the loopback interface"""
+
+    def test_ping_localhost(self):
+        [result] = icmp_ping_many(["127.0.0.1"], count=3, timeout_ms=1000, interval_s=0.05)
+
+        assert result.address == "127.0.0.1"
+        assert result.sent == 3
+        assert result.received == 3
+        assert 0.0 < result.rtt_min_ms <= result.rtt_avg_ms <= result.rtt_max_ms < 100
+
+    def test_multiplexes_targets_in_order(self):
+        """Test several targets share one socket and keep their order"""
+        hosts = ["127.0.0.1", "127.0.0.2", "127.0.0.1"]
+        results = icmp_ping_many(hosts, count=2, timeout_ms=1000, interval_s=0.05)
+
+        assert [r.address for r in results] == hosts
+        assert all(r.received == 2 for r in results)
@@ -5,12 +5,16 @@ Integration tests marked with @pytest.mark.integration run real commands (slow).
 """
 
 import subprocess
-from unittest.mock import Mock
+import threading
+import time
+from unittest.mock import Mock, patch
 
 import pytest
 
+from netdiag.analysis.rules import RuleBook
+from netdiag.config.config import DiagnosisConfig
 from netdiag.data.ping import DiagnosisCause
-from netdiag.probes.ping import run_ping
+from netdiag.probes.ping import run_ping, run_ping_batch
 from tests.fixtures.ping_samples import (
     MACOS_HIGH_JITTER,
     MACOS_HIGH_LATENCY,
@@ -36,6 +40,7 @@ class TestRunPingUnit:
         mock_adapter.parse_ping.return_value = Mock(
             address="8.8.8.8",
             times_ms=[10.1, 15.4, 12.7, 18.2, 14.5],
+            reply_seqs=None,
             sent=5,
             received=5,
             loss_pct=0.0,
@@ -70,6 +75,7 @@ class TestRunPingUnit:
         mock_adapter.parse_ping.return_value = Mock(
             address="8.8.8.8",
             times_ms=[10.5, 12.3, 15.7],
+            reply_seqs=None,
             sent=5,
             received=3,
             loss_pct=40.0,
@@ -101,6 +107,7 @@ class TestRunPingUnit:
         mock_adapter.parse_ping.return_value = Mock(
             address="192.0.2.1",
             times_ms=[],
+            reply_seqs=None,
             sent=5,
             received=0,
             loss_pct=100.0,
@@ -132,6 +139,7 @@ class TestRunPingUnit:
         mock_adapter.parse_ping.return_value = Mock(
             address="93.184.216.34",
             times_ms=[250.1, 280.4, 265.7, 275.2, 290.5],
+            reply_seqs=None,
             sent=5,
             received=5,
             loss_pct=0.0,
@@ -164,6 +172,7 @@ class TestRunPingUnit:
         mock_adapter.parse_ping.return_value = Mock(
             address="8.8.8.8",
             times_ms=[5.1, 95.4, 8.7, 120.2, 12.5],
+            reply_seqs=None,
             sent=5,
             received=5,
             loss_pct=0.0,
@@ -189,13 +198,14 @@ class TestRunPingUnit:
     def test_gateway_resolution(self):
         """Test special 'gateway' host resolution"""
         mock_adapter = Mock()
-        mock_adapter.get_gateway_ip.return_value = "192.168.1.1"
+        mock_adapter.resolve_gateway.return_value = "192.168.1.1"
         mock_adapter.execute_ping.return_value = subprocess.CompletedProcess(
             args=["ping"], returncode=0, stdout=MACOS_SUCCESS, stderr=""
         )
         mock_adapter.parse_ping.return_value = Mock(
             address="192.168.1.1",
             times_ms=[1.0, 1.2, 1.1],
+            reply_seqs=None,
             sent=3,
             received=3,
             loss_pct=0.0,
@@ -215,8 +225,42 @@ class TestRunPingUnit:
             session_id="test-123",
         )
 
-        mock_adapter.get_gateway_ip.assert_called_once()
+        mock_adapter.resolve_gateway.assert_called_once()
+        mock_adapter.invalidate_gateway.assert_not_called()
         assert record.target == "192.168.1.1"
+        assert record.configured_target == "gateway"
+
+    def test_gateway_cache_invalidated_on_total_loss(self):
+        """Test an unreachable gateway forces a fresh lookup on the next probe"""
+        mock_adapter = Mock()
+        mock_adapter.resolve_gateway.return_value = "192.168.1.1"
+        mock_adapter.execute_ping.return_value = subprocess.CompletedProcess(
+            args=["ping"], returncode=1, stdout=MACOS_TOTAL_LOSS, stderr=""
+        )
+        mock_adapter.parse_ping.return_value = Mock(
+            address="192.168.1.1",
+            times_ms=[],
+            reply_seqs=None,
+            sent=3,
+            received=0,
+            loss_pct=100.0,
+            rtt_min_ms=0.0,
+            rtt_avg_ms=0.0,
+            rtt_max_ms=0.0,
+            rtt_stddev_ms=0.0,
+            jitter=0.0,
+            jitter_ratio=0.0,
+        )
+
+        run_ping(
+            host="gateway",
+            os_adapter=mock_adapter,
+            count=3,
+            timeout_ms=500,
+            session_id="test-123",
+        )
+
+        mock_adapter.invalidate_gateway.assert_called_once()
 
     def test_session_id_propagation(self):
         """Test session_id is properly set in record"""
@@ -227,6 +271,7 @@ class TestRunPingUnit:
         mock_adapter.parse_ping.return_value = Mock(
             address="8.8.8.8",
             times_ms=[10.0],
+            reply_seqs=None,
             sent=1,
             received=1,
             loss_pct=0.0,
@@ -249,6 +294,127 @@ class TestRunPingUnit:
 
         assert record.session_id == session_id
 
+    def test_per_target_rules(self):
+        """Test the configured host's rules diagnose the result"""
+        mock_adapter = Mock()
+        mock_adapter.execute_ping.return_value = subprocess.CompletedProcess(
+            args=["ping"], returncode=0, stdout=MACOS_HIGH_LATENCY, stderr=""
+        )
+        mock_adapter.parse_ping.return_value = Mock(
+            address="93.184.216.34",
+            times_ms=[250.1, 280.4, 265.7, 275.2, 290.5],
+            reply_seqs=None,
+            sent=5,
+            received=5,
+            loss_pct=0.0,
+            rtt_min_ms=250.1,
+            rtt_avg_ms=272.4,
+            rtt_max_ms=290.5,
+            rtt_stddev_ms=14.5,
+            jitter=15.0,
+            jitter_ratio=0.05,
+        )
+        rules = RuleBook(DiagnosisConfig(
+            targets={"93.184.216.34": DiagnosisConfig(high_latency_ms=700)}
+        ))
+
+        record = run_ping(
+            host="93.184.216.34",
+            os_adapter=mock_adapter,
+            count=5,
+            timeout_ms=2000,
+            session_id="test-123",
+            rules=rules,
+        )
+
+        assert not record.signals.high_latency
+        assert record.diagnosis.cause == DiagnosisCause.OK
+
+
+class TestRunPingBatch:
+    """Unit tests for concurrent probing of several targets"""
+
+    HOSTS = ["10.0.0.1", "10.0.0.2", "10.0.0.3", "10.0.0.4"]
+
+    def test_records_keep_target_order(self):
+        """Test records come back in target order even if probes finish out of order"""
+        def fake_run_ping(*, host, **kwargs):
+            # Earlier targets finish last
+            time.sleep(0.01 * (len(self.HOSTS) - self.HOSTS.index(host)))
+            return host
+
+        with patch("netdiag.probes.ping.run_ping", side_effect=fake_run_ping):
+            records = run_ping_batch(
+                hosts=self.HOSTS,
+                os_adapter=Mock(),
+                count=1,
+                timeout_ms=1000,
+                session_id="test-123",
+                max_workers=4,
+            )
+
+        assert records == self.HOSTS
+
+    def test_respects_max_workers(self):
+        """Test no more than max_workers probes run at the same time"""
+        lock = threading.Lock()
+        active = 0
+        peak = 0
+
+        def fake_run_ping(*, host, **kwargs):
+            nonlocal active, peak
+            with lock:
+                active += 1
+                peak = max(peak, active)
+            time.sleep(0.02)
+            with lock:
+                active -= 1
+            return host
+
+        with patch("netdiag.probes.ping.run_ping", side_effect=fake_run_ping):
+            run_ping_batch(
+                hosts=self.HOSTS,
+                os_adapter=Mock(),
+                count=1,
+                timeout_ms=1000,
+                session_id="test-123",
+                max_workers=2,
+            )
+
+        assert peak == 2
+
+    def test_sequential_when_single_worker(self):
+        """Test max_workers=1 probes targets one after another"""
+        with patch("netdiag.probes.ping.run_ping", side_effect=lambda *, host, **kw: host) as m:
+            records = run_ping_batch(
+                hosts=self.HOSTS,
+                os_adapter=Mock(),
+                count=1,
+                timeout_ms=1000,
+                session_id="test-123",
+            )
+
+        assert records == self.HOSTS
+        assert [c.kwargs["host"] for c in m.call_args_list] == self.HOSTS
+
+    def test_propagates_probe_failure(self):
+        """Test a failing probe fails the whole batch"""
+        def fake_run_ping(*, host, **kwargs):
+            if host == "10.0.0.3":
+                raise ValueError("Gateway IP not found")
+            return host
+
+        with patch("netdiag.probes.ping.run_ping", side_effect=fake_run_ping):
+            with pytest.raises(ValueError):
+                run_ping_batch(
+                    hosts=self.HOSTS,
+                    os_adapter=Mock(),
+                    count=1,
+                    timeout_ms=1000,
+                    session_id="test-123",
+                    max_workers=4,
+                )
+
 
 # ============================================================================
 # Integration Tests - Real command execution (optional, marked slow)
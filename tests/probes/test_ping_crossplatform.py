@@ -38,6 +38,7 @@ class TestCrossPlatformParsing:
         mock_adapter.parse_ping.return_value = Mock(
             address="8.8.8.8",
             times_ms=[10.1, 15.4, 12.7, 18.2, 14.5],
+            reply_seqs=None,
             sent=5,
             received=5,
             loss_pct=0.0,
@@ -89,6 +90,7 @@ class TestCrossPlatformParsing:
         mock_adapter.parse_ping.return_value = Mock(
             address="8.8.8.8",
             times_ms=[10.5, 12.3, 15.7] if received > 0 else [],
+            reply_seqs=None,
             sent=sent,
             received=received,
             loss_pct=expected_loss,
@@ -130,6 +132,7 @@ class TestCrossPlatformParsing:
         mock_adapter.parse_ping.return_value = Mock(
             address="192.0.2.1",
             times_ms=[],
+            reply_seqs=None,
             sent=5 if platform != "windows" else 4,
             received=0,
             loss_pct=100.0,
@@ -168,6 +171,7 @@ class TestPlatformSpecificEdgeCases:
         mock_adapter.parse_ping.return_value = Mock(
             address="8.8.8.8",
             times_ms=[1008.473, 1015.234],
+            reply_seqs=None,
             sent=2,
             received=2,
             loss_pct=0.0,
@@ -201,6 +205,7 @@ class TestPlatformSpecificEdgeCases:
         mock_adapter.parse_ping.return_value = Mock(
             address="127.0.0.1",
             times_ms=[0.0, 0.0, 0.0],  # Windows reports as 0
+            reply_seqs=None,
             sent=3,
             received=3,
             loss_pct=0.0,
@@ -235,6 +240,7 @@ class TestPlatformSpecificEdgeCases:
         mock_adapter.parse_ping.return_value = Mock(
             address="8.8.8.8",
             times_ms=[10.5, 15.2, 12.8],
+            reply_seqs=None,
             sent=3,
             received=3,
             loss_pct=0.0,
@@ -285,6 +291,7 @@ class TestHighLatencyAcrossPlatforms:
         mock_adapter.parse_ping.return_value = Mock(
             address="93.184.216.34",
             times_ms=[250.0, 280.0, 265.0, 275.0],
+            reply_seqs=None,
             sent=4,
             received=4,
             loss_pct=0.0,
@@ -337,6 +344,7 @@ class TestUnstableConnectionAcrossPlatforms:
         mock_adapter.parse_ping.return_value = Mock(
             address="8.8.8.8",
             times_ms=[5.1, 95.4, 8.7, 120.2, 12.5],
+            reply_seqs=None,
             sent=5,
             received=5,
             loss_pct=0.0,
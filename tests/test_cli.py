@@ -1,13 +1,25 @@
 """Tests for CLI module (cli.py)"""
 
 import argparse
-from datetime import datetime
+import sqlite3
+from dataclasses import replace
+from datetime import datetime, timezone
 from unittest.mock import MagicMock, Mock, patch
 
 import pytest
 
-from netdiag.cli import MyParser, build_parser, cmd_dns, cmd_ping, cmd_run, main
-from netdiag.config.config import AppConfig, PingConfig
+from netdiag.cli import (
+    MyParser,
+    build_parser,
+    cmd_daemon,
+    cmd_dns,
+    cmd_ping,
+    cmd_prune,
+    cmd_rediagnose,
+    cmd_run,
+    main,
+)
+from netdiag.config.config import AppConfig, PingConfig, StorageConfig, WriterConfig
 from netdiag.data.ping import (
     DiagnosisCause,
     PingDiagnosis,
@@ -15,6 +27,9 @@ from netdiag.data.ping import (
     PingRecord,
     PingSignals,
 )
+from netdiag.database import create_db
+from netdiag.os.base import GatewayChange
+from netdiag.spool import append_to_spool, read_spool, spool_pending
 
 # ============================================================================
 # Fixtures - Reusable test data
@@ -74,12 +89,13 @@ def sample_ping_record():
 @pytest.fixture
 def mock_cmd_ping_deps():
     """Mock all dependencies for cmd_ping tests"""
-    with patch("netdiag.cli.run_ping") as mock_run_ping, \
+    with patch("netdiag.probes.ping.run_ping") as mock_run_ping, \
          patch("netdiag.cli.get_os_adapter") as mock_os_adapter, \
-         patch("netdiag.cli.insert_ping_records_db") as mock_insert, \
+         patch("netdiag.cli.insert_ping_batch_db") as mock_insert, \
          patch("netdiag.cli.format_ping_report") as mock_format:
 
         mock_os_adapter.return_value = Mock()
+        mock_os_adapter.return_value.drain_gateway_changes.return_value = []
         mock_format.return_value = "formatted output"
 
         yield {
@@ -191,11 +207,25 @@ class TestBuildParser:
         args = parser.parse_args(["ping", "-t", "1500"])
         assert args.timeout_ms == 1500
 
+    def test_ping_accepts_max_workers_argument(self):
+        parser = build_parser()
+        args = parser.parse_args(["ping", "--max-workers", "16"])
+        assert args.max_workers == 16
+
+        args = parser.parse_args(["ping", "-j", "4"])
+        assert args.max_workers == 4
+
+    def test_ping_accepts_live_flag(self):
+        parser = build_parser()
+        assert parser.parse_args(["ping", "--live"]).live
+        assert not parser.parse_args(["ping"]).live
+
     def test_ping_arguments_are_optional(self):
         parser = build_parser()
         args = parser.parse_args(["ping"])
         assert args.count is None
         assert args.timeout_ms is None
+        assert args.max_workers is None
 
     def test_dns_subcommand_exists(self):
         parser = build_parser()
@@ -209,6 +239,32 @@ class TestBuildParser:
         assert args.command == "run"
         assert args.func == cmd_run
 
+    def test_daemon_subcommand_exists(self):
+        parser = build_parser()
+        args = parser.parse_args(["daemon", "--cycles", "3"])
+        assert args.command == "daemon"
+        assert args.func == cmd_daemon
+        assert args.cycles == 3
+
+    def test_prune_subcommand_exists(self):
+        parser = build_parser()
+        args = parser.parse_args(["prune"])
+        assert args.func == cmd_prune
+        assert args.vacuum is False
+        assert parser.parse_args(["prune", "--vacuum"]).vacuum is True
+
+    def test_rediagnose_takes_a_utc_since(self):
+        parser = build_parser()
+        args = parser.parse_args(["rediagnose", "--since", "2026-03-01"])
+        assert args.func == cmd_rediagnose
+        assert args.since == datetime(2026, 3, 1, tzinfo=timezone.utc)
+        assert args.until is None
+
+    def test_rediagnose_rejects_bad_dates(self, capsys):
+        parser = build_parser()
+        with pytest.raises(SystemExit):
+            parser.parse_args(["rediagnose", "--since", "last week"])
+
     def test_invalid_subcommand_fails(self):
         parser = build_parser()
         with pytest.raises(SystemExit):
@@ -249,6 +305,19 @@ class TestCmdPing:
         assert call_kwargs["count"] == 10
         assert call_kwargs["timeout_ms"] == 2000
 
+    def test_stores_records_in_target_order(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record
+    ):
+        """Test concurrent probing still stores records in configured target order"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].side_effect = lambda *, host, **kwargs: host
+
+        args = argparse.Namespace(count=None, timeout_ms=None, max_workers=2)
+        cmd_ping(args, sample_config, Mock(), "test-run-id")
+
+        stored = mocks["insert_db"].call_args.kwargs["ping_records"]
+        assert stored == ["8.8.8.8", "1.1.1.1"]
+
     def test_inserts_records_to_database(
         self, mock_cmd_ping_deps, sample_config, sample_ping_record
     ):
@@ -261,11 +330,81 @@ class TestCmdPing:
         args = argparse.Namespace(count=None, timeout_ms=None)
         cmd_ping(args, sample_config, conn, session_id)
 
-        assert mocks["insert_db"].call_count == 2
+        # Every target of the cycle goes to the database in one batch
+        mocks["insert_db"].assert_called_once()
         call_kwargs = mocks["insert_db"].call_args.kwargs
         assert call_kwargs["session_id"] == session_id
         assert call_kwargs["conn"] == conn
-        assert call_kwargs["ping_record"] == sample_ping_record
+        assert call_kwargs["ping_records"] == [sample_ping_record, sample_ping_record]
+
+    def test_partitioned_storage_uses_partition_writer(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record
+    ):
+        """Test records bypass the main database when partitioning is on"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].return_value = sample_ping_record
+        config = replace(sample_config, storage=StorageConfig(partition="day"))
+
+        args = argparse.Namespace(count=None, timeout_ms=None)
+        with patch("netdiag.cli.PartitionWriter") as mock_writer_cls:
+            cmd_ping(args, config, Mock(), "test-run-id")
+
+            writer = mock_writer_cls.return_value
+            writer.insert_batch.assert_called_once_with(
+                session_id="test-run-id",
+                ping_records=[sample_ping_record, sample_ping_record],
+            )
+            writer.close.assert_called_once()
+        mocks["insert_db"].assert_not_called()
+
+    def test_spools_records_when_insert_fails(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record, tmp_path, capsys
+    ):
+        """Test a failed insert leaves the cycle in the spool, not lost"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].return_value = sample_ping_record
+        mocks["insert_db"].side_effect = sqlite3.OperationalError("database or disk is full")
+        config = replace(sample_config, database_path=str(tmp_path / "netdiag.db"))
+
+        args = argparse.Namespace(count=None, timeout_ms=None)
+        cmd_ping(args, config, Mock(), "test-run-id")
+
+        assert len(read_spool(tmp_path / "netdiag.spool")) == 2
+        assert "spooled 2" in capsys.readouterr().out
+
+    def test_replays_spool_after_a_successful_write(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record, tmp_path, capsys
+    ):
+        """Test records spooled while the database was down follow the next inline write"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].return_value = sample_ping_record
+        config = replace(sample_config, database_path=str(tmp_path / "netdiag.db"))
+        spool = tmp_path / "netdiag.spool"
+        append_to_spool(spool, [sample_ping_record])
+        conn = sqlite3.connect(config.database_path)
+        create_db(conn)
+
+        args = argparse.Namespace(count=None, timeout_ms=None)
+        cmd_ping(args, config, conn, "test-run-id")
+
+        assert not spool_pending(spool)
+        assert conn.execute("SELECT COUNT(*) FROM ping_results").fetchone() == (1,)
+        assert "Replayed 1 spooled records" in capsys.readouterr().out
+        conn.close()
+
+    def test_spools_records_without_connection(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record, tmp_path
+    ):
+        """Test cmd_ping still measures when main() could not open the database"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].return_value = sample_ping_record
+        config = replace(sample_config, database_path=str(tmp_path / "netdiag.db"))
+
+        args = argparse.Namespace(count=None, timeout_ms=None)
+        cmd_ping(args, config, None, "test-run-id")
+
+        mocks["insert_db"].assert_not_called()
+        assert len(read_spool(tmp_path / "netdiag.spool")) == 2
 
     def test_prints_formatted_report(
         self, mock_cmd_ping_deps, sample_config, sample_ping_record, capsys
@@ -281,6 +420,56 @@ class TestCmdPing:
         assert captured.out.count("formatted output") == 2
 
 
+    def test_live_mode_prints_replies(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record, capsys
+    ):
+        """Test --live hands run_ping a callback that prints each reply"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].return_value = sample_ping_record
+
+        args = argparse.Namespace(count=None, timeout_ms=None, live=True)
+        cmd_ping(args, sample_config, Mock(), "test-run-id")
+
+        on_reply = mocks["run_ping"].call_args.kwargs["on_reply"]
+        on_reply("8.8.8.8", 12.34)
+        assert "8.8.8.8: reply time=12.3 ms" in capsys.readouterr().out
+
+    def test_records_gateway_change_events(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record
+    ):
+        """Test gateway changes seen by the adapter are stored as events"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].return_value = sample_ping_record
+        change = GatewayChange(
+            previous="192.168.1.1", current="10.0.0.1", detected_at=datetime.now()
+        )
+        mocks["os_adapter"].return_value.drain_gateway_changes.return_value = [change]
+
+        conn = Mock()
+        args = argparse.Namespace(count=None, timeout_ms=None)
+        with patch("netdiag.cli.insert_events_db") as mock_insert_events:
+            cmd_ping(args, sample_config, conn, "test-run-id")
+
+        mock_insert_events.assert_called_once_with(
+            session_id="test-run-id",
+            events=[(
+                "gateway_changed",
+                {"previous": "192.168.1.1", "current": "10.0.0.1"},
+                change.detected_at,
+            )],
+            conn=conn,
+        )
+
+    def test_passes_gateway_ttl_to_adapter(self, mock_cmd_ping_deps, sample_config):
+        mocks = mock_cmd_ping_deps
+        args = argparse.Namespace(count=None, timeout_ms=None)
+        cmd_ping(args, sample_config, Mock(), "test-run-id")
+
+        mocks["os_adapter"].assert_called_once_with(
+            gateway_ttl_s=sample_config.ping.gateway_ttl_s
+        )
+
+
 class TestCmdDns:
     """Test dns command execution"""
 
@@ -300,6 +489,120 @@ class TestCmdRun:
         mock_cmd_ping.assert_called_once_with(args, config, conn, session_id)
 
 
+class TestCmdDaemon:
+    """Test long-running daemon mode"""
+
+    def test_reuses_adapter_and_connection_across_cycles(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record
+    ):
+        """Test every cycle shares one OS adapter and one DB connection"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].return_value = sample_ping_record
+        conn = Mock()
+        config = replace(sample_config, writer=WriterConfig(background=False))
+
+        args = argparse.Namespace(count=None, timeout_ms=None, max_workers=None, cycles=3)
+        with patch("netdiag.cli.Scheduler") as mock_scheduler_cls:
+            scheduler = mock_scheduler_cls.return_value
+            cmd_daemon(args, config, conn, "test-run-id")
+
+            job_name, interval_s, cycle = scheduler.add_job.call_args_list[0].args
+            assert job_name == "ping"
+            assert interval_s == sample_config.ping.interval_s
+            scheduler.run.assert_called_once_with(max_ticks=3)
+
+            cycle()
+            cycle()
+
+        mocks["os_adapter"].assert_called_once()
+        assert mocks["insert_db"].call_count == 2
+        assert all(c.kwargs["conn"] is conn for c in mocks["insert_db"].call_args_list)
+
+    def test_background_writer_takes_cycles(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record
+    ):
+        """Test the daemon queues records for the writer thread by default"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].return_value = sample_ping_record
+
+        args = argparse.Namespace(count=None, timeout_ms=None, max_workers=None, cycles=1)
+        with patch("netdiag.cli.Scheduler") as mock_scheduler_cls, \
+                patch("netdiag.cli.BackgroundWriter") as mock_writer_cls:
+            writer = mock_writer_cls.return_value
+            writer.dropped = 0
+            cmd_daemon(args, sample_config, Mock(), "test-run-id")
+
+            cycle = mock_scheduler_cls.return_value.add_job.call_args_list[0].args[2]
+            cycle()
+
+            writer.insert_batch.assert_called_once_with(
+                session_id="test-run-id",
+                ping_records=[sample_ping_record, sample_ping_record],
+            )
+            writer.close.assert_called_once()
+        mocks["insert_db"].assert_not_called()
+
+    def test_keeps_recent_results_in_memory(
+        self, mock_cmd_ping_deps, sample_config, sample_ping_record
+    ):
+        """Test every cycle also lands in the per-target ring buffers"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].return_value = sample_ping_record
+        config = replace(sample_config, writer=WriterConfig(background=False))
+
+        args = argparse.Namespace(count=None, timeout_ms=None, max_workers=None, cycles=1)
+        with patch("netdiag.cli.Scheduler") as mock_scheduler_cls, \
+                patch("netdiag.cli.RecentResults") as mock_recent_cls:
+            cmd_daemon(args, config, Mock(), "test-run-id")
+
+            cycle = mock_scheduler_cls.return_value.add_job.call_args_list[0].args[2]
+            cycle()
+
+        mock_recent_cls.assert_called_once_with(config.ping.recent_results)
+        mock_recent_cls.return_value.add.assert_called_once_with(
+            [sample_ping_record, sample_ping_record]
+        )
+
+    def test_failed_cycle_does_not_stop_daemon(
+        self, mock_cmd_ping_deps, sample_config, capsys
+    ):
+        """Test an exception inside a cycle is reported, not raised"""
+        mocks = mock_cmd_ping_deps
+        mocks["run_ping"].side_effect = ValueError("Gateway IP not found")
+
+        args = argparse.Namespace(count=None, timeout_ms=None, max_workers=None, cycles=1)
+        cmd_daemon(args, sample_config, Mock(), "test-run-id")
+
+        assert "ping cycle failed" in capsys.readouterr().out
+
+    def test_schedules_prune_after_first_interval(self, mock_cmd_ping_deps, sample_config):
+        """Test retention runs on its own interval, not at startup"""
+        args = argparse.Namespace(count=None, timeout_ms=None, max_workers=None, cycles=1)
+        with patch("netdiag.cli.Scheduler") as mock_scheduler_cls, \
+                patch("netdiag.cli.prune") as mock_prune:
+            scheduler = mock_scheduler_cls.return_value
+            cmd_daemon(args, sample_config, Mock(), "test-run-id")
+
+            prune_job = scheduler.add_job.call_args_list[1]
+            assert prune_job.args[0] == "prune"
+            assert prune_job.args[1] == sample_config.retention.prune_interval_s
+            assert prune_job.kwargs == {"run_immediately": False}
+
+            prune_job.args[2]()
+            mock_prune.assert_called_once()
+
+    def test_requires_enabled_probe(self, mock_cmd_ping_deps, sample_config):
+        """Test the daemon refuses to start with nothing to do"""
+        config = AppConfig(
+            ping=PingConfig(
+                enabled=False, targets=["8.8.8.8"], count=1, timeout_ms=1000, interval_s=1
+            )
+        )
+        args = argparse.Namespace(count=None, timeout_ms=None, max_workers=None, cycles=1)
+        with pytest.raises(RuntimeError):
+            cmd_daemon(args, config, Mock(), "test-run-id")
+
+
 class TestMain:
     """Test main entry point"""
 
@@ -356,3 +659,34 @@ class TestMain:
         """Test main returns None"""
         result = main()
         assert result is None
+
+    def test_runs_without_database_when_unavailable(self, mock_main_deps, capsys):
+        """Test a locked or corrupt database does not stop the measurement"""
+        mocks = mock_main_deps
+        mocks["create_db"].side_effect = sqlite3.DatabaseError("file is not a database")
+
+        main()
+
+        mocks["args"].func.assert_called_once()
+        assert mocks["args"].func.call_args.args[2] is None
+        mocks["update_session"].assert_not_called()
+        assert "Database unavailable" in capsys.readouterr().out
+
+    def test_session_starts_when_spool_replay_fails(self, mock_main_deps, capsys):
+        """Test an unreadable spool does not keep the command from its database"""
+        mocks = mock_main_deps
+        with patch("netdiag.cli.replay_spooled_records",
+                   side_effect=PermissionError("netdiag.spool")):
+            main()
+
+        mocks["insert_session"].assert_called_once()
+        assert mocks["args"].func.call_args.args[2] is mocks["conn"]
+        assert "stay spooled" in capsys.readouterr().out
+
+    def test_replays_spool_before_the_session(self, mock_main_deps):
+        """Test records spooled by an earlier run are stored on connect"""
+        mocks = mock_main_deps
+        with patch("netdiag.cli.replay_spooled_records") as mock_replay:
+            main()
+        mock_replay.assert_called_once_with(mocks["load_config"].return_value, mocks["conn"])
+
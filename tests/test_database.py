@@ -0,0 +1,248 @@
+"""Tests for SQLite persistence (database.py)
+
+Tests run against an in-memory database, so they exercise the real SQL.
+"""
+
+import json
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from netdiag.analysis.ping import analyse_ping_result
+from netdiag.config.config import StorageConfig
+from netdiag.data.ping import PingParseResult
+from netdiag.database import (
+    create_db,
+    get_db_connection,
+    insert_events_db,
+    insert_ping_batch_db,
+    insert_sessions_db,
+    select_ping_history_db,
+    select_rtt_samples_db,
+)
+from netdiag.histogram import build_histogram
+from tests.fixtures.db_schemas import LEGACY_PING_RECORDS
+
+
+def make_record(target: str, session_id: str = "s1"):
+    return analyse_ping_result(
+        PingParseResult(
+            address=target,
+            times_ms=[10.0, 12.0],
+            sent=2,
+            received=2,
+            loss_pct=0.0,
+            rtt_min_ms=10.0,
+            rtt_avg_ms=11.0,
+            rtt_max_ms=12.0,
+            rtt_stddev_ms=1.0,
+            jitter=2.0,
+            jitter_ratio=0.18,
+        ),
+        session_id,
+    )
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_db(conn)
+    insert_sessions_db(session_id="s1", command="ping", conn=conn)
+    yield conn
+    conn.close()
+
+
+class TestInsertPingBatch:
+    """Test writing a whole probe cycle in one transaction"""
+
+    def test_inserts_every_record_in_order(self, conn):
+        records = [make_record("8.8.8.8"), make_record("1.1.1.1")]
+        insert_ping_batch_db(session_id="s1", ping_records=records, conn=conn)
+
+        rows = conn.execute("SELECT target, diagnosis_cause FROM ping_records ORDER BY id")
+        assert rows.fetchall() == [("8.8.8.8", "ok"), ("1.1.1.1", "ok")]
+        assert not conn.in_transaction
+
+    def test_failure_rolls_back_whole_batch(self, conn):
+        records = [make_record("8.8.8.8"), None]
+        with pytest.raises(AttributeError):
+            insert_ping_batch_db(session_id="s1", ping_records=records, conn=conn)
+
+        assert conn.execute("SELECT COUNT(*) FROM ping_records").fetchone() == (0,)
+
+
+class TestInsertEvents:
+    """Test a cycle's events are written together"""
+
+    def test_inserts_every_event_in_one_transaction(self, conn):
+        at = datetime(2026, 6, 15, 12)
+        statements = []
+        conn.set_trace_callback(statements.append)
+
+        insert_events_db(session_id="s1", events=[
+            ("gateway_changed", {"previous": "a", "current": "b"}, at),
+            ("gateway_changed", {"previous": "b", "current": "c"}, at),
+        ], conn=conn)
+
+        rows = conn.execute("SELECT kind, detail FROM events ORDER BY id").fetchall()
+        assert [json.loads(detail)["current"] for _, detail in rows] == ["b", "c"]
+        assert statements.count("COMMIT") == 1
+        assert not conn.in_transaction
+
+
+class TestGetDbConnection:
+    """Test storage pragmas are applied when a connection is opened"""
+
+    def test_applies_storage_config(self, tmp_path):
+        storage = StorageConfig(synchronous="full", cache_size=-2048, busy_timeout_ms=1234)
+        with get_db_connection(tmp_path / "netdiag.db", storage) as conn:
+            assert conn.execute("PRAGMA journal_mode").fetchone() == ("wal",)
+            assert conn.execute("PRAGMA synchronous").fetchone() == (2,)
+            assert conn.execute("PRAGMA cache_size").fetchone() == (-2048,)
+            assert conn.execute("PRAGMA busy_timeout").fetchone() == (1234,)
+
+    def test_registers_histogram_functions(self, tmp_path):
+        path = tmp_path / "netdiag.db"
+        with get_db_connection(path) as conn:
+            create_db(conn)
+        # Reopened at the current schema: no migration registers them on the way
+        with get_db_connection(path) as conn:
+            assert conn.execute("SELECT hist_add(NULL, NULL)").fetchone() == (None,)
+
+    def test_new_file_gets_incremental_auto_vacuum(self, tmp_path):
+        with get_db_connection(tmp_path / "netdiag.db") as conn:
+            create_db(conn)
+            assert conn.execute("PRAGMA auto_vacuum").fetchone() == (2,)
+
+    def test_existing_file_keeps_its_auto_vacuum(self, tmp_path):
+        path = tmp_path / "netdiag.db"
+        with sqlite3.connect(path) as conn:
+            conn.execute("PRAGMA auto_vacuum = FULL")
+            conn.execute("CREATE TABLE legacy (x)")
+        conn.close()
+
+        with get_db_connection(path) as conn:
+            assert conn.execute("PRAGMA auto_vacuum").fetchone() == (1,)
+
+    def test_reader_is_not_blocked_by_open_write(self, tmp_path):
+        path = tmp_path / "netdiag.db"
+        with get_db_connection(path) as writer, get_db_connection(path) as reader:
+            create_db(writer)
+            insert_sessions_db(session_id="s1", command="ping", conn=writer)
+
+            writer.execute("UPDATE sessions SET status = 'completed'")
+            assert writer.in_transaction
+            # The reader sees the last committed snapshot instead of waiting
+            assert reader.execute("SELECT status FROM sessions").fetchone() == ("running",)
+
+
+class TestPingHistory:
+    """Test the epoch-ms ts column, its backfill and the range query"""
+
+    def test_backfills_ts_on_existing_database(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute(LEGACY_PING_RECORDS)
+        conn.execute(
+            "INSERT INTO ping_records (session_id, timestamp, target, diagnosis_cause) "
+            "VALUES (?, ?, ?, ?)",
+            ("old", "2026-10-16 12:34:56.123456+00:00", "8.8.8.8", "ok"),
+        )
+
+        create_db(conn)
+
+        expected = int(datetime(2026, 10, 16, 12, 34, 56, 123000, timezone.utc).timestamp() * 1000)
+        assert conn.execute("SELECT ts FROM ping_records").fetchone() == (expected,)
+
+    def test_selects_target_within_range(self, conn):
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        records = []
+        for minute, target in enumerate(["8.8.8.8", "1.1.1.1", "8.8.8.8", "8.8.8.8"]):
+            record = make_record(target)
+            record.timestamp = start + timedelta(minutes=minute)
+            records.append(record)
+        insert_ping_batch_db(session_id="s1", ping_records=records, conn=conn)
+
+        rows = select_ping_history_db(
+            target="8.8.8.8", since=start, until=start + timedelta(minutes=3), conn=conn
+        )
+        assert [row[0] for row in rows] == [
+            int((start + timedelta(minutes=m)).timestamp() * 1000) for m in (0, 2)
+        ]
+
+    def test_stores_rtt_samples(self, conn):
+        start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        record = make_record("8.8.8.8")
+        record.timestamp = start
+        insert_ping_batch_db(session_id="s1", ping_records=[record], conn=conn)
+
+        rows = select_rtt_samples_db(target="8.8.8.8", since=start, conn=conn)
+
+        assert [(ts, list(samples)) for ts, samples in rows] == [
+            (int(start.timestamp() * 1000), [10.0, 12.0])
+        ]
+
+    def test_stores_rtt_hist(self, conn):
+        insert_ping_batch_db(session_id="s1", ping_records=[make_record("8.8.8.8")], conn=conn)
+
+        stored = conn.execute("SELECT rtt_hist FROM ping_results").fetchone()[0]
+
+        assert stored == build_histogram([10.0, 12.0])
+
+    def test_history_query_is_an_index_range_scan(self, conn):
+        # Through the compatibility view, as select_ping_history_db queries it
+        plan = conn.execute(
+            "EXPLAIN QUERY PLAN SELECT ts FROM ping_records "
+            "WHERE target = ? AND ts >= ? AND ts < ? ORDER BY ts",
+            ("8.8.8.8", 0, 1),
+        ).fetchall()
+        assert any("idx_ping_results_target_ts" in row[-1] for row in plan)
+
+
+class TestCompatibilityView:
+    """Test the ping_records view rebuilds the pre-normalisation columns"""
+
+    def test_view_derives_summary_and_evidence(self, conn):
+        record = make_record("8.8.8.8")
+        insert_ping_batch_db(session_id="s1", ping_records=[record], conn=conn)
+
+        row = conn.execute(
+            "SELECT target, diagnosis_cause, diagnosis_summary, diagnosis_evidence, "
+            "no_reply, any_loss FROM ping_records"
+        ).fetchone()
+        assert row[:3] == ("8.8.8.8", "ok", record.diagnosis.summary)
+        assert json.loads(row[3]) == record.diagnosis.evidence
+        assert row[4:] == (0, 0)
+
+    def test_targets_are_stored_once(self, conn):
+        records = [make_record("8.8.8.8"), make_record("8.8.8.8"), make_record("1.1.1.1")]
+        insert_ping_batch_db(session_id="s1", ping_records=records, conn=conn)
+        insert_ping_batch_db(session_id="s1", ping_records=records, conn=conn)
+
+        assert conn.execute("SELECT COUNT(*) FROM targets").fetchone() == (2,)
+        assert conn.execute("SELECT COUNT(*) FROM ping_results").fetchone() == (6,)
+
+    def test_legacy_rows_survive_migration(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute(LEGACY_PING_RECORDS)
+        conn.execute(
+            "INSERT INTO ping_records (session_id, timestamp, target, sent, received, "
+            "loss_pct, no_reply, any_loss, high_loss, high_latency, unstable_jitter, unstable, "
+            "diagnosis_cause, diagnosis_confidence, diagnosis_summary, diagnosis_evidence) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            ("old", "2026-01-01 00:00:00+00:00", "192.0.2.1", 5, 0, 100.0,
+             1, 1, 1, 0, 0, 0, "no_connectivity", 1.0, "No connectivity detected.",
+             '{"sent": 5, "received": 0, "loss_pct": 100.0}'),
+        )
+
+        create_db(conn)
+
+        row = conn.execute(
+            "SELECT timestamp, target, no_reply, any_loss, high_loss, high_latency, "
+            "diagnosis_cause, diagnosis_summary, diagnosis_evidence FROM ping_records"
+        ).fetchone()
+        assert row[:8] == (
+            "2026-01-01 00:00:00.000+00:00", "192.0.2.1", 1, 1, 1, 0,
+            "no_connectivity", "No connectivity detected.",
+        )
+        assert json.loads(row[8]) == {"sent": 5, "received": 0, "loss_pct": 100.0}
@@ -0,0 +1,122 @@
+"""Tests for mergeable RTT histograms (histogram.py)"""
+
+import math
+import random
+import sqlite3
+
+import pytest
+
+from netdiag.histogram import (
+    BUCKETS,
+    MAX_MS,
+    RELATIVE_ACCURACY,
+    bucket_index,
+    bucket_value,
+    build_histogram,
+    decode_histogram,
+    histogram_counts,
+    merge_histograms,
+    quantiles,
+    register_sql_functions,
+)
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[math.floor(q * (len(ordered) - 1))]
+
+
+class TestBuckets:
+    """Test the fixed log-bucket layout"""
+
+    @pytest.mark.parametrize("ms", [0.05, 0.8, 12.3, 150.0, 999.9, 30_000.0])
+    def test_bucket_value_within_relative_accuracy(self, ms):
+        assert bucket_value(bucket_index(ms)) == pytest.approx(ms, rel=RELATIVE_ACCURACY)
+
+    def test_out_of_range_values_are_clamped(self):
+        assert bucket_index(0.0) == 0
+        assert bucket_index(MAX_MS * 10) == BUCKETS - 1
+
+    def test_indexes_fit_the_encoding(self):
+        assert BUCKETS < 2**16
+
+
+class TestEncoding:
+    """Test the sparse BLOB format"""
+
+    def test_six_bytes_per_bucket_in_use(self):
+        assert len(build_histogram([10.0, 10.0, 20.0])) == 12
+
+    def test_round_trip(self):
+        counts = histogram_counts([10.0, 10.0, 20.0, 300.0])
+        assert decode_histogram(build_histogram([300.0, 10.0, 20.0, 10.0])) == counts
+
+    def test_lost_requests_are_skipped(self):
+        assert sum(decode_histogram(build_histogram([10.0, math.nan])).values()) == 1
+
+    def test_no_replies_is_none(self):
+        assert build_histogram([]) is None
+        assert build_histogram([math.nan]) is None
+
+
+class TestMerge:
+    """Test merging equals building from every sample at once"""
+
+    def test_merge_matches_concatenation(self):
+        rng = random.Random(0)
+        parts = [[rng.uniform(1, 500) for _ in range(5)] for _ in range(50)]
+
+        merged = merge_histograms(build_histogram(part) for part in parts)
+
+        assert merged == build_histogram([ms for part in parts for ms in part])
+
+    def test_none_is_empty(self):
+        blob = build_histogram([10.0])
+        assert merge_histograms([None, blob, None]) == blob
+        assert merge_histograms([None]) is None
+
+
+class TestQuantiles:
+    """Test quantiles read from a histogram"""
+
+    def test_within_relative_accuracy_of_exact(self):
+        rng = random.Random(1)
+        values = [rng.lognormvariate(3, 0.8) for _ in range(10_000)]
+        counts = histogram_counts(values)
+
+        for q, got in zip((0.5, 0.95, 0.99), quantiles(counts)):
+            assert got == pytest.approx(exact_quantile(values, q), rel=RELATIVE_ACCURACY)
+
+    def test_empty_is_none(self):
+        assert quantiles({}) is None
+
+    def test_rejects_out_of_range_quantile(self):
+        with pytest.raises(ValueError):
+            quantiles(histogram_counts([1.0]), [1.5])
+
+
+class TestSqlFunctions:
+    """Test hist_merge and hist_add inside SQLite"""
+
+    @pytest.fixture
+    def conn(self):
+        conn = sqlite3.connect(":memory:")
+        register_sql_functions(conn)
+        yield conn
+        conn.close()
+
+    def test_aggregate_merges_rows_and_skips_null(self, conn):
+        blobs = [build_histogram([10.0, 20.0]), None, build_histogram([30.0])]
+        conn.execute("CREATE TABLE t (h BLOB)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(b,) for b in blobs])
+
+        merged = conn.execute("SELECT hist_merge(h) FROM t").fetchone()[0]
+
+        assert merged == merge_histograms(blobs)
+
+    def test_add_keeps_either_side_when_other_is_null(self, conn):
+        blob = build_histogram([10.0])
+        assert conn.execute("SELECT hist_add(?, NULL)", (blob,)).fetchone()[0] == blob
+        assert conn.execute("SELECT hist_add(NULL, NULL)").fetchone()[0] is None
+        assert (conn.execute("SELECT hist_add(?, ?)", (blob, blob)).fetchone()[0]
+                == build_histogram([10.0, 10.0]))
@@ -0,0 +1,172 @@
+"""Tests for the schema migration runner (migrations.py)"""
+
+import sqlite3
+
+import pytest
+
+from netdiag.histogram import build_histogram
+from netdiag.migrations import (
+    MIGRATIONS,
+    QUARANTINE_TABLE,
+    SCHEMA_VERSION,
+    migrate,
+    schema_version,
+    update_in_chunks,
+)
+from netdiag.samples import encode_samples
+from tests.fixtures.db_schemas import LEGACY_PING_RECORDS
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    yield conn
+    conn.close()
+
+
+class TestMigrate:
+    """Test upgrading fresh, current, legacy and newer databases"""
+
+    def test_fresh_database_reaches_current_version(self, conn):
+        assert migrate(conn) == 0
+        assert schema_version(conn) == SCHEMA_VERSION
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master")}
+        assert {"sessions", "ping_results", "ping_records", "events", "targets"} <= tables
+
+    def test_current_schema_is_a_single_pragma_read(self, conn):
+        migrate(conn)
+        statements = []
+        conn.set_trace_callback(statements.append)
+
+        assert migrate(conn) == SCHEMA_VERSION
+        assert statements == ["PRAGMA user_version"]
+
+    def test_adopts_unversioned_database_and_backfills_in_chunks(self, conn):
+        conn.execute(LEGACY_PING_RECORDS)
+        conn.executemany(
+            "INSERT INTO ping_records (session_id, timestamp, target, diagnosis_cause) "
+            "VALUES (?, ?, ?, ?)",
+            [("old", f"2026-01-01 00:00:{s:02d}+00:00", "8.8.8.8", "ok") for s in range(25)],
+        )
+        conn.commit()
+        statements = []
+        conn.set_trace_callback(statements.append)
+
+        migrate(conn, chunk_rows=10)
+
+        assert schema_version(conn) == SCHEMA_VERSION
+        assert conn.execute("SELECT COUNT(*) FROM ping_records WHERE ts IS NULL").fetchone() == (0,)
+        first_ts, last_ts = conn.execute("SELECT MIN(ts), MAX(ts) FROM ping_records").fetchone()
+        assert last_ts - first_ts == 24_000
+        # 25 rows in chunks of 10 is three separate commits
+        assert sum(s.lstrip().startswith("UPDATE ping_records") for s in statements) == 3
+
+    def test_quarantines_rows_it_cannot_convert(self, conn, capsys):
+        conn.execute(LEGACY_PING_RECORDS)
+        conn.executemany(
+            "INSERT INTO ping_records (session_id, timestamp, target, diagnosis_cause) "
+            "VALUES (?, ?, ?, ?)",
+            [
+                ("old", "2026-01-01 00:00:00+00:00", "8.8.8.8", "ok"),
+                ("old", "2026-01-01 00:00:01+00:00", "8.8.8.8", "cosmic_rays"),
+                ("old", "not a timestamp", "8.8.8.8", "ok"),
+                ("old", "2026-01-01 00:00:03+00:00", "8.8.8.8", "high_loss"),
+            ],
+        )
+        conn.commit()
+
+        migrate(conn)
+
+        assert schema_version(conn) == SCHEMA_VERSION
+        assert [row[0] for row in conn.execute("SELECT id FROM ping_results")] == [1, 4]
+        kept = conn.execute(
+            f"SELECT id, diagnosis_cause FROM {QUARANTINE_TABLE} ORDER BY id"
+        ).fetchall()
+        assert kept == [(2, "cosmic_rays"), (3, "ok")]
+        assert "2 ping_records rows could not be converted" in capsys.readouterr().out
+
+    def v6_with_samples(self, conn):
+        for step in MIGRATIONS[:6]:
+            step(conn, 10)
+        conn.execute("PRAGMA user_version = 6")
+        conn.execute("INSERT INTO targets (id, name) VALUES (1, '8.8.8.8')")
+        conn.executemany(
+            "INSERT INTO ping_results (session_id, ts, target_id, sent, received, "
+            "signals, cause, rtt_samples) VALUES ('old', ?, 1, 2, 1, 0, 0, ?)",
+            [(i * 1000, encode_samples([10.0 + i, float("nan")])) for i in range(3)],
+        )
+        conn.commit()
+
+    def test_backfills_histograms_from_stored_samples(self, conn):
+        self.v6_with_samples(conn)
+
+        migrate(conn)
+
+        hists = [row[0] for row in conn.execute("SELECT rtt_hist FROM ping_results ORDER BY id")]
+        assert hists == [build_histogram([10.0 + i]) for i in range(3)]
+        day = conn.execute("SELECT rtt_hist FROM ping_rollup_day").fetchone()[0]
+        assert day == build_histogram([10.0, 11.0, 12.0])
+
+    def test_backfills_buckets_rolled_up_before(self, conn):
+        self.v6_with_samples(conn)
+        # As v6 left it: the day rolled up, without a histogram column value
+        conn.execute(
+            "INSERT INTO ping_rollup_day VALUES (1, 0, 3, 6, 3, 0, 3, NULL, NULL, 0, 0, 0, "
+            "3, 0, 0, 0, 0, NULL)"
+        )
+        conn.execute("UPDATE rollup_state SET watermark = 3")
+        conn.commit()
+
+        migrate(conn)
+
+        day = conn.execute("SELECT records, rtt_hist FROM ping_rollup_day").fetchone()
+        assert day == (3, build_histogram([10.0, 11.0, 12.0]))
+
+    def test_backfills_rollup_buckets_in_chunks(self, conn):
+        for step in MIGRATIONS[:6]:
+            step(conn, 10)
+        conn.execute("PRAGMA user_version = 6")
+        conn.execute("INSERT INTO targets (id, name) VALUES (1, '8.8.8.8')")
+        days = range(5)
+        conn.executemany(
+            "INSERT INTO ping_results (session_id, ts, target_id, sent, received, "
+            "signals, cause, rtt_samples) VALUES ('old', ?, 1, 1, 1, 0, 0, ?)",
+            [(d * 86_400_000, encode_samples([10.0 + d])) for d in days],
+        )
+        conn.executemany(
+            "INSERT INTO ping_rollup_day VALUES (1, ?, 1, 1, 1, 0, 1, NULL, NULL, 0, 0, 0, "
+            "1, 0, 0, 0, 0, NULL)",
+            [(d * 86_400_000,) for d in days],
+        )
+        conn.execute("UPDATE rollup_state SET watermark = 5")
+        conn.commit()
+        statements = []
+        conn.set_trace_callback(statements.append)
+
+        migrate(conn, chunk_rows=2)
+
+        hists = [row[0] for row in conn.execute(
+            "SELECT rtt_hist FROM ping_rollup_day ORDER BY bucket_ts"
+        )]
+        assert hists == [build_histogram([10.0 + d]) for d in days]
+        # 5 buckets in chunks of 2 is three separate commits
+        assert sum(s.lstrip().startswith("UPDATE ping_rollup_day") for s in statements) == 3
+
+    def test_rejects_newer_schema(self, conn):
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION + 1}")
+        with pytest.raises(RuntimeError, match="newer"):
+            migrate(conn)
+
+
+class TestUpdateInChunks:
+    """Test rowid-range batching"""
+
+    def test_visits_every_row_once(self, conn):
+        conn.execute("CREATE TABLE t (n INTEGER)")
+        conn.executemany("INSERT INTO t VALUES (?)", [(0,)] * 7)
+        update_in_chunks(conn, "t", "UPDATE t SET n = n + 1 WHERE rowid > ? AND rowid <= ?", 3)
+        assert conn.execute("SELECT SUM(n), MIN(n) FROM t").fetchone() == (7, 1)
+
+    def test_empty_table(self, conn):
+        conn.execute("CREATE TABLE t (n INTEGER)")
+        update_in_chunks(conn, "t", "UPDATE t SET n = 1 WHERE rowid > ? AND rowid <= ?", 3)
@@ -0,0 +1,246 @@
+"""Tests for time-partitioned storage (partitions.py)
+
+Partitions are real SQLite files in tmp_path, so ATTACH and unlinking are
+exercised for real.
+"""
+
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from netdiag.config.config import AppConfig, PingConfig, RetentionConfig
+from netdiag.database import create_db, insert_ping_batch_db, insert_sessions_db
+from netdiag.partitions import (
+    PartitionLayout,
+    PartitionWriter,
+    drop_partition,
+    each_attached,
+    partition_layout,
+    select_partitioned_history,
+    select_partitioned_rollups,
+)
+from netdiag.retention import PruneReport, enforce_size_cap, prune
+from tests.test_rollups import make_record
+
+NOW = datetime(2026, 6, 15, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def layout(tmp_path):
+    return PartitionLayout(tmp_path / "netdiag.db", "day")
+
+
+@pytest.fixture
+def conn(layout):
+    conn = sqlite3.connect(layout.database_path)
+    create_db(conn)
+    insert_sessions_db(session_id="s1", command="ping", conn=conn)
+    yield conn
+    conn.close()
+
+
+def write_days_ago(layout, *days, target="8.8.8.8"):
+    writer = PartitionWriter(layout)
+    try:
+        writer.insert_batch(session_id="s1", ping_records=[
+            make_record(target, NOW - timedelta(days=d)) for d in days
+        ])
+    finally:
+        writer.close()
+
+
+class TestPartitionLayout:
+    """Test partition naming and period bounds"""
+
+    def test_day_partition(self, layout):
+        partition = layout.partition(layout.key_for(NOW))
+        assert partition.path.name == "netdiag-2026-06-15.db"
+        assert partition.start == datetime(2026, 6, 15, tzinfo=timezone.utc)
+        assert partition.end == datetime(2026, 6, 16, tzinfo=timezone.utc)
+
+    def test_month_partition_wraps_year(self, tmp_path):
+        layout = PartitionLayout(tmp_path / "netdiag.db", "month")
+        partition = layout.partition("2026-12")
+        assert partition.path.name == "netdiag-2026-12.db"
+        assert partition.end == datetime(2027, 1, 1, tzinfo=timezone.utc)
+
+    def test_key_is_utc(self, layout):
+        local = NOW.astimezone(timezone(timedelta(hours=14)))
+        assert layout.key_for(local) == "2026-06-15"
+
+    def test_ignores_unrelated_files(self, layout, tmp_path):
+        (tmp_path / "netdiag-backup.db").touch()
+        write_days_ago(layout, 0)
+        assert [p.key for p in layout.partitions()] == ["2026-06-15"]
+
+    def test_overlapping(self, layout):
+        write_days_ago(layout, 3, 2, 1)
+        overlapping = layout.overlapping(
+            NOW - timedelta(days=2), datetime(2026, 6, 14, tzinfo=timezone.utc)
+        )
+        assert [p.key for p in overlapping] == ["2026-06-13"]
+
+    def test_disabled_by_default(self):
+        config = AppConfig(ping=PingConfig(
+            enabled=True, targets=[], count=1, timeout_ms=1, interval_s=1
+        ))
+        assert partition_layout(config) is None
+
+
+class TestPartitionWriter:
+    """Test records land in the file for their period only"""
+
+    def test_writes_one_file_per_day(self, layout, conn):
+        write_days_ago(layout, 2, 1, 1)
+
+        assert [p.key for p in layout.partitions()] == ["2026-06-13", "2026-06-14"]
+        assert conn.execute("SELECT COUNT(*) FROM ping_results").fetchone()[0] == 0
+        with sqlite3.connect(layout.partitions()[1].path) as part:
+            assert part.execute("SELECT COUNT(*) FROM ping_results").fetchone()[0] == 2
+
+    def test_keeps_only_current_partition_open(self, layout):
+        writer = PartitionWriter(layout)
+        writer.insert_batch(session_id="s1", ping_records=[make_record("a", NOW)])
+        first = writer._conn
+        writer.insert_batch(session_id="s1", ping_records=[make_record("a", NOW)])
+        assert writer._conn is first
+
+        writer.insert_batch(
+            session_id="s1", ping_records=[make_record("a", NOW + timedelta(days=1))]
+        )
+        assert writer._conn is not first
+        writer.close()
+
+
+class TestPartitionedQueries:
+    """Test range queries only attach what overlaps the window"""
+
+    def test_history_spans_partitions_in_order(self, layout, conn):
+        write_days_ago(layout, 5, 3, 1)
+
+        rows = select_partitioned_history(
+            layout=layout, target="8.8.8.8", since=NOW - timedelta(days=4), conn=conn
+        )
+
+        assert [row[0] for row in rows] == [
+            int((NOW - timedelta(days=d)).timestamp() * 1000) for d in (3, 1)
+        ]
+        assert len(conn.execute("PRAGMA database_list").fetchall()) == 1
+
+    def test_attaches_within_the_limit(self, layout, conn):
+        write_days_ago(layout, *range(25))
+        conn.setlimit(sqlite3.SQLITE_LIMIT_ATTACHED, 4)
+
+        seen = [partition.key for _, partition in each_attached(conn, layout.partitions())]
+
+        assert len(seen) == 25
+        assert len(conn.execute("PRAGMA database_list").fetchall()) == 1
+
+    def test_rollups_include_dropped_partitions(self, layout, conn):
+        write_days_ago(layout, 40, 1)
+        prune(conn, RetentionConfig(raw_days=30), now=NOW, layout=layout)
+
+        days = select_partitioned_rollups(
+            conn, layout=layout, target="8.8.8.8", resolution="day",
+            since=NOW - timedelta(days=60),
+        )
+
+        assert len(days) == 2
+        assert days[0][0] < days[1][0]
+
+    def test_history_includes_records_from_before_partitioning(self, layout, conn):
+        insert_ping_batch_db(
+            session_id="s1",
+            ping_records=[make_record("8.8.8.8", NOW - timedelta(days=1, hours=1))],
+            conn=conn,
+        )
+        write_days_ago(layout, 2, 1)
+
+        rows = select_partitioned_history(
+            layout=layout, target="8.8.8.8", since=NOW - timedelta(days=4), conn=conn
+        )
+
+        assert [row[0] for row in rows] == [
+            int((NOW - delta).timestamp() * 1000)
+            for delta in (timedelta(days=2), timedelta(days=1, hours=1), timedelta(days=1))
+        ]
+
+    def test_rollups_combine_buckets_shared_with_main(self, layout, conn):
+        insert_ping_batch_db(
+            session_id="s1", ping_records=[make_record("8.8.8.8", NOW - timedelta(days=1))],
+            conn=conn,
+        )
+        write_days_ago(layout, 1)
+
+        days = select_partitioned_rollups(
+            conn, layout=layout, target="8.8.8.8", resolution="day",
+            since=NOW - timedelta(days=4),
+        )
+
+        assert len(days) == 1
+        assert days[0][1] == 2  # records
+
+
+class TestPartitionRetention:
+    """Test retention unlinks whole partitions"""
+
+    def test_drop_interrupted_before_unlink_merges_once(self, layout, conn, monkeypatch):
+        write_days_ago(layout, 40)
+        [partition] = layout.partitions()
+
+        def fail(self, missing_ok=False):
+            raise OSError("interrupted")
+
+        with monkeypatch.context() as patched:
+            patched.setattr(type(partition.path), "unlink", fail)
+            with pytest.raises(OSError):
+                drop_partition(conn, partition, layout.storage)
+        # Merged but still on disk: queries count it once
+        days = select_partitioned_rollups(
+            conn, layout=layout, target="8.8.8.8", resolution="day",
+            since=NOW - timedelta(days=60),
+        )
+        assert [row[1] for row in days] == [1]
+
+        drop_partition(conn, partition, layout.storage)
+
+        assert layout.partitions() == []
+        assert conn.execute("SELECT records FROM ping_rollup_day").fetchall() == [(1,)]
+        assert conn.execute("SELECT COUNT(*) FROM merged_partitions").fetchone()[0] == 0
+
+    def test_drops_expired_partitions(self, layout, conn):
+        write_days_ago(layout, 40, 35, 1)
+
+        report = prune(conn, RetentionConfig(raw_days=30), now=NOW, layout=layout)
+
+        assert report.dropped_partitions == ["2026-05-06", "2026-05-11"]
+        assert [p.key for p in layout.partitions()] == ["2026-06-14"]
+        assert not list(layout.database_path.parent.glob("netdiag-2026-05-*"))
+
+    def test_size_cap_under_limit_drops_nothing(self, layout, conn):
+        write_days_ago(layout, 3, 2, 1)
+        report = prune(conn, RetentionConfig(raw_days=0, max_db_mb=1), now=NOW, layout=layout)
+        assert report.dropped_partitions == []
+
+    def test_size_cap_keeps_newest_partition(self, layout, conn):
+        write_days_ago(layout, 3, 2, 1)
+
+        report = PruneReport()
+        enforce_size_cap(conn, 1, 500, report, layout)
+
+        assert report.dropped_partitions == ["2026-06-12", "2026-06-13"]
+        assert [p.key for p in layout.partitions()] == ["2026-06-14"]
+
+    def test_size_cap_keeps_main_rollups_when_live_partition_exceeds_it(self, layout, conn):
+        write_days_ago(layout, 40, 1)
+        prune(conn, RetentionConfig(raw_days=30), now=NOW, layout=layout)
+        rollups = conn.execute("SELECT COUNT(*) FROM ping_rollup_minute").fetchone()[0]
+        assert rollups == 1
+
+        report = PruneReport()
+        enforce_size_cap(conn, 1, 500, report, layout)
+
+        assert report.deleted == {}
+        assert [p.key for p in layout.partitions()] == ["2026-06-14"]
+        assert conn.execute("SELECT COUNT(*) FROM ping_rollup_minute").fetchone()[0] == 1
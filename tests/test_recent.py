@@ -0,0 +1,95 @@
+"""Tests for the in-memory recent results (recent.py)"""
+
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from netdiag.database import to_epoch_ms
+from netdiag.recent import RecentResults, ResultRing
+from tests.test_rollups import make_record
+
+START = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def records(n, target="8.8.8.8"):
+    return [make_record(target, START + timedelta(seconds=i)) for i in range(n)]
+
+
+class TestResultRing:
+    """Test the fixed-capacity columnar ring"""
+
+    def test_keeps_results_oldest_first(self):
+        ring = ResultRing(4)
+        for record in records(3):
+            ring.append(record)
+
+        assert len(ring) == 3
+        assert list(ring.column("ts")) == [to_epoch_ms(r.timestamp) for r in records(3)]
+
+    def test_overwrites_oldest_when_full(self):
+        ring = ResultRing(4)
+        for record in records(6):
+            ring.append(record)
+
+        assert len(ring) == 4
+        assert list(ring.column("ts")) == [to_epoch_ms(r.timestamp) for r in records(6)[2:]]
+
+    def test_last_n_across_the_wrap(self):
+        ring = ResultRing(4)
+        for record in records(6):
+            ring.append(record)
+
+        rows = ring.rows(3)
+
+        assert [row[0] for row in rows] == [to_epoch_ms(r.timestamp) for r in records(6)[3:]]
+        assert ring.rows(0) == []
+
+    def test_rows_carry_metrics_and_cause_code(self):
+        ring = ResultRing(2)
+        record = make_record("8.8.8.8", START, received=0)
+        ring.append(record)
+
+        ts, loss_pct, rtt_avg, rtt_min, rtt_max, jitter, cause = ring.rows()[0]
+
+        assert loss_pct == record.metrics.loss_pct
+        assert rtt_avg == record.metrics.rtt_avg_ms
+        assert cause == 1  # no_connectivity
+
+    def test_rejects_zero_capacity(self):
+        with pytest.raises(ValueError):
+            ResultRing(0)
+
+
+class TestRecentResults:
+    """Test one ring per target"""
+
+    def test_separates_targets(self):
+        recent = RecentResults(10)
+        recent.add(records(2, "a") + records(3, "b"))
+
+        assert recent.targets() == ["a", "b"]
+        assert len(recent.last("a")) == 2
+        assert len(recent.last("b", 1)) == 1
+
+    def test_unknown_target_is_empty(self):
+        assert RecentResults(10).last("8.8.8.8") == []
+
+    def test_readers_see_whole_rows(self):
+        recent = RecentResults(8)
+        recent.add(records(1))
+        stop = threading.Event()
+
+        def writer():
+            while not stop.is_set():
+                recent.add(records(8))
+
+        thread = threading.Thread(target=writer)
+        thread.start()
+        try:
+            for _ in range(200):
+                rows = recent.last("8.8.8.8")
+                assert all(len(row) == 7 for row in rows)
+        finally:
+            stop.set()
+            thread.join()
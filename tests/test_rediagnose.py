@@ -0,0 +1,117 @@
+"""Tests for re-diagnosing stored history (rediagnose.py)
+
+Records go through a real database, so the chunked updates and the rollup
+cause counts are exercised in SQL.
+"""
+
+import sqlite3
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import netdiag.data.ping as ping
+from netdiag.config.config import DiagnosisConfig
+from netdiag.database import create_db, insert_ping_batch_db, insert_sessions_db
+from netdiag.rediagnose import rediagnose_history
+from netdiag.rollups import CAUSE_COLUMNS, ROLLUP_COLUMNS, check_rollups, select_rollups
+from tests.test_rollups import make_record
+
+START = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_db(conn)
+    insert_sessions_db(session_id="s1", command="ping", conn=conn)
+    yield conn
+    conn.close()
+
+
+def store(conn, *rtt_avg_ms, target="8.8.8.8"):
+    records = [
+        make_record(target, START + timedelta(minutes=i), rtt_avg_ms=rtt)
+        for i, rtt in enumerate(rtt_avg_ms)
+    ]
+    insert_ping_batch_db(session_id="s1", ping_records=records, conn=conn)
+
+
+def causes(conn):
+    return [row[0] for row in conn.execute("SELECT cause FROM ping_results ORDER BY id")]
+
+
+class TestRediagnoseHistory:
+    """Test stored labels follow the current thresholds"""
+
+    def test_relabels_after_threshold_change(self, conn, monkeypatch):
+        store(conn, 20.0, 120.0, 200.0)
+        assert causes(conn) == [0, 0, 4]
+
+        monkeypatch.setattr(ping, "HIGH_LATENCY_THRESHOLD_MS", 100)
+        report = rediagnose_history(conn, since=START, chunk_rows=2)
+
+        assert causes(conn) == [0, 4, 4]
+        assert (report.records, report.changed) == (3, 1)
+
+    def test_only_touches_the_window(self, conn, monkeypatch):
+        store(conn, 120.0, 120.0, 120.0)
+
+        monkeypatch.setattr(ping, "HIGH_LATENCY_THRESHOLD_MS", 100)
+        rediagnose_history(
+            conn, since=START + timedelta(minutes=1), until=START + timedelta(minutes=2)
+        )
+
+        assert causes(conn) == [0, 4, 0]
+
+    def test_chunks_start_at_the_window(self, conn, monkeypatch):
+        store(conn, *[120.0] * 20)
+        statements = []
+        conn.set_trace_callback(statements.append)
+
+        monkeypatch.setattr(ping, "HIGH_LATENCY_THRESHOLD_MS", 100)
+        report = rediagnose_history(conn, since=START + timedelta(minutes=18), chunk_rows=1)
+
+        assert report.records == 2
+        assert sum("WHERE id > " in sql for sql in statements) == 2
+
+    def test_rollups_follow_new_causes(self, conn, monkeypatch):
+        store(conn, 20.0, 120.0, 200.0)
+
+        monkeypatch.setattr(ping, "HIGH_LATENCY_THRESHOLD_MS", 100)
+        rediagnose_history(conn, since=START)
+
+        assert check_rollups(conn) == []
+        day = select_rollups(
+            conn, target="8.8.8.8", resolution="day", since=START
+        )[0]
+        high_latency = ROLLUP_COLUMNS.index(CAUSE_COLUMNS[ping.DiagnosisCause.HIGH_LATENCY])
+        assert day[1 + high_latency] == 2
+
+    def test_configured_rules_and_overrides(self, conn):
+        store(conn, 120.0, 600.0)
+        store(conn, 120.0, 600.0, target="sat")
+        base = DiagnosisConfig(high_latency_ms=100)
+        rules = replace(base, targets={"sat": replace(base, high_latency_ms=700)})
+
+        report = rediagnose_history(conn, since=START, rules=rules, chunk_rows=3)
+
+        assert causes(conn) == [4, 4, 0, 0]
+        assert report.changed == 2
+        assert check_rollups(conn) == []
+
+    def test_overrides_follow_the_configured_target(self, conn):
+        """Test a resolved gateway keeps its "gateway" rules, as in the live probe"""
+        record = make_record("192.168.1.1", START, rtt_avg_ms=600.0)
+        record.configured_target = "gateway"
+        insert_ping_batch_db(session_id="s1", ping_records=[record], conn=conn)
+        base = DiagnosisConfig(high_latency_ms=100)
+        rules = replace(base, targets={"gateway": replace(base, high_latency_ms=700)})
+
+        report = rediagnose_history(conn, since=START, rules=rules)
+
+        assert causes(conn) == [0]
+        assert report.changed == 1
+
+    def test_empty_database(self, conn):
+        assert rediagnose_history(conn, since=START).records == 0
@@ -0,0 +1,225 @@
+"""Tests for retention and the size cap (retention.py)"""
+
+import sqlite3
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from netdiag.config.config import RetentionConfig
+from netdiag.database import create_db, insert_event_db, insert_ping_batch_db, insert_sessions_db
+from netdiag.retention import (
+    PruneReport,
+    database_size_bytes,
+    delete_in_chunks,
+    enable_incremental_vacuum,
+    enforce_size_cap,
+    prune,
+)
+from netdiag.rollups import (
+    check_rollups,
+    rebuild_rollups,
+    rollup_table,
+    rollup_watermark,
+    select_rollups,
+)
+from tests.test_rollups import make_record
+
+NOW = datetime(2026, 6, 1, tzinfo=timezone.utc)
+
+# Only the window under test is set in each case
+NO_RETENTION = RetentionConfig(
+    raw_days=0, minute_rollup_days=0, hour_rollup_days=0, day_rollup_days=0
+)
+
+
+def count(conn, table):
+    return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+
+def insert_days_ago(conn, *days, target="8.8.8.8", session_id="s1"):
+    insert_ping_batch_db(session_id=session_id, conn=conn, ping_records=[
+        make_record(target, NOW - timedelta(days=d)) for d in days
+    ])
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_db(conn)
+    insert_sessions_db(session_id="s1", command="ping", conn=conn)
+    yield conn
+    conn.close()
+
+
+class TestRawRetention:
+    """Test raw records past raw_days are deleted and their rollups kept"""
+
+    def test_deletes_records_older_than_window(self, conn):
+        insert_days_ago(conn, 40, 35, 10, 1)
+        retention = replace(NO_RETENTION, raw_days=30)
+
+        report = prune(conn, retention, now=NOW)
+
+        assert report.deleted == {"ping_results": 2}
+        assert count(conn, "ping_results") == 2
+
+    def test_rollups_survive_raw_deletion(self, conn):
+        insert_days_ago(conn, 40, 1)
+        retention = replace(NO_RETENTION, raw_days=30)
+
+        prune(conn, retention, now=NOW)
+
+        days = select_rollups(
+            conn, target="8.8.8.8", resolution="day", since=NOW - timedelta(days=60)
+        )
+        assert len(days) == 2
+
+    def test_rebuild_after_prune_keeps_older_rollups(self, conn):
+        insert_days_ago(conn, 40, 35, 1)
+        prune(conn, replace(NO_RETENTION, raw_days=30), now=NOW)
+
+        rebuild_rollups(conn)
+
+        since = NOW - timedelta(days=60)
+        for resolution in ("minute", "hour", "day"):
+            rows = select_rollups(conn, target="8.8.8.8", resolution=resolution, since=since)
+            assert len(rows) == 3, resolution
+        assert check_rollups(conn) == []
+
+    def test_pending_records_are_rolled_up_first(self, conn):
+        insert_days_ago(conn, 40)
+        conn.execute("UPDATE rollup_state SET watermark = 0")
+        for resolution in ("minute", "hour", "day"):
+            conn.execute(f"DELETE FROM {rollup_table(resolution)}")
+        conn.commit()
+
+        prune(conn, replace(NO_RETENTION, raw_days=30), now=NOW)
+
+        assert count(conn, "ping_results") == 0
+        assert count(conn, rollup_table("day")) == 1
+        assert rollup_watermark(conn) == 1
+
+    def test_old_events_and_empty_sessions_are_deleted(self, conn):
+        insert_sessions_db(session_id="old", command="ping", conn=conn)
+        conn.execute(
+            "UPDATE sessions SET started_at = ? WHERE session_id = 'old'",
+            ((NOW - timedelta(days=60)).strftime("%Y-%m-%d %H:%M:%S"),),
+        )
+        conn.commit()
+        insert_event_db(session_id="old", kind="gateway_change", detail={},
+                        timestamp=NOW - timedelta(days=60), conn=conn)
+        insert_event_db(session_id="s1", kind="gateway_change", detail={},
+                        timestamp=NOW - timedelta(days=1), conn=conn)
+
+        report = prune(conn, replace(NO_RETENTION, raw_days=30), now=NOW)
+
+        assert report.deleted == {"events": 1, "sessions": 1}
+        assert [r[0] for r in conn.execute("SELECT session_id FROM sessions")] == ["s1"]
+
+    def test_zero_keeps_everything(self, conn):
+        insert_days_ago(conn, 400, 1)
+
+        report = prune(conn, NO_RETENTION, now=NOW)
+
+        assert report.deleted == {}
+        assert count(conn, "ping_results") == 2
+
+
+class TestRollupRetention:
+    """Test each resolution has its own window"""
+
+    def test_each_resolution_uses_its_window(self, conn):
+        insert_days_ago(conn, 100, 40, 1)
+        retention = RetentionConfig(
+            raw_days=30, minute_rollup_days=60, hour_rollup_days=90, day_rollup_days=0
+        )
+
+        prune(conn, retention, now=NOW)
+
+        assert count(conn, "ping_results") == 1
+        assert count(conn, rollup_table("minute")) == 2
+        assert count(conn, rollup_table("hour")) == 2
+        assert count(conn, rollup_table("day")) == 3
+
+
+class TestSizeCap:
+    """Test the oldest data is dropped until the database fits"""
+
+    def test_drops_oldest_raw_records_first(self, conn):
+        for day in range(10, 0, -1):
+            insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+                make_record(f"10.0.0.{i}", NOW - timedelta(days=day, seconds=i))
+                for i in range(200)
+            ])
+        full = database_size_bytes(conn)
+
+        report = PruneReport()
+        enforce_size_cap(conn, full * 3 // 4, 500, report)
+
+        assert database_size_bytes(conn) <= full * 3 // 4
+        assert report.deleted["ping_results"] > 0
+        assert rollup_table("day") not in report.deleted
+        oldest = conn.execute("SELECT MIN(ts) FROM ping_results").fetchone()[0]
+        assert oldest > int((NOW - timedelta(days=10)).timestamp() * 1000)
+
+    def test_noop_when_under_cap(self, conn):
+        insert_days_ago(conn, 1)
+        report = PruneReport()
+        enforce_size_cap(conn, database_size_bytes(conn) + 1, 500, report)
+        assert report.deleted == {}
+
+
+class TestDeleteInChunks:
+    """Test chunked deletes stop at the limit and report their count"""
+
+    def test_deletes_across_chunks(self, conn):
+        insert_days_ago(conn, *range(1, 11))
+        deleted = delete_in_chunks(conn, "ping_results", "id", "ts < ?", (2**62,), 3)
+        assert deleted == 10
+        assert count(conn, "ping_results") == 0
+
+    def test_limit(self, conn):
+        insert_days_ago(conn, *range(1, 11))
+        deleted = delete_in_chunks(conn, "ping_results", "id", "1", (), 3, limit=4)
+        assert deleted == 4
+
+
+class TestAutoVacuum:
+    """Test the schema hands freed pages back to the filesystem"""
+
+    def test_incremental_auto_vacuum_enabled(self, conn):
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+
+    def test_existing_file_is_only_converted_on_request(self, tmp_path):
+        conn = sqlite3.connect(tmp_path / "netdiag.db")
+        # A file that already had tables before the schema asked for auto_vacuum
+        conn.execute("CREATE TABLE legacy (n INTEGER)")
+        conn.commit()
+        statements = []
+        conn.set_trace_callback(statements.append)
+
+        create_db(conn)
+
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        assert "VACUUM" not in statements
+        assert enable_incremental_vacuum(conn) is True
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert enable_incremental_vacuum(conn) is False
+        conn.close()
+
+    def test_prune_releases_free_pages(self, tmp_path):
+        conn = sqlite3.connect(tmp_path / "netdiag.db")
+        create_db(conn)
+        insert_sessions_db(session_id="s1", command="ping", conn=conn)
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record(f"10.0.0.{i}", NOW - timedelta(days=40, seconds=i))
+            for i in range(2000)
+        ])
+        pages_before = conn.execute("PRAGMA page_count").fetchone()[0]
+
+        prune(conn, RetentionConfig(raw_days=30), now=NOW)
+
+        assert conn.execute("PRAGMA freelist_count").fetchone()[0] == 0
+        assert conn.execute("PRAGMA page_count").fetchone()[0] < pages_before
+        conn.close()
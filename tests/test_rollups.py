@@ -0,0 +1,212 @@
+"""Tests for the incremental rollup tables (rollups.py)
+
+Rollups are checked against aggregates computed directly from the records
+that were inserted, using a real in-memory database.
+"""
+
+import argparse
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from netdiag.analysis.ping import analyse_ping_result
+from netdiag.cli import cmd_rollups
+from netdiag.data.ping import PingParseResult
+from netdiag.database import create_db, insert_ping_batch_db, insert_sessions_db
+from netdiag.histogram import RELATIVE_ACCURACY
+from netdiag.rollups import (
+    ROLLUP_COLUMNS,
+    check_rollups,
+    compact_rollups,
+    rebuild_rollups,
+    rollup_percentiles,
+    rollup_watermark,
+    select_rollups,
+)
+
+START = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def make_record(target: str, at: datetime, rtt_avg_ms: float = 20.0, received: int = 5,
+                times_ms: list[float] | None = None):
+    record = analyse_ping_result(
+        PingParseResult(
+            address=target,
+            times_ms=times_ms or [],
+            sent=5,
+            received=received,
+            loss_pct=(5 - received) * 20.0,
+            rtt_min_ms=rtt_avg_ms - 5 if received else 0.0,
+            rtt_avg_ms=rtt_avg_ms if received else 0.0,
+            rtt_max_ms=rtt_avg_ms + 5 if received else 0.0,
+            rtt_stddev_ms=1.0 if received else 0.0,
+            jitter=2.0 if received else 0.0,
+            jitter_ratio=0.1 if received else 0.0,
+        ),
+        "s1",
+    )
+    record.timestamp = at
+    return record
+
+
+def as_dict(row):
+    return dict(zip(("bucket_ts", *ROLLUP_COLUMNS), row))
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_db(conn)
+    insert_sessions_db(session_id="s1", command="ping", conn=conn)
+    yield conn
+    conn.close()
+
+
+class TestIncrementalRollups:
+    """Test every inserted batch is folded into all resolutions"""
+
+    def test_minute_buckets(self, conn):
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START + timedelta(seconds=5), rtt_avg_ms=10.0),
+            make_record("8.8.8.8", START + timedelta(seconds=50), rtt_avg_ms=30.0),
+            make_record("8.8.8.8", START + timedelta(seconds=70), rtt_avg_ms=20.0),
+        ])
+
+        rows = [as_dict(r) for r in select_rollups(
+            conn, target="8.8.8.8", resolution="minute", since=START
+        )]
+        assert [r["records"] for r in rows] == [2, 1]
+        first = rows[0]
+        assert first["bucket_ts"] == int(START.timestamp() * 1000)
+        assert first["rtt_min_ms"] == 5.0
+        assert first["rtt_max_ms"] == 35.0
+        assert first["rtt_avg_sum"] == 40.0
+        assert first["rtt_avg_sq_sum"] == 1000.0
+        assert first["cause_ok"] == 2
+
+    def test_batches_merge_into_hour_and_day(self, conn):
+        for minute in range(0, 120, 30):
+            insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+                make_record("8.8.8.8", START + timedelta(minutes=minute)),
+                make_record("1.1.1.1", START + timedelta(minutes=minute)),
+            ])
+
+        hours = select_rollups(conn, target="8.8.8.8", resolution="hour", since=START)
+        days = select_rollups(conn, target="8.8.8.8", resolution="day", since=START)
+        assert [as_dict(r)["records"] for r in hours] == [2, 2]
+        assert [as_dict(r)["records"] for r in days] == [4]
+        assert rollup_watermark(conn) == 8
+
+    def test_lost_records_do_not_touch_rtt(self, conn):
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START, rtt_avg_ms=50.0),
+        ])
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START + timedelta(seconds=1), received=0),
+        ])
+
+        row = as_dict(select_rollups(conn, target="8.8.8.8", resolution="minute", since=START)[0])
+        assert row["rtt_min_ms"] == 45.0
+        assert row["replied"] == 1
+        assert row["sent"] == 10
+        assert row["received"] == 5
+        assert row["cause_no_connectivity"] == 1
+
+
+class TestRollupPercentiles:
+    """Test percentiles from merged rollup histograms"""
+
+    def test_merged_rows_match_raw_samples(self, conn):
+        times = [[1.0 + m, 2.0 + m, 3.0 + m, 40.0 + m, 500.0] for m in range(120)]
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START + timedelta(minutes=m), times_ms=t)
+            for m, t in enumerate(times)
+        ])
+        samples = sorted(ms for t in times for ms in t)
+
+        for resolution in ("minute", "hour", "day"):
+            rows = select_rollups(conn, target="8.8.8.8", resolution=resolution, since=START)
+            p50, p95, p99 = rollup_percentiles(rows)
+            assert p50 == pytest.approx(samples[299], rel=RELATIVE_ACCURACY)
+            assert p95 == pytest.approx(samples[569], rel=RELATIVE_ACCURACY)
+            assert p99 == pytest.approx(samples[593], rel=RELATIVE_ACCURACY)
+
+    def test_hour_is_merge_of_its_minutes(self, conn):
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START + timedelta(minutes=m), times_ms=[5.0 * (m + 1)] * 5)
+            for m in range(3)
+        ])
+        minutes = select_rollups(conn, target="8.8.8.8", resolution="minute", since=START)
+        hour = select_rollups(conn, target="8.8.8.8", resolution="hour", since=START)
+
+        assert rollup_percentiles(minutes, [0.0, 0.5, 1.0]) == rollup_percentiles(
+            hour, [0.0, 0.5, 1.0]
+        )
+        assert check_rollups(conn) == []
+
+    def test_no_kept_replies_is_none(self, conn):
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START)
+        ])
+        rows = select_rollups(conn, target="8.8.8.8", resolution="day", since=START)
+        assert rollup_percentiles(rows) is None
+
+
+class TestRollupMaintenance:
+    """Test compaction, rebuild and the consistency check"""
+
+    def test_rebuild_matches_incremental(self, conn):
+        records = [
+            make_record(target, START + timedelta(minutes=m), rtt_avg_ms=10.0 + m)
+            for m in range(90) for target in ("8.8.8.8", "1.1.1.1")
+        ]
+        insert_ping_batch_db(session_id="s1", ping_records=records, conn=conn)
+        before = select_rollups(conn, target="1.1.1.1", resolution="hour", since=START)
+
+        rebuild_rollups(conn, chunk_rows=7)
+
+        assert select_rollups(conn, target="1.1.1.1", resolution="hour", since=START) == before
+        assert check_rollups(conn) == []
+
+    def test_compacts_rows_inserted_without_rollup(self, conn):
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START)
+        ])
+        conn.execute("UPDATE rollup_state SET watermark = 0")
+        conn.execute("DELETE FROM ping_rollup_minute")
+        conn.execute("DELETE FROM ping_rollup_hour")
+        conn.execute("DELETE FROM ping_rollup_day")
+
+        assert compact_rollups(conn) == 1
+        assert check_rollups(conn) == []
+
+    def test_check_reports_drifted_bucket(self, conn):
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START)
+        ])
+        conn.execute("UPDATE ping_rollup_hour SET records = records + 1")
+
+        assert check_rollups(conn) == [("hour", "8.8.8.8", int(START.timestamp() * 1000))]
+
+    def test_check_reports_drifted_histogram(self, conn):
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START, times_ms=[10.0, 11.0, 12.0, 13.0, 14.0])
+        ])
+        conn.execute("UPDATE ping_rollup_day SET rtt_hist = NULL")
+
+        assert check_rollups(conn) == [("day", "8.8.8.8", int(START.timestamp() * 1000))]
+
+    def test_cli_check_fails_on_mismatch(self, conn, capsys):
+        insert_ping_batch_db(session_id="s1", conn=conn, ping_records=[
+            make_record("8.8.8.8", START)
+        ])
+        conn.execute("UPDATE ping_rollup_day SET sent = 0")
+
+        with pytest.raises(RuntimeError, match="1 rollup buckets"):
+            cmd_rollups(argparse.Namespace(action="check"), None, conn, "s1")
+        assert "day rollup for 8.8.8.8" in capsys.readouterr().out
+
+        cmd_rollups(argparse.Namespace(action="rebuild"), None, conn, "s1")
+        cmd_rollups(argparse.Namespace(action="check"), None, conn, "s1")
+        assert "Rollups match raw records" in capsys.readouterr().out
@@ -0,0 +1,53 @@
+"""Tests for per-request RTT samples (samples.py)"""
+
+import math
+
+import pytest
+
+from netdiag.samples import decode_samples, encode_samples, lost_requests, request_samples
+
+
+class TestEncoding:
+    """Test the float32 BLOB format"""
+
+    def test_four_bytes_per_request(self):
+        assert len(encode_samples([10.5, 12.25, math.nan])) == 12
+
+    def test_round_trip_keeps_lost_requests(self):
+        samples = decode_samples(encode_samples([10.5, math.nan, 12.25]))
+        assert samples[0] == 10.5
+        assert math.isnan(samples[1])
+        assert samples[2] == 12.25
+
+    def test_decode_reads_in_place(self):
+        blob = encode_samples([1.0, 2.0])
+        samples = decode_samples(blob)
+        if isinstance(samples, memoryview):
+            assert samples.obj is blob
+
+    def test_float32_precision(self):
+        samples = decode_samples(encode_samples([12.789]))
+        assert samples[0] == pytest.approx(12.789, abs=1e-5)
+
+
+class TestRequestSamples:
+    """Test replies are placed at the request they answered"""
+
+    def test_lost_requests_by_sequence(self):
+        blob = request_samples([10.0, 12.0], 4, reply_seqs=[0, 3])
+        assert lost_requests(decode_samples(blob)) == [1, 2]
+
+    def test_without_sequence_losses_go_last(self):
+        blob = request_samples([10.0, 12.0], 3)
+        assert list(decode_samples(blob))[:2] == [10.0, 12.0]
+        assert lost_requests(decode_samples(blob)) == [2]
+
+    def test_foreign_sequence_numbers_are_ignored(self):
+        blob = request_samples([10.0, 99.0], 2, reply_seqs=[0, 7])
+        assert lost_requests(decode_samples(blob)) == [1]
+
+    def test_more_replies_than_requests(self):
+        assert request_samples([1.0, 2.0], 1) is None
+
+    def test_nothing_sent(self):
+        assert request_samples([], 0) is None
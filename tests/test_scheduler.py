@@ -0,0 +1,112 @@
+"""Tests for the interval scheduler (scheduler.py)
+
+A fake monotonic clock drives the scheduler, so no test actually sleeps.
+"""
+
+import pytest
+
+from netdiag.scheduler import Scheduler
+
+
+class FakeClock:
+    def __init__(self, now=100.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    return FakeClock()
+
+
+class TestRunPending:
+    """Test due-job selection and rescheduling"""
+
+    def test_runs_job_immediately_by_default(self, clock):
+        """Test a new job is due straight away"""
+        calls = []
+        scheduler = Scheduler(clock=clock)
+        scheduler.add_job("ping", 60, lambda: calls.append(clock.now))
+
+        assert scheduler.run_pending() == 1
+        assert calls == [100.0]
+
+    def test_delayed_start(self, clock):
+        """Test run_immediately=False waits one interval"""
+        calls = []
+        scheduler = Scheduler(clock=clock)
+        scheduler.add_job("ping", 60, lambda: calls.append(clock.now), run_immediately=False)
+
+        assert scheduler.run_pending() == 0
+        clock.now += 60
+        assert scheduler.run_pending() == 1
+
+    def test_fixed_rate_does_not_drift(self, clock):
+        """Test the next due time counts from the previous due time, not job end"""
+        scheduler = Scheduler(clock=clock)
+
+        def slow_job():
+            clock.now += 5  # the job itself takes 5s
+
+        job = scheduler.add_job("ping", 60, slow_job)
+        scheduler.run_pending()
+
+        assert job.next_due == 160.0
+
+    def test_skips_missed_runs(self, clock):
+        """Test a job far behind schedule runs once, not once per missed interval"""
+        calls = []
+        scheduler = Scheduler(clock=clock)
+        job = scheduler.add_job("ping", 10, lambda: calls.append(clock.now))
+        scheduler.run_pending()
+
+        clock.now += 35
+        assert scheduler.run_pending() == 1
+        assert scheduler.run_pending() == 0
+        assert job.next_due == clock.now + 10
+
+    def test_independent_intervals(self, clock):
+        """Test each job fires on its own interval"""
+        calls = []
+        scheduler = Scheduler(clock=clock)
+        scheduler.add_job("fast", 10, lambda: calls.append("fast"))
+        scheduler.add_job("slow", 30, lambda: calls.append("slow"))
+
+        for _ in range(4):
+            scheduler.run_pending()
+            clock.now += 10
+
+        assert calls.count("fast") == 4
+        assert calls.count("slow") == 2
+
+    def test_rejects_non_positive_interval(self, clock):
+        scheduler = Scheduler(clock=clock)
+        with pytest.raises(ValueError):
+            scheduler.add_job("ping", 0, lambda: None)
+
+
+class TestRun:
+    """Test the blocking run loop"""
+
+    def test_stops_after_max_ticks(self):
+        """Test run() returns once max_ticks ticks ran"""
+        calls = []
+        scheduler = Scheduler()
+        scheduler.add_job("ping", 0.001, lambda: calls.append(1))
+
+        scheduler.run(max_ticks=3)
+
+        assert len(calls) == 3
+
+    def test_stop_ends_loop(self):
+        """Test stop() called from a job ends the loop"""
+        scheduler = Scheduler()
+        scheduler.add_job("ping", 60, scheduler.stop)
+
+        scheduler.run()  # would block for 60s if stop() were ignored
+
+    def test_requires_jobs(self):
+        with pytest.raises(ValueError):
+            Scheduler().run()
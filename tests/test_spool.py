@@ -0,0 +1,148 @@
+"""Tests for the record spool (spool.py)
+
+Replays go through a real database, so the dedupe is exercised in SQL.
+"""
+
+import math
+import sqlite3
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from netdiag.database import create_db
+from netdiag.histogram import build_histogram
+from netdiag.samples import encode_samples
+from netdiag.spool import (
+    append_to_spool,
+    ping_record_from_json,
+    ping_record_to_json,
+    read_spool,
+    replay_spool,
+    spool_path,
+    spool_pending,
+)
+from netdiag.writer import DatabaseWriter
+from tests.test_rollups import make_record
+
+AT = datetime(2026, 3, 1, 12, 30, 15, 250000, tzinfo=timezone.utc)
+
+
+class TestSerialization:
+    """Test records survive a round trip through the spool format"""
+
+    def test_round_trip(self):
+        record = make_record("8.8.8.8", AT, received=3)
+        assert ping_record_from_json(ping_record_to_json(record)) == record
+
+    def test_round_trip_keeps_rtt_samples(self):
+        record = make_record("8.8.8.8", AT)
+        record.rtt_samples = encode_samples([10.5, math.nan])
+        assert ping_record_from_json(ping_record_to_json(record)) == record
+
+    def test_round_trip_keeps_rtt_hist(self):
+        record = make_record("8.8.8.8", AT)
+        record.rtt_hist = build_histogram([10.5, 12.0])
+        assert ping_record_from_json(ping_record_to_json(record)) == record
+
+    def test_round_trip_keeps_configured_target(self):
+        record = make_record("192.168.1.1", AT)
+        record.configured_target = "gateway"
+        assert ping_record_from_json(ping_record_to_json(record)) == record
+
+    def test_one_line_per_record(self):
+        assert "\n" not in ping_record_to_json(make_record("8.8.8.8", AT))
+
+
+class TestSpoolFile:
+    """Test appending and taking back spooled records"""
+
+    def test_path_sits_next_to_database(self):
+        assert spool_path("/var/lib/netdiag/netdiag.db").name == "netdiag.spool"
+
+    def test_appends_accumulate(self, tmp_path):
+        path = tmp_path / "netdiag.spool"
+        append_to_spool(path, [make_record("a", AT)])
+        append_to_spool(path, [make_record("b", AT)])
+
+        assert [r.target for r in read_spool(path)] == ["a", "b"]
+
+    def test_missing_spool_is_empty(self, tmp_path):
+        assert read_spool(tmp_path / "netdiag.spool") == []
+
+    def test_torn_last_line_is_skipped(self, tmp_path):
+        path = tmp_path / "netdiag.spool"
+        append_to_spool(path, [make_record("a", AT)])
+        with open(path, "a") as f:
+            f.write('{"session_id": "s1", "timest')
+
+        assert [r.target for r in read_spool(path)] == ["a"]
+
+    def test_append_after_torn_line_is_kept(self, tmp_path):
+        path = tmp_path / "netdiag.spool"
+        append_to_spool(path, [make_record("a", AT)])
+        with open(path, "a") as f:
+            f.write('{"session_id": "s1", "timest')
+
+        assert append_to_spool(path, [make_record("b", AT)]) == 1
+
+        assert [r.target for r in read_spool(path)] == ["a", "b"]
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(":memory:")
+    create_db(conn)
+    yield conn
+    conn.close()
+
+
+def count(conn):
+    return conn.execute("SELECT COUNT(*) FROM ping_results").fetchone()[0]
+
+
+class TestReplaySpool:
+    """Test spooled records are stored once and then removed"""
+
+    def test_replays_and_removes_spool(self, conn, tmp_path):
+        path = tmp_path / "netdiag.spool"
+        append_to_spool(path, [make_record("a", AT), make_record("b", AT)])
+
+        assert replay_spool(path, DatabaseWriter(conn)) == 2
+
+        assert count(conn) == 2
+        assert not spool_pending(path)
+
+    def test_replay_is_idempotent(self, conn, tmp_path):
+        path = tmp_path / "netdiag.spool"
+        records = [make_record("a", AT), make_record("a", AT + timedelta(seconds=60))]
+        append_to_spool(path, records)
+        replay_spool(path, DatabaseWriter(conn))
+
+        # A crash after the commit but before the spool was removed
+        append_to_spool(path, records)
+        replay_spool(path, DatabaseWriter(conn))
+
+        assert count(conn) == 2
+
+    def test_failed_replay_keeps_records(self, conn, tmp_path):
+        class LockedSink:
+            def insert_batch(self, **kwargs):
+                raise sqlite3.OperationalError("database is locked")
+
+        path = tmp_path / "netdiag.spool"
+        append_to_spool(path, [make_record("a", AT)])
+
+        with pytest.raises(sqlite3.OperationalError):
+            replay_spool(path, LockedSink())
+        assert spool_pending(path)
+
+        # Records spooled after the failed attempt are replayed as well
+        append_to_spool(path, [make_record("b", AT)])
+        replay_spool(path, DatabaseWriter(conn))
+        replay_spool(path, DatabaseWriter(conn))
+
+        assert count(conn) == 2
+        assert not spool_pending(path)
+
+    def test_nothing_to_replay(self, conn, tmp_path):
+        assert replay_spool(tmp_path / "netdiag.spool", DatabaseWriter(conn)) == 0
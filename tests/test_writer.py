@@ -0,0 +1,205 @@
+"""Tests for the background writer thread (writer.py)
+
+Most tests use a recording sink, so they check the queueing and grouping
+without SQLite; one writes through a real database file.
+"""
+
+import sqlite3
+import threading
+from dataclasses import replace
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from netdiag.config.config import StorageConfig, WriterConfig
+from netdiag.database import create_db, insert_sessions_db
+from netdiag.spool import append_to_spool, read_spool
+from netdiag.writer import BackgroundWriter, DatabaseWriter
+from tests.test_rollups import make_record
+
+START = datetime(2026, 3, 1, tzinfo=timezone.utc)
+
+
+def cycle(n, target="8.8.8.8"):
+    return [make_record(target, START + timedelta(seconds=i)) for i in range(n)]
+
+
+class RecordingSink:
+    def __init__(self):
+        self.batches = []
+        self.closed = False
+        self.thread = None
+
+    def insert_batch(self, *, session_id, ping_records, dedupe=False):
+        self.thread = threading.current_thread()
+        self.batches.append((session_id, list(ping_records)))
+
+    def close(self):
+        self.closed = True
+
+
+def opened_after(gate, sink):
+    # Holds the writer thread before it takes anything off the queue
+    def open_sink():
+        gate.wait()
+        return sink
+    return open_sink
+
+
+@pytest.fixture
+def config():
+    return WriterConfig(max_pending_cycles=2, batch_records=100, flush_interval_ms=50)
+
+
+class TestBackgroundWriter:
+    """Test cycles are written off the caller's thread"""
+
+    def test_writes_on_its_own_thread(self, config):
+        sink = RecordingSink()
+        writer = BackgroundWriter(lambda: sink, config)
+
+        writer.insert_batch(session_id="s1", ping_records=cycle(3))
+        writer.close()
+
+        assert [len(records) for _, records in sink.batches] == [3]
+        assert sink.thread is not threading.current_thread()
+        assert sink.closed
+        assert writer.written == 3
+
+    def test_groups_cycles_into_one_commit(self, config):
+        gate = threading.Event()
+        sink = RecordingSink()
+        writer = BackgroundWriter(
+            opened_after(gate, sink), replace(config, max_pending_cycles=10)
+        )
+
+        for _ in range(4):
+            writer.insert_batch(session_id="s1", ping_records=cycle(2))
+        gate.set()
+        writer.close()
+
+        assert [len(records) for _, records in sink.batches] == [8]
+
+    def test_splits_groups_by_session(self, config):
+        sink = RecordingSink()
+        writer = BackgroundWriter(lambda: sink, config)
+
+        writer.insert_batch(session_id="s1", ping_records=cycle(1))
+        writer.insert_batch(session_id="s2", ping_records=cycle(1))
+        writer.close()
+
+        assert [session_id for session_id, _ in sink.batches] == ["s1", "s2"]
+
+    def test_drop_policy_counts_overflow(self, config):
+        gate = threading.Event()
+        writer = BackgroundWriter(
+            opened_after(gate, RecordingSink()), replace(config, overflow="drop")
+        )
+
+        for _ in range(6):
+            writer.insert_batch(session_id="s1", ping_records=cycle(1))
+        gate.set()
+        writer.close()
+
+        assert writer.dropped == 4
+        assert writer.written == 2
+
+    def test_spill_policy_writes_overflow_later(self, config, tmp_path):
+        gate = threading.Event()
+        spool = tmp_path / "netdiag.spool"
+        writer = BackgroundWriter(opened_after(gate, RecordingSink()), config, spool=spool)
+
+        for _ in range(6):
+            writer.insert_batch(session_id="s1", ping_records=cycle(1))
+        assert writer.spilled == 4
+        gate.set()
+        writer.close()
+
+        assert writer.dropped == 0
+        assert writer.written == 6
+        assert not spool.exists()
+
+    def test_drains_existing_spool(self, config, tmp_path):
+        spool = tmp_path / "netdiag.spool"
+        append_to_spool(spool, cycle(2))
+        sink = RecordingSink()
+        writer = BackgroundWriter(lambda: sink, config, spool=spool)
+
+        writer.insert_batch(session_id="s1", ping_records=cycle(1))
+        writer.close()
+
+        assert writer.written == 3
+
+    def test_sink_errors_are_counted_not_raised(self, config, capsys):
+        class FailingSink(RecordingSink):
+            def insert_batch(self, *, session_id, ping_records, dedupe=False):
+                raise sqlite3.OperationalError("database is locked")
+
+        writer = BackgroundWriter(FailingSink, config)
+        writer.insert_batch(session_id="s1", ping_records=cycle(2))
+        writer.close()
+
+        assert writer.dropped == 2
+        assert "database is locked" in capsys.readouterr().out
+
+    def test_failed_writes_are_spooled_and_replayed(self, config, tmp_path, monkeypatch):
+        monkeypatch.setattr("netdiag.writer.SPOOL_RETRY_S", 0.0)
+        spool = tmp_path / "netdiag.spool"
+        sink = RecordingSink()
+        attempts = []
+
+        def open_sink():
+            # The database is locked at startup and on the first write
+            attempts.append(1)
+            if len(attempts) <= 2:
+                raise sqlite3.OperationalError("database is locked")
+            return sink
+
+        writer = BackgroundWriter(open_sink, config, spool=spool)
+        writer.insert_batch(session_id="s1", ping_records=cycle(3))
+        writer.close()
+
+        assert writer.spilled == 3
+        assert writer.dropped == 0
+        assert sum(len(records) for _, records in sink.batches) == 3
+        assert not spool.exists()
+
+    def test_backs_off_after_failure(self, config, tmp_path):
+        spool = tmp_path / "netdiag.spool"
+        opened = []
+
+        def open_sink():
+            opened.append(1)
+            raise sqlite3.OperationalError("disk I/O error")
+
+        writer = BackgroundWriter(open_sink, config, spool=spool)
+        for _ in range(2):
+            writer.insert_batch(session_id="s1", ping_records=cycle(1))
+        writer.close()
+
+        # The second cycle goes straight to the spool instead of retrying
+        assert opened == [1]
+        assert len(read_spool(spool)) == 2
+
+    def test_unused_writer_opens_nothing(self, config):
+        opened = []
+        writer = BackgroundWriter(lambda: opened.append(1), config)
+        writer.close()
+        assert opened == []
+
+
+class TestDatabaseWriter:
+    """Test the thread's own connection writes to the database file"""
+
+    def test_records_reach_the_database(self, config, tmp_path):
+        path = tmp_path / "netdiag.db"
+        with sqlite3.connect(path) as conn:
+            create_db(conn)
+            insert_sessions_db(session_id="s1", command="daemon", conn=conn)
+
+        writer = BackgroundWriter(lambda: DatabaseWriter.connect(path, StorageConfig()), config)
+        writer.insert_batch(session_id="s1", ping_records=cycle(5))
+        writer.close()
+
+        with sqlite3.connect(path) as conn:
+            assert conn.execute("SELECT COUNT(*) FROM ping_results").fetchone()[0] == 5